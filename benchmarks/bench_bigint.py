@@ -0,0 +1,88 @@
+# Exact big-integer paths from 10 to 10^6 result digits.
+#   python benchmarks/bench_bigint.py [--max-root-digits 100000]
+# Per size: format_result (scientific notation past MAX_INT_DIGITS) against a
+# full str() conversion, fact() and pow() producing a result of that many
+# digits (fact against math.factorial: small n come from the cached table),
+# and an exact cbrt() of a perfect cube. CPython's long division is
+# quadratic, so exact roots of million-digit results take tens of seconds;
+# they are skipped unless --max-root-digits allows them.
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calc_core import EvalEnv, format_result
+
+DIGITS = [10, 100, 1000, 10_000, 100_000, 1_000_000]
+LOG10_2 = math.log10(2)
+
+
+def best_of(fn, budget=0.5):
+    # min time of fn() over as many runs as fit in ~budget seconds (at least 1)
+    best = math.inf
+    spent = 0.0
+    while spent < budget:
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = min(best, dt)
+        spent += dt
+        if dt > budget / 3:
+            break
+    return best
+
+
+def fact_arg(digits):
+    # smallest n with at least `digits` digits in n!
+    lo, hi = 1, 2
+    while math.lgamma(hi + 1) / math.log(10) < digits:
+        hi *= 2
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if math.lgamma(mid + 1) / math.log(10) < digits:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def fmt(seconds):
+    if seconds is None:
+        return "-"
+    return "{:.1f} us".format(seconds * 1e6) if seconds < 1e-3 else "{:.3f} s".format(seconds)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Big-integer result benchmark.")
+    ap.add_argument("--max-root-digits", type=int, default=100_000)
+    args = ap.parse_args(argv)
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)   # let the str() baseline run at every size
+    env = EvalEnv()
+    rng = random.Random(1)
+    print("{:>8} {:>12} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+        "digits", "format", "str()", "factorial", "fact", "pow", "cbrt exact"))
+    for d in DIGITS:
+        value = rng.getrandbits(int(d / LOG10_2)) | 1
+        t_format = best_of(lambda: format_result(value))
+        t_str = best_of(lambda: str(value))
+        n = fact_arg(d)
+        t_factorial = best_of(lambda: math.factorial(n))
+        t_fact = best_of(lambda: env.fact(n))
+        t_pow = best_of(lambda: env.pow(7, int(d / math.log10(7))))
+        t_root = None
+        if d <= args.max_root_digits:
+            y = rng.getrandbits(int(d / LOG10_2)) | 1
+            cube = y ** 3
+            assert env.cbrt(cube) == y
+            t_root = best_of(lambda: env.cbrt(cube))
+        print("{:>8} {:>12} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+            d, fmt(t_format), fmt(t_str), fmt(t_factorial), fmt(t_fact), fmt(t_pow), fmt(t_root)))
+
+
+if __name__ == "__main__":
+    main()
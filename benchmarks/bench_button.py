@@ -0,0 +1,87 @@
+# Redraw cost of RoundedButton per hover event: Tcl calls and wall time,
+# comparing the original delete-and-recreate _draw with the in-place one.
+# Needs a display; on a headless box run it under Xvfb:
+#   xvfb-run python benchmarks/bench_button.py [events]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import tkinter as tk
+
+from scientific_calc import RoundedButton, WINDOW_BG
+
+
+class LegacyRoundedButton(RoundedButton):
+    # the pre-itemconfig implementation, kept here for comparison
+    def _draw(self, color):
+        self.delete("all")
+        w = self._width
+        h = self._height
+        r = self.radius
+        self.create_arc((0, 0, r*2, r*2), start=90, extent=90, fill=color, outline=color)
+        self.create_arc((w-2*r, 0, w, r*2), start=0, extent=90, fill=color, outline=color)
+        self.create_arc((0, h-2*r, r*2, h), start=180, extent=90, fill=color, outline=color)
+        self.create_arc((w-2*r, h-2*r, w, h), start=270, extent=90, fill=color, outline=color)
+        self.create_rectangle((r, 0, w-r, h), fill=color, outline=color)
+        self.create_rectangle((0, r, w, h-r), fill=color, outline=color)
+        self.create_text(w/2, h/2, text=self._text, fill=self.fg, font=self.font, tags="btn_text")
+
+
+class CountingTk:
+    # stands in for widget.tk and counts calls into the Tcl interpreter
+    def __init__(self, real):
+        self._real = real
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self._real.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._real, name)
+
+
+def run(cls, root, events):
+    frame = tk.Frame(root, bg=WINDOW_BG)
+    frame.pack()
+    buttons = [cls(frame, text=str(i), width=88, height=54) for i in range(40)]
+    for b in buttons:
+        b.pack(side="left")
+    root.update()
+    counters = []
+    for b in buttons:
+        b.tk = CountingTk(b.tk)
+        counters.append(b.tk)
+    t0 = time.perf_counter()
+    for i in range(events):
+        b = buttons[i % len(buttons)]
+        # a mouse sweep: enter then leave every button in turn
+        b._on_enter(None)
+        b._on_leave(None)
+    root.update_idletasks()
+    elapsed = time.perf_counter() - t0
+    items = sum(len(b.find_all()) for b in buttons)
+    calls = sum(c.calls for c in counters)
+    frame.destroy()
+    hover_events = events * 2
+    return calls / hover_events, elapsed / hover_events * 1e6, items
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        sys.exit("no display available ({}); try: xvfb-run python {}".format(e, sys.argv[0]))
+    root.configure(bg=WINDOW_BG)
+    print(f"{'implementation':16} {'Tcl calls/event':>16} {'us/event':>10} {'canvas items':>13}")
+    for name, cls in (("delete+create", LegacyRoundedButton), ("itemconfig", RoundedButton)):
+        calls, us, items = run(cls, root, events)
+        print(f"{name:16} {calls:16.1f} {us:10.1f} {items:13d}")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
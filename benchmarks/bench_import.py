@@ -0,0 +1,61 @@
+# Import-time budget for the headless core, measured with `python -X importtime`.
+#   python benchmarks/bench_import.py [--budget-ms 40] [--runs 5]
+# Exits non-zero if a module blows its budget or pulls in a forbidden module.
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# modules that must stay importable without a display or heavy deps
+CORE_MODULES = ["calc_core", "calc_units"]
+FORBIDDEN = ["tkinter", "_tkinter", "numpy"]
+
+
+def measure(modules):
+    code = "import sys; import {0}; print(','.join(m for m in {1!r} if m in sys.modules))".format(
+        ", ".join(modules), FORBIDDEN)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, self_us, cum_us, name = [p.strip() for p in line.replace("import time:", "|", 1).split("|")]
+        cumulative[name.strip()] = int(cum_us)
+    leaked = [m for m in proc.stdout.strip().split(",") if m]
+    return cumulative, leaked
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-ms", type=float, default=40.0,
+                    help="cumulative import budget per core module")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    best = {}
+    leaked = []
+    for _ in range(args.runs):
+        cumulative, leaked = measure(CORE_MODULES)
+        for mod in CORE_MODULES:
+            best[mod] = min(best.get(mod, float("inf")), cumulative.get(mod, 0))
+
+    failed = False
+    for mod in CORE_MODULES:
+        ms = best[mod] / 1000.0
+        status = "ok" if ms <= args.budget_ms else "OVER BUDGET"
+        failed |= ms > args.budget_ms
+        print(f"{mod:12} {ms:8.2f} ms  (budget {args.budget_ms:.1f} ms)  {status}")
+    if leaked:
+        failed = True
+        print("forbidden modules imported by the core: " + ", ".join(leaked))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Dense linear systems: pure Python against the NumPy/LAPACK backend.
+#   python benchmarks/bench_linalg.py [--n 500] [--no-baseline]
+# Times, for one random diagonally dominant n x n system:
+#   python     Gaussian elimination on lists (what a pure-Python sheet does)
+#   solve      calc_linalg.solve on ndarrays
+#   expr       safe_eval("solve(A, b)") with A and b as list literals
+#              (parse + compile once, then the cached evaluation)
+#   worksheet  A, b and x = solve(A, b) as cells, then a changed b
+#              (only b and x are recomputed)
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from calc_core import EvalEnv, safe_eval
+from calc_linalg import solve
+from calc_worksheet import Worksheet
+
+
+def gauss(a, b):
+    # partial pivoting, on copies
+    n = len(a)
+    a = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for k in range(n):
+        p = max(range(k, n), key=lambda i: abs(a[i][k]))
+        a[k], a[p] = a[p], a[k]
+        pivot = a[k]
+        for i in range(k + 1, n):
+            row = a[i]
+            f = row[k] / pivot[k]
+            for j in range(k, n + 1):
+                row[j] -= f * pivot[j]
+    x = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        s = a[i][n] - sum(a[i][j] * x[j] for j in range(i + 1, n))
+        x[i] = s / a[i][i]
+    return x
+
+
+def literal(rows):
+    return "[" + ", ".join("[" + ", ".join(repr(v) for v in r) + "]" for r in rows) + "]"
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Linear-system benchmark.")
+    ap.add_argument("--n", type=int, default=500)
+    ap.add_argument("--no-baseline", action="store_true", help="skip the pure-Python elimination")
+    args = ap.parse_args(argv)
+    n = args.n
+    rng = random.Random(1)
+    a = [[rng.random() + (n if i == j else 0.0) for j in range(n)] for i in range(n)]
+    b = [rng.random() for _ in range(n)]
+    A, B = np.array(a), np.array(b)
+
+    rows = []
+    if not args.no_baseline:
+        x_py, t = timed(lambda: gauss(a, b))
+        rows.append(("python", t))
+    x_np, t = timed(lambda: solve(A, B))
+    rows.append(("solve", min(t, min(timed(lambda: solve(A, B))[1] for _ in range(5)))))
+    if not args.no_baseline:
+        assert np.allclose(x_py, x_np)
+
+    env = EvalEnv()
+    expr = "solve({}, {})".format(literal(a), literal([b])[1:-1])
+    x_expr, t = timed(lambda: safe_eval(expr, env))
+    rows.append(("expr (first, parses)", t))
+    rows.append(("expr (cached)", min(timed(lambda: safe_eval(expr, env))[1] for _ in range(5))))
+    assert np.allclose(x_expr, x_np)
+
+    ws = Worksheet()
+    _, t = timed(lambda: (ws.define("A", literal(a)), ws.define("b", literal([b])[1:-1]),
+                          ws.define("x", "solve(A, b)")))
+    rows.append(("worksheet (build)", t))
+    _, t = timed(lambda: ws.define("b", literal([[2.0 * v for v in b]])[1:-1]))
+    rows.append(("worksheet (change b)", t))
+    assert np.allclose(ws.value("x"), 2.0 * x_np)
+
+    print("n = {}".format(n))
+    for name, t in rows:
+        print("{:24} {:>12.3f} ms".format(name, t * 1e3))
+
+
+if __name__ == "__main__":
+    main()
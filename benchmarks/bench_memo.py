@@ -0,0 +1,108 @@
+# Memoized pure functions (calc_memo): repeated-argument workloads.
+#   python benchmarks/bench_memo.py [--calls 20000]
+# Each workload evaluates one expression for arguments drawn from a small
+# set (standard angles, table rows), as a worksheet or a table column does,
+# with env.memoize off and on, in Deg and then Rad (the caches must not
+# mix the modes). Prints the time per evaluation, checks that every result
+# is identical, then the per-function hit rates, memory and whether the
+# function was excluded because its cache cost more than it saved. A last
+# check switches a memoized env between floats and two precisions and
+# compares every value with a plain env's.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calc_core import EvalEnv, compile_expr, safe_eval, _EVAL_GLOBALS
+from calc_memo import format_memo_stats, memo_stats
+
+ANGLES = [0, 15, 30, 45, 60, 75, 90, 120, 135, 150, 180, 210, 225, 270, 300, 315, 360]
+WORKLOADS = [
+    ("angles", "sin(a) + cos(a) * tan(a/2)", {"a": ANGLES}),
+    ("roots", "root(x, 3) + cbrt(x) + log(x, 2) + pow(x, 0.5)",
+     {"x": [1.5 * k for k in range(1, 25)]}),
+    ("binomial table", "fact(n) / (fact(k) * fact(n - k)) - binom(n, k)",
+     {"n": list(range(1100, 1110)), "k": list(range(1, 6))}),
+    ("log table", "lfact(n) + lgamma(n / 2) + ln(n) * log10(n)", {"n": list(range(2, 40))}),
+    # 40000! (about 69 KB) is over max_item_bytes: computed every time, never kept
+    ("huge factorials", "lfact(n) + log10(fact(n)) * 0", {"n": [20000, 40000]}),
+]
+
+
+def draws(choices, calls, seed=1):
+    rng = random.Random(seed)
+    names = sorted(choices)
+    return [{n: rng.choice(choices[n]) for n in names} for _ in range(calls)]
+
+
+def run(code, env, rows):
+    out = []
+    t0 = time.perf_counter()
+    for i, row in enumerate(rows):
+        if not i & 1023:
+            # pick up the namespace again, as a new worksheet pass would
+            # (an excluded function is then called directly)
+            ns = dict(env.namespace())
+        ns.update(row)
+        try:
+            out.append(eval(code, _EVAL_GLOBALS, ns))
+        except Exception as exc:
+            out.append(type(exc))
+    return out, (time.perf_counter() - t0) / len(rows)
+
+
+PRECISION_CHECK = ["sqrt(2)", "sqrt(fact(2))", "sin(30) + ln(3)", "binom(40, 3) / fact(7)", "root(10, 3)"]
+
+
+def check_precision():
+    # the same arguments in float mode and at two precisions: no mode may
+    # answer with a value cached in another
+    memo_env = EvalEnv()
+    memo_env.memoize = True
+    differ = []
+    for precision in (None, 30, None, 40, 30):
+        plain_env = EvalEnv()
+        plain_env.precision = memo_env.precision = precision
+        for src in PRECISION_CHECK:
+            a, b = safe_eval(src, plain_env), safe_eval(src, memo_env)
+            if type(a) is not type(b) or repr(a) != repr(b):
+                differ.append("{} (precision {})".format(src, precision))
+    return differ
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Memoization benchmark.")
+    ap.add_argument("--calls", type=int, default=20000, help="evaluations per workload and mode")
+    args = ap.parse_args(argv)
+
+    memo_env = EvalEnv()
+    memo_env.memoize = True
+    memo_env.namespace()    # calibrates the lookup cost once, outside the timings
+    failed = False
+    print("{:18} {:>4} {:>10} {:>10} {:>8}".format("workload", "mode", "plain", "memoized", "speedup"))
+    for name, src, choices in WORKLOADS:
+        code = compile_expr(src).code
+        rows = draws(choices, args.calls if name != "huge factorials" else 20)
+        for deg_mode in (True, False):
+            plain_env = EvalEnv()
+            plain_env.deg_mode = memo_env.deg_mode = deg_mode
+            plain, t_plain = run(code, plain_env, rows)
+            memo, t_memo = run(code, memo_env, rows)
+            if any(type(a) is not type(b) or repr(a) != repr(b) for a, b in zip(plain, memo)):
+                failed = True
+                print("{}: memoized results differ".format(name))
+            print("{:18} {:>4} {:>7.2f} us {:>7.2f} us {:>7.2f}x".format(
+                name, "deg" if deg_mode else "rad", t_plain * 1e6, t_memo * 1e6, t_plain / t_memo))
+    print()
+    print(format_memo_stats(memo_stats(memo_env)))
+    for case in check_precision():
+        failed = True
+        print("memoized result differs after a precision switch: " + case)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
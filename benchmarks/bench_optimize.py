@@ -0,0 +1,116 @@
+# Expression optimizer (calc_optimize): speedup and bit-identical results.
+#   python benchmarks/bench_optimize.py [--points 2000]
+# Two workloads, each timed with the optimizer off and on:
+#   safe_eval   the suite's calculator corpus (Deg and Rad), evaluated
+#               repeatedly as in the server and the worksheet; constant
+#               subtrees fold away
+#   plot        expressions in x evaluated point by point as the Plot tab's
+#               scalar path does; repeated calls are shared, pi/180-style
+#               constants folded
+# Every result is compared bit for bit (repr, type and sign of zero) with
+# the unoptimized value; any difference makes the script exit non-zero.
+import argparse
+import math
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calc_core import EvalEnv, compile_expr, safe_eval, set_optimizer, _EVAL_GLOBALS
+from calc_optimize import optimize_code
+from suite import CORPUS
+
+PLOT = [
+    "sin(x)^2 + cos(x)^2 + sin(x)*cos(x)",
+    "sin(x*(pi/180)) + cos(x*(pi/180))",
+    "exp(-x^2/2) / sqrt(2*pi)",
+    "sqrt(x^2 + 1) + 1/sqrt(x^2 + 1) + x/sqrt(x^2 + 1)",
+    "ln(abs(x) + 1)^2 - ln(abs(x) + 1) + sin(2*x) * sin(2*x)",
+    "x^3 * 1 - 0.5 * x^2 + --x - 0",
+    "atan(x) * (180/pi) + tan(x)^2 / (1 + tan(x)^2)",
+]
+
+
+def same(a, b):
+    # bitwise: 0.0 and -0.0 or 1 and 1.0 count as different
+    if type(a) is not type(b):
+        return False
+    if type(a) is float and (math.isnan(a) or math.isnan(b)):
+        return math.isnan(a) and math.isnan(b)
+    return repr(a) == repr(b)
+
+
+def run(fn, exprs, number):
+    return min(timeit.repeat(lambda: [fn(e) for e in exprs], number=number, repeat=5)) / number / len(exprs)
+
+
+def bench_safe_eval(mismatches):
+    rows = []
+    for group, exprs in CORPUS.items():
+        env = EvalEnv()
+        env.deg_mode = group != "trig_rad"
+        timings = []
+        results = []
+        for on in (False, True):
+            set_optimizer(on)
+            for e in exprs:
+                safe_eval(e, env)   # the second run in a mode is the optimized one
+            results.append([safe_eval(e, env) for e in exprs])
+            timings.append(run(lambda e: safe_eval(e, env), exprs, 5000))
+        mismatches.extend(e for e, a, b in zip(exprs, *results) if not same(a, b))
+        rows.append((group, timings[0], timings[1]))
+    set_optimizer(True)
+    return rows
+
+
+def bench_plot(points, mismatches):
+    rows = []
+    xs = [-5.0 + 10.0 * k / (points - 1) for k in range(points)]
+    for deg_mode in (True, False):
+        env = EvalEnv()
+        env.deg_mode = deg_mode
+        for src in PLOT:
+            compiled = compile_expr(src)
+            fast = optimize_code(compiled, env, {"x"}, real_vars=True)
+            ns = dict(env.namespace())
+            timings = []
+            outputs = []
+            for code in (compiled.code, fast):
+                def loop():
+                    out = []
+                    for x in xs:
+                        ns["x"] = x
+                        try:
+                            out.append(eval(code, _EVAL_GLOBALS, ns))
+                        except Exception as exc:
+                            out.append(type(exc))
+                    return out
+                outputs.append(loop())
+                timings.append(min(timeit.repeat(loop, number=1, repeat=5)) / points)
+            if not all(same(a, b) for a, b in zip(*outputs)):
+                mismatches.append(src)
+            rows.append(("{} ({})".format(src, "deg" if deg_mode else "rad"), timings[0], timings[1]))
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Expression optimizer benchmark.")
+    ap.add_argument("--points", type=int, default=2000, help="x values per plot expression")
+    args = ap.parse_args(argv)
+    mismatches = []
+    for title, rows in (("safe_eval", bench_safe_eval(mismatches)),
+                        ("plot", bench_plot(args.points, mismatches))):
+        print("{:60} {:>10} {:>10} {:>8}".format(title, "plain", "optimized", "speedup"))
+        for name, plain, fast in rows:
+            print("{:60} {:>7.3f} us {:>7.3f} us {:>7.2f}x".format(name[:60], plain * 1e6, fast * 1e6, plain / fast))
+        total_plain = sum(r[1] for r in rows)
+        total_fast = sum(r[2] for r in rows)
+        print("{:60} {:>21} {:>7.2f}x\n".format("overall", "", total_plain / total_fast))
+    if mismatches:
+        print("results differ for: " + "; ".join(mismatches))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Cost of arbitrary-precision evaluation per digit, against the float path.
+#   python benchmarks/bench_precision.py [repeats]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calc_core import EvalEnv, safe_eval
+
+CORPUS = [
+    "sin(30) + cos(45) * tan(60)",
+    "ln(2) * sqrt(3) + exp(1.5)",
+    "cbrt(7) / root(10, 5) + log(8, 3)",
+    "asin(0.5) + acos(0.2) + atan(3)",
+    "pi * e ^ 2 - 1/7",
+]
+DIGITS = [15, 30, 50, 100, 200, 400]
+
+
+def per_eval_us(env, repeats):
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for expr in CORPUS:
+            safe_eval(expr, env)
+    return (time.perf_counter() - t0) / (repeats * len(CORPUS)) * 1e6
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    env = EvalEnv()
+    per_eval_us(env, 1)     # warm the compile cache
+    base = per_eval_us(env, repeats * 20)
+    print(f"{'digits':>6} {'cold us':>10} {'warm us':>10} {'x float':>9} {'us/digit':>9}")
+    print(f"{'float':>6} {'':>10} {base:10.2f} {1.0:9.1f}")
+    for d in DIGITS:
+        env.precision = d
+        t0 = time.perf_counter()
+        for expr in CORPUS:
+            safe_eval(expr, env)
+        # first pass builds the constant/coefficient caches for this precision
+        cold = (time.perf_counter() - t0) / len(CORPUS) * 1e6
+        warm = per_eval_us(env, repeats)
+        print(f"{d:6d} {cold:10.1f} {warm:10.1f} {warm / base:9.1f} {warm / d:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Live-preview latency: typing a long expression one character at a time.
+#   python benchmarks/bench_preview.py [--budget-ms 16] [--rounds 3]
+# For every keystroke of each expression (about 300 characters) this times
+#   preview    LivePreview.evaluate on the text typed so far (the work done
+#              per frame on the preview thread; cached terms are reused)
+#   scratch    the same text compiled and evaluated whole, caches cleared
+#   threaded   submit() until poll() returns the result, as the GUI sees it
+# and checks that every preview equals the whole-expression result. Exits
+# non-zero if a keystroke's preview (or threaded round trip) exceeds the budget.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calc_core import EvalEnv, clear_cache, format_result, safe_eval
+from calc_preview import LivePreview
+
+EXPRESSIONS = [
+    "sin(30)^2 + cos(30)^2 - tan(45) * sin(90) + sqrt(2) * 3 - fact(10) / fact(8) "
+    "+ integrate(x^2, x, 0, 3) - diff(x^3, x, 2) + log10(1000) * ln(e^2) - cbrt(27) "
+    "+ root(81, 4) - (1.5 + 2.25) * (3.125 - 4.0625) / (5.5 + 6.75) + 7^2 - 100 % 7 "
+    "+ 100 // 7 - asin(0.5) + acos(0.5) - atan(1) / sin(15) + exp(1) - pi",
+    "solve(x^2 - 2, x, 1) + solve(cos(x) - x/100, x, 1) - sqrt(sqrt(sqrt(256))) "
+    "+ fact(12) / (fact(4) * fact(8)) - 2^10 + 3^7 - 4^5 * 5^3 / 6^2 + binom(30, 15) "
+    "- lgamma(10.5) + sin(1)^2 + cos(1)^2 - 1.5e-3 * 2e+4 + (((((1 + 2) * 3) - 4) / 5) + 6) * 7 "
+    "- 8 + 9 / 10 + integrate(sin(x), x, 0, 90) - log(8, 2) + pow(2, 0.5)",
+]
+
+
+def percentile(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def expected(text, env):
+    try:
+        value = safe_eval(text, env)
+        out = "" if callable(value) else format_result(value)
+    except Exception:
+        return ""
+    return "" if out == text.strip() else out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Live-preview latency benchmark.")
+    ap.add_argument("--budget-ms", type=float, default=16.0, help="per-keystroke budget (one frame)")
+    ap.add_argument("--rounds", type=int, default=3, help="fresh typing sessions per expression")
+    args = ap.parse_args(argv)
+    env = EvalEnv()
+    # calculus pulls in calc_sampling (and NumPy) on first use; the GUI has
+    # imported them at start-up, so this one-off import is not a keystroke
+    safe_eval("integrate(x, x, 0, 1)", env)
+
+    times = {"preview": [], "scratch": [], "threaded": []}
+    mismatches = 0
+    for text in EXPRESSIONS:
+        prefixes = [text[:k] for k in range(1, len(text) + 1)]
+        for _ in range(args.rounds):
+            clear_cache()
+            preview = LivePreview()
+            for prefix in prefixes:
+                t0 = time.perf_counter()
+                shown = preview.evaluate(prefix)
+                times["preview"].append(time.perf_counter() - t0)
+                if shown != expected(prefix, env):
+                    mismatches += 1
+            for prefix in prefixes:
+                clear_cache()
+                t0 = time.perf_counter()
+                expected(prefix, env)
+                times["scratch"].append(time.perf_counter() - t0)
+        clear_cache()
+        preview = LivePreview()
+        for prefix in prefixes:
+            t0 = time.perf_counter()
+            preview.submit(prefix)
+            while preview.busy:
+                time.sleep(0.0002)
+            preview.poll()
+            times["threaded"].append(time.perf_counter() - t0)
+        preview.close()
+
+    print("{} expressions, {} keystrokes each round".format(
+        len(EXPRESSIONS), sum(len(t) for t in EXPRESSIONS)))
+    print("{:10} {:>10} {:>10} {:>10}".format("", "median", "p99", "max"))
+    for name, vals in times.items():
+        vals.sort()
+        print("{:10} {:>7.3f} ms {:>7.3f} ms {:>7.3f} ms".format(
+            name, percentile(vals, 0.5) * 1e3, percentile(vals, 0.99) * 1e3, vals[-1] * 1e3))
+    worst = max(times["preview"][-1], times["threaded"][-1]) * 1e3
+    failed = worst > args.budget_ms or mismatches
+    if mismatches:
+        print("{} previews differ from the whole-expression result".format(mismatches))
+    print("worst keystroke {:.3f} ms (budget {:.1f} ms)  {}".format(
+        worst, args.budget_ms, "OVER BUDGET" if worst > args.budget_ms else "ok"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
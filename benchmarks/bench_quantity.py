@@ -0,0 +1,64 @@
+# Per-operation overhead of unit-carrying quantities versus plain floats.
+#   python benchmarks/bench_quantity.py [iterations]
+# Also checks that dimension exponents beyond the packed range (-128..127)
+# raise DimensionError instead of carrying into the next dimension.
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from calc_core import EvalEnv, safe_eval
+from calc_quantity import UNITS, DimensionError, Quantity
+
+BUDGET_US = 3.0     # per quantity operation, on top of the float operation
+# each must raise DimensionError (m^200 would otherwise print as kg/m^56)
+OVERFLOW = ["m**100 * m**100", "m**200", "(m**64)**2", "m**100 / m**-100", "1 / m**-128"]
+
+
+def check_overflow(env):
+    failed = []
+    for expr in OVERFLOW:
+        try:
+            val = safe_eval(expr, env)
+        except DimensionError:
+            continue
+        failed.append("{} = {}".format(expr, val))
+    return failed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    km, h, m = (Quantity(UNITS[u].scale, UNITS[u].dims, UNITS[u]) for u in ("km", "h", "m"))
+    a = 3 * km
+    b = 500 * m
+    cases = [
+        ("scale (3 * km)", lambda: 3 * km, lambda: 3 * 1000.0),
+        ("divide (a / h)", lambda: a / h, lambda: 3000.0 / 3600.0),
+        ("multiply (a * h)", lambda: a * h, lambda: 3000.0 * 3600.0),
+        ("add, checked (a + b)", lambda: a + b, lambda: 3000.0 + 500.0),
+        ("power (a ** 2)", lambda: a ** 2, lambda: 3000.0 ** 2),
+    ]
+    failed = False
+    print(f"{'operation':24} {'quantity us':>12} {'float us':>10} {'overhead us':>12}")
+    for name, q_op, f_op in cases:
+        tq = min(timeit.repeat(q_op, number=n, repeat=5)) / n * 1e6
+        tf = min(timeit.repeat(f_op, number=n, repeat=5)) / n * 1e6
+        over = tq - tf
+        failed |= over > BUDGET_US
+        print(f"{name:24} {tq:12.3f} {tf:10.3f} {over:12.3f}{'  OVER BUDGET' if over > BUDGET_US else ''}")
+
+    env = EvalEnv()
+    env.units = True
+    expr = "3 km/h * 2 h + 500 m"
+    safe_eval(expr, env)
+    t = min(timeit.repeat(lambda: safe_eval(expr, env), number=n // 10, repeat=5)) / (n // 10) * 1e6
+    print(f"\nsafe_eval({expr!r}) = {safe_eval(expr, env)}: {t:.2f} us")
+    for case in check_overflow(env):
+        failed = True
+        print("dimension overflow not detected: " + case)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Compare evaluate_many() with a per-element safe_eval loop.
+#   python benchmarks/bench_vector.py [n_points]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from calc_core import EvalEnv, safe_eval
+from calc_vector import evaluate_many
+
+EXPRS = [
+    "sin(x)*exp(-x/10)",
+    "sqrt(abs(x)) + cbrt(x - 5)",
+    "log(x + 1, 2) + root(x, 3)",
+    "cos(x)^2 + sin(x)^2",
+]
+
+
+def per_element(expr, xs, env):
+    ns = env.namespace()
+    out = np.empty(len(xs))
+    for i, x in enumerate(xs.tolist()):
+        ns['x'] = x
+        out[i] = safe_eval(expr, env)
+    del ns['x']
+    return out
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    xs = np.linspace(0.0, 100.0, n)
+    env = EvalEnv()
+    print(f"{'expression':32} {'loop s':>9} {'batch s':>9} {'speedup':>9} {'max |diff|':>11}")
+    for expr in EXPRS:
+        t0 = time.perf_counter()
+        ref = per_element(expr, xs, env)
+        t1 = time.perf_counter()
+        got = evaluate_many(expr, env, x=xs)
+        t2 = time.perf_counter()
+        diff = float(np.max(np.abs(ref - got)))
+        print(f"{expr:32} {t1 - t0:9.4f} {t2 - t1:9.4f} {(t1 - t0) / (t2 - t1):8.1f}x {diff:11.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# Reproducible benchmark suite with machine-readable results.
+#   python benchmarks/suite.py run [--out results.json] [--quick] [--only eval,namespace,convert,button]
+#   python benchmarks/suite.py compare baseline.json results.json [--threshold 10]
+# `run` writes every metric as {"value", "unit", "better"} together with the
+# machine it ran on; `compare` prints the change per metric and exits
+# non-zero when one regressed by more than the threshold (percent).
+# The button group needs a display; without one an Xvfb server is started
+# if the binary is installed, otherwise the group is recorded as skipped.
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from calc_core import EvalEnv, safe_eval, clear_cache
+from calc_units import CATEGORIES, convert, units_for
+
+# representative calculator input, grouped by kind
+CORPUS = {
+    "trig_deg": [
+        "sin(30) + cos(60)", "tan(45) * sin(90)", "asin(0.5) + acos(0.5)",
+        "atan(1) / sin(15)", "sin(30)^2 + cos(30)^2",
+    ],
+    "trig_rad": [
+        "sin(pi/6) + cos(pi/3)", "tan(pi/4) * sin(pi/2)", "asin(0.5) + acos(0.5)",
+        "atan(1) / sin(pi/12)", "sin(1)^2 + cos(1)^2",
+    ],
+    "nested_roots": [
+        "sqrt(sqrt(sqrt(256)))", "cbrt(sqrt(64)) + root(81, 4)", "sqrt(2 + sqrt(2 + sqrt(2)))",
+        "root(root(1e12, 3), 2)", "sqrt(cbrt(27) * root(32, 5))",
+    ],
+    "factorials": [
+        "fact(10)", "fact(20) / fact(18)", "fact(5) + fact(6) + fact(7)",
+        "fact(100) // fact(98)", "fact(12) / (fact(4) * fact(8))",
+    ],
+    "arith_chains": [
+        "1 + 2 - 3 * 4 / 5 + 6 - 7 * 8 / 9 + 10",
+        "((1.5 + 2.25) * (3.125 - 4.0625)) / (5.5 + 6.75) - 7 ** 2",
+        "2^10 + 3^7 - 4^5 * 5^3 / 6^2",
+        "(((((1 + 2) * 3) - 4) / 5) + 6) * 7 - 8 + 9 / 10",
+        "100 % 7 + 100 // 7 - 100 / 7 * 1.5 + -3 - -4",
+    ],
+}
+
+
+def _min_per_call(fn, number, repeat):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def _metric(value, unit, better):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def _percentile(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+# ------------------------------
+# Groups
+# ------------------------------
+def bench_eval(scale):
+    out = {}
+    for group, exprs in CORPUS.items():
+        env = EvalEnv()
+        env.deg_mode = group != "trig_rad"
+        for e in exprs:
+            safe_eval(e, env)
+        number = 2000 * scale
+
+        def loop():
+            for e in exprs:
+                safe_eval(e, env)
+        per_eval = _min_per_call(loop, max(1, number // len(exprs)), 5) / len(exprs)
+        # latency distribution of single warm calls
+        samples = []
+        gc.disable()
+        try:
+            for _ in range(400 * scale):
+                for e in exprs:
+                    t0 = time.perf_counter_ns()
+                    safe_eval(e, env)
+                    samples.append(time.perf_counter_ns() - t0)
+        finally:
+            gc.enable()
+        samples.sort()
+        # cold: parse + validate + compile on an empty cache
+        cold = []
+        for _ in range(5):
+            clear_cache()
+            t0 = time.perf_counter()
+            for e in exprs:
+                safe_eval(e, env)
+            cold.append((time.perf_counter() - t0) / len(exprs))
+        prefix = "safe_eval." + group
+        out[prefix + ".per_s"] = _metric(1.0 / per_eval, "eval/s", "higher")
+        out[prefix + ".p50_us"] = _metric(_percentile(samples, 0.50) / 1000.0, "us", "lower")
+        out[prefix + ".p99_us"] = _metric(_percentile(samples, 0.99) / 1000.0, "us", "lower")
+        out[prefix + ".cold_us"] = _metric(min(cold) * 1e6, "us", "lower")
+    return out
+
+
+def bench_namespace(scale):
+    env = EvalEnv()
+    build = _min_per_call(env._build_namespace, 5000 * scale, 5)
+
+    def toggled():
+        # the rebuild a Deg/Rad toggle causes on the next evaluation
+        env.toggle_deg()
+        env.namespace()
+    rebuild = _min_per_call(toggled, 5000 * scale, 5)
+    cached = _min_per_call(env.namespace, 50000 * scale, 5)
+    return {
+        "namespace.build_us": _metric(build * 1e6, "us", "lower"),
+        "namespace.rebuild_after_toggle_us": _metric(rebuild * 1e6, "us", "lower"),
+        "namespace.cached_us": _metric(cached * 1e6, "us", "lower"),
+    }
+
+
+def bench_convert(scale):
+    out = {}
+    for cat in CATEGORIES:
+        units = units_for(cat)
+        pairs = [(a, b) for a in units for b in units]
+
+        def loop():
+            for a, b in pairs:
+                convert(1.5, cat, a, b)
+        per = _min_per_call(loop, max(1, 2000 * scale // len(pairs)), 5) / len(pairs)
+        out["convert.{}.per_s".format(cat)] = _metric(1.0 / per, "conv/s", "higher")
+    try:
+        import numpy as np
+        from calc_units import convert_array
+    except ImportError:
+        return out
+    values = np.linspace(-100.0, 100.0, 1_000_000)
+    for cat in CATEGORIES:
+        a, b = units_for(cat)[0], units_for(cat)[-1]
+        per = _min_per_call(lambda: convert_array(values, cat, a, b), 3, 3)
+        out["convert_array.{}.mvalues_per_s".format(cat)] = _metric(values.size / per / 1e6, "Mvalues/s", "higher")
+    return out
+
+
+def _virtual_display():
+    # an Xvfb server for headless machines; returns the process to stop, or None
+    if os.environ.get("DISPLAY"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None
+    display = ":{}".format(90 + os.getpid() % 100)
+    proc = subprocess.Popen([xvfb, display, "-screen", "0", "1024x768x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    return proc
+
+
+def bench_button(scale):
+    xvfb = _virtual_display()
+    try:
+        import tkinter as tk
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            return {"button.skipped": str(e)}
+        from scientific_calc import RoundedButton
+        root.withdraw()
+        buttons = [RoundedButton(root, text=str(i), width=88, height=54) for i in range(40)]
+        for b in buttons:
+            b.pack(side="left")
+        root.update()
+        n = 2000 * scale
+
+        def sweep():
+            for b in buttons:
+                b._draw(b.hover_col)
+                b._draw(b.bg)
+        per = _min_per_call(sweep, max(1, n // 80), 5) / 80
+        create = _min_per_call(lambda: RoundedButton(root, text="x", width=88, height=54).destroy(), 200, 3)
+        root.destroy()
+        return {
+            "button.draw_us": _metric(per * 1e6, "us", "lower"),
+            "button.create_us": _metric(create * 1e6, "us", "lower"),
+        }
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+            del os.environ["DISPLAY"]
+
+
+GROUPS = {
+    "eval": bench_eval,
+    "namespace": bench_namespace,
+    "convert": bench_convert,
+    "button": bench_button,
+}
+
+# ------------------------------
+# Commands
+# ------------------------------
+def _meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run(args):
+    scale = 1 if args.quick else 5
+    names = args.only.split(",") if args.only else list(GROUPS)
+    results = {}
+    for name in names:
+        t0 = time.perf_counter()
+        results.update(GROUPS[name](scale))
+        print("{:10} done in {:.1f}s".format(name, time.perf_counter() - t0), file=sys.stderr)
+    doc = {"meta": _meta(), "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+    for key, m in sorted(results.items()):
+        if isinstance(m, dict):
+            print("{:52} {:>14.4g} {}".format(key, m["value"], m["unit"]))
+        else:
+            print("{:52} {}".format(key, m))
+    print("wrote " + args.out, file=sys.stderr)
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        old = json.load(f)["results"]
+    with open(args.current, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    limit = args.threshold / 100.0
+    regressions = 0
+    print("{:52} {:>12} {:>12} {:>8}".format("metric", "baseline", "current", "change"))
+    for key in sorted(set(old) & set(new)):
+        a, b = old[key], new[key]
+        if not (isinstance(a, dict) and isinstance(b, dict)) or not a["value"]:
+            continue
+        change = (b["value"] - a["value"]) / a["value"]
+        worse = -change if a["better"] == "higher" else change
+        flag = ""
+        if worse > limit:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif worse < -limit:
+            flag = "  improved"
+        print("{:52} {:12.4g} {:12.4g} {:+7.1f}%{}".format(key, a["value"], b["value"], change * 100, flag))
+    for key in sorted(set(old) ^ set(new)):
+        print("{:52} only in {}".format(key, "baseline" if key in old else "current"))
+    print("{} regression(s) beyond {:.0f}%".format(regressions, args.threshold))
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Calculator benchmark suite.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("run", help="run the benchmarks and write JSON results")
+    r.add_argument("--out", default="bench_results.json")
+    r.add_argument("--quick", action="store_true", help="fewer iterations (noisier)")
+    r.add_argument("--only", default=None, help="comma-separated groups: " + ",".join(GROUPS))
+    c = sub.add_parser("compare", help="flag regressions against a baseline")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    args = ap.parse_args(argv)
+    return run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+# ------------------------------
+# Numerical calculus: derivatives, integrals, roots
+# ------------------------------
+# Everything works on batch functions (a list of x values -> list of floats,
+# nan where the expression fails; see calc_sampling.make_batch_function), so
+# an expression is compiled once and each round of evaluations is a single
+# vectorized call instead of one safe_eval per point:
+#   derivative  central differences on a shrinking step, refined by
+#               Richardson extrapolation (Ridders' tableau)
+#   integral    globally adaptive Gauss-Kronrod G7/K15; every interval that
+#               needs splitting is evaluated in the same batch; infinite
+#               limits are mapped onto a finite range
+#   find_root   Brent's method; the bracket is found by stepping out from
+#               the guess in one batch
+# Each returns CalculusResult(value, error, evals).
+#
+# diff/integrate/solve take an expression string and a variable name. They
+# back the calculator functions of the same names: compile_expr turns
+# diff(x^2, x, 3) into diff('x ** 2', 'x', 3, ...) so the inner expression is
+# compiled on its own, once.
+import math
+from collections import namedtuple
+
+from calc_core import EvalEnv
+
+CalculusResult = namedtuple("CalculusResult", ["value", "error", "evals"])
+
+_EPS = 2.220446049250313e-16
+
+
+def _values(f, xs):
+    return [float(y) for y in f(xs)]
+
+# ------------------------------
+# Derivative (Ridders / Richardson)
+# ------------------------------
+def derivative(f, x, h=None, steps=10, shrink=1.4):
+    """First derivative of the batch function ``f`` at ``x``."""
+    x = float(x)
+    if h is None:
+        h = 0.1 * max(1.0, abs(x))
+    hs = [h / shrink ** i for i in range(steps)]
+    # every step size in one batch: x+h0, x-h0, x+h1, x-h1, ...
+    ys = _values(f, [x + s * d for d in hs for s in (1.0, -1.0)])
+    central = [(ys[2 * i] - ys[2 * i + 1]) / (2.0 * d) for i, d in enumerate(hs)]
+    # start the tableau after the last step that left the domain
+    start = 0
+    for i, c in enumerate(central):
+        if not math.isfinite(c):
+            start = i + 1
+    if start >= steps:
+        raise ValueError("derivative is not defined at {}".format(x))
+
+    con2 = shrink * shrink
+    best, err = central[start], math.inf
+    prev = [central[start]]
+    for i in range(start + 1, steps):
+        row = [central[i]]
+        fac = con2
+        for j in range(1, i - start + 1):
+            row.append((row[j - 1] * fac - prev[j - 1]) / (fac - 1.0))
+            fac *= con2
+            errt = max(abs(row[j] - row[j - 1]), abs(row[j] - prev[j - 1]))
+            if errt <= err:
+                err, best = errt, row[j]
+        # higher orders stopped helping: round-off has taken over
+        if abs(row[-1] - prev[-1]) >= 2.0 * err:
+            break
+        prev = row
+    if not math.isfinite(err):
+        err = abs(best) * _EPS
+    return CalculusResult(best, err, len(ys))
+
+# ------------------------------
+# Integral (adaptive Gauss-Kronrod 7/15)
+# ------------------------------
+_XGK = (
+    0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245, 0.000000000000000000000000000000000,
+)
+_WGK = (
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714,
+)
+# Gauss weights for the odd Kronrod nodes (1, 3, 5) and the centre
+_WG = (
+    0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975, 0.417959183673469387755102040816327,
+)
+# unit-interval nodes in evaluation order: -x0..-x6, 0, x6..x0
+_NODES = tuple(-n for n in _XGK[:7]) + (0.0,) + tuple(reversed(_XGK[:7]))
+
+
+def _gk15(ys, half):
+    centre = ys[7]
+    k = centre * _WGK[7]
+    g = centre * _WG[3]
+    for j in range(7):
+        pair = ys[j] + ys[14 - j]
+        k += _WGK[j] * pair
+        if j % 2:
+            g += _WG[j // 2] * pair
+    return k * half, abs((k - g) * half)
+
+
+def _mapped(f, a, b):
+    """(g, lo, hi) with the integral of f over [a, b] equal to that of g over [lo, hi]."""
+    if math.isfinite(a) and math.isfinite(b):
+        return f, a, b
+    if math.isinf(a) and math.isinf(b):
+        # x = t / (1 - t^2) on (-1, 1)
+        def g(ts):
+            xs = [t / (1.0 - t * t) for t in ts]
+            return [y * (1.0 + t * t) / (1.0 - t * t) ** 2 for t, y in zip(ts, _values(f, xs))]
+        return g, -1.0, 1.0
+    if math.isinf(b):
+        # x = a + t / (1 - t) on [0, 1)
+        def g(ts):
+            xs = [a + t / (1.0 - t) for t in ts]
+            return [y / (1.0 - t) ** 2 for t, y in zip(ts, _values(f, xs))]
+        return g, 0.0, 1.0
+    # x = b - (1 - t) / t on (0, 1]
+    def g(ts):
+        xs = [b - (1.0 - t) / t for t in ts]
+        return [y / (t * t) for t, y in zip(ts, _values(f, xs))]
+    return g, 0.0, 1.0
+
+
+def integral(f, a, b, abs_tol=1e-10, rel_tol=1e-10, max_evals=200_000):
+    """Definite integral of the batch function ``f`` over [a, b].
+
+    The error is the summed |K15 - G7| of the final intervals. If the
+    tolerance is not reached within ``max_evals`` the best estimate is
+    returned with its (larger) error.
+    """
+    a, b = float(a), float(b)
+    if a == b:
+        return CalculusResult(0.0, 0.0, 0)
+    sign = 1.0
+    if a > b:
+        a, b, sign = b, a, -1.0
+    g, lo, hi = _mapped(f, a, b)
+    width = hi - lo
+
+    evals = 0
+    done_val = done_err = 0.0
+    pending = [(lo, hi)]
+    while pending:
+        xs = []
+        for x0, x1 in pending:
+            mid, half = (x0 + x1) / 2, (x1 - x0) / 2
+            xs.extend(mid + half * n for n in _NODES)
+        ys = _values(g, xs)
+        evals += len(xs)
+        parts = []
+        for i, (x0, x1) in enumerate(pending):
+            val, err = _gk15(ys[15 * i:15 * i + 15], (x1 - x0) / 2)
+            if not math.isfinite(val):
+                raise ValueError("integrand is not finite on [{:g}, {:g}]".format(x0, x1))
+            parts.append((x0, x1, val, err))
+        total = done_val + sum(p[2] for p in parts)
+        tol = max(abs_tol, rel_tol * abs(total))
+        active_err = sum(p[3] for p in parts)
+        if done_err + active_err <= tol or evals + 30 * len(parts) > max_evals:
+            return CalculusResult(sign * total, done_err + active_err, evals)
+        pending = []
+        for x0, x1, val, err in parts:
+            # an interval keeps its share of the tolerance, or is split in two
+            if err <= tol * (x1 - x0) / width or x1 - x0 <= 4 * _EPS * max(1.0, abs(x0)):
+                done_val += val
+                done_err += err
+            else:
+                m = (x0 + x1) / 2
+                pending.append((x0, m))
+                pending.append((m, x1))
+    return CalculusResult(sign * done_val, done_err, evals)
+
+# ------------------------------
+# Root (Brent)
+# ------------------------------
+def _bracket(f, guess, steps=40):
+    # guess +- s*2^k for k = 0..steps, all in one batch; nearest sign change wins
+    s = 0.01 * max(1.0, abs(guess))
+    offsets = [s * 2.0 ** k for k in range(steps)]
+    xs = [guess - d for d in reversed(offsets)] + [guess] + [guess + d for d in offsets]
+    ys = _values(f, xs)
+    centre = steps
+    if ys[centre] == 0.0:
+        return guess, guess, 0.0, 0.0, len(xs)
+    for k in range(steps):
+        for i in (centre + k, centre - k - 1):
+            y0, y1 = ys[i], ys[i + 1]
+            if math.isfinite(y0) and math.isfinite(y1) and (y0 < 0.0) != (y1 < 0.0):
+                return xs[i], xs[i + 1], y0, y1, len(xs)
+    raise ValueError("no sign change found near {:g}".format(guess))
+
+
+def find_root(f, guess, hi=None, xtol=1e-12, max_iter=200):
+    """Root of the batch function ``f`` near ``guess``, or inside [guess, hi]."""
+    guess = float(guess)
+    if hi is None:
+        a, b, fa, fb, evals = _bracket(f, guess)
+        if fa == 0.0:
+            return CalculusResult(a, 0.0, evals)
+    else:
+        a, b = guess, float(hi)
+        fa, fb = _values(f, [a, b])
+        evals = 2
+        if fa == 0.0:
+            return CalculusResult(a, 0.0, evals)
+        if not (math.isfinite(fa) and math.isfinite(fb)) or (fa < 0.0) == (fb < 0.0):
+            raise ValueError("f has no sign change on [{:g}, {:g}]".format(a, b))
+    if fb == 0.0:
+        return CalculusResult(b, 0.0, evals)
+
+    c, fc = a, fa
+    d = e = b - a
+    m = 0.0
+    for _ in range(max_iter):
+        if (fb < 0.0) == (fc < 0.0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2.0 * _EPS * abs(b) + 0.5 * xtol
+        m = 0.5 * (c - b)
+        if abs(m) <= tol or fb == 0.0:
+            break
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            # inverse quadratic interpolation, or secant when a == c
+            s = fb / fa
+            if a == c:
+                p, q = 2.0 * m * s, 1.0 - s
+            else:
+                q, r = fa / fc, fb / fc
+                p = s * (2.0 * m * q * (q - r) - (b - a) * (r - 1.0))
+                q = (q - 1.0) * (r - 1.0) * (s - 1.0)
+            if p > 0.0:
+                q = -q
+            p = abs(p)
+            if 2.0 * p < min(3.0 * m * q - abs(tol * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = m
+        else:
+            d = e = m
+        a, fa = b, fb
+        b += d if abs(d) > tol else math.copysign(tol, m)
+        fb = _values(f, [b])[0]
+        evals += 1
+        if not math.isfinite(fb):
+            raise ValueError("f is not finite at {:g}".format(b))
+    # a sign change across a pole (tan, 1/x) is not a root
+    if abs(fb) > 1e-6 * max(1.0, abs(fa), abs(fc)):
+        raise ValueError("no root found near {:g} (discontinuity?)".format(b))
+    # half the final bracket (0 for an exact hit)
+    return CalculusResult(b, abs(m), evals)
+
+# ------------------------------
+# Expression API
+# ------------------------------
+def _batch(expr, var, env, bound):
+    from calc_sampling import make_batch_function
+    if env is not None and bound:
+        # names the calling namespace resolves to its own functions are
+        # rebuilt by the batch function (vectorized where possible)
+        base = env.namespace()
+        bound = {k: v for k, v in bound.items() if base.get(k) is not v}
+    snap = EvalEnv()
+    if env is not None:
+        snap.deg_mode = env.deg_mode
+        snap.units = env.units
+    # calculus runs in floats even when the calculator is in precision mode
+    return make_batch_function(expr, snap, var, bound)
+
+
+def diff(expr, var, at, env=None, bound=None, **options):
+    """d(expr)/d(var) at ``at``; ``bound`` gives values for other free names."""
+    return derivative(_batch(expr, var, env, bound), at, **options)
+
+
+def integrate(expr, var, a, b, env=None, bound=None, **options):
+    return integral(_batch(expr, var, env, bound), a, b, **options)
+
+
+def solve(expr, var, guess, hi=None, env=None, bound=None, **options):
+    """Solve expr = 0 for ``var`` near ``guess`` (or between guess and hi)."""
+    return find_root(_batch(expr, var, env, bound), guess, hi, **options)
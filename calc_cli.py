@@ -0,0 +1,162 @@
+# ------------------------------
+# Streaming batch evaluator (command line)
+# ------------------------------
+# Reads one expression per line from files or stdin and writes one output
+# line per input line, in input order:
+#
+#   python calc_cli.py --rad exprs.txt
+#   cat exprs.txt | python calc_cli.py --jobs 8
+#
+# Work is a generator pipeline: lines are read lazily, grouped into chunks
+# and dispatched to a process pool with a bounded number of chunks in
+# flight, so memory stays flat no matter how large the input is. A line
+# that fails prints "Error: ..." in its slot instead of aborting the run;
+# every line runs under calc_guard limits so a pathological expression
+# cannot stall a worker.
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from calc_core import EvalEnv, format_result
+from calc_guard import Limits, guarded_eval
+
+_worker_env = None
+_worker_limits = None
+
+
+def _make_env(deg_mode, precision, complex_mode=False):
+    env = EvalEnv()
+    env.deg_mode = deg_mode
+    env.precision = precision
+    env.complex = complex_mode
+    return env
+
+
+def _init_worker(deg_mode, limits, precision=None, complex_mode=False):
+    global _worker_env, _worker_limits
+    _worker_env = _make_env(deg_mode, precision, complex_mode)
+    _worker_limits = limits
+
+
+def eval_line(line, env, limits=None):
+    # returns (ok, text)
+    expr = line.strip()
+    if not expr:
+        return True, ""
+    try:
+        return True, format_result(guarded_eval(expr, env, limits))
+    except Exception as e:
+        return False, "Error: {}: {}".format(type(e).__name__, e)
+
+
+def _eval_chunk(lines):
+    return [eval_line(line, _worker_env, _worker_limits) for line in lines]
+
+
+def read_lines(paths):
+    if not paths:
+        paths = ["-"]
+    for path in paths:
+        if path == "-":
+            yield from sys.stdin
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield from f
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def evaluate_stream(lines, deg_mode=True, jobs=1, chunk_size=256, max_pending=None, limits=None,
+                    precision=None, complex_mode=False):
+    """Yield (ok, text) for every input line, preserving order."""
+    if jobs <= 1:
+        env = _make_env(deg_mode, precision, complex_mode)
+        for line in lines:
+            yield eval_line(line, env, limits)
+        return
+
+    # bounded window of in-flight chunks keeps memory flat
+    if max_pending is None:
+        max_pending = jobs * 2
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(deg_mode, limits, precision, complex_mode)) as pool:
+        for chunk in chunked(lines, chunk_size):
+            pending.append(pool.submit(_eval_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Evaluate calculator expressions, one per line.")
+    ap.add_argument("files", nargs="*", help="input files (default: stdin, '-' for stdin)")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--deg", dest="deg_mode", action="store_true", default=True,
+                      help="trig functions use degrees (default)")
+    mode.add_argument("--rad", dest="deg_mode", action="store_false",
+                      help="trig functions use radians")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                    help="worker processes (1 = evaluate in this process)")
+    ap.add_argument("--chunk-size", type=int, default=256,
+                    help="lines sent to a worker per task")
+    ap.add_argument("--timeout", type=float, default=5.0,
+                    help="wall-clock limit per expression in seconds")
+    ap.add_argument("--max-int-bits", type=int, default=Limits().max_int_bits,
+                    help="largest integer result allowed, in bits")
+    ap.add_argument("--precision", type=int, default=None, metavar="DIGITS",
+                    help="evaluate with this many significant digits (decimal backend)")
+    ap.add_argument("--complex", dest="complex_mode", action="store_true",
+                    help="complex results instead of domain errors: sqrt(-1) -> 1j")
+    ap.add_argument("--metrics", default=None, metavar="PATH",
+                    help="record per-function/per-expression metrics and write them here "
+                         "(.prom for Prometheus text, otherwise JSON); evaluates in this process")
+    ap.add_argument("--profile", default=None, metavar="PATH",
+                    help="profile the run and write the result here; evaluates in this process")
+    ap.add_argument("--profile-mode", choices=("cprofile", "sampling"), default="cprofile")
+    args = ap.parse_args(argv)
+    limits = Limits(max_int_bits=args.max_int_bits, timeout=args.timeout)
+    if args.metrics or args.profile:
+        # instrumentation only sees this process
+        args.jobs = 1
+        import calc_metrics
+        if args.metrics:
+            calc_metrics.enable()
+        profiler = calc_metrics.profile(args.profile, args.profile_mode).start() if args.profile else None
+
+    out = sys.stdout
+    errors = 0
+    try:
+        for ok, text in evaluate_stream(read_lines(args.files), args.deg_mode,
+                                        args.jobs, max(1, args.chunk_size), limits=limits,
+                                        precision=args.precision, complex_mode=args.complex_mode):
+            if not ok:
+                errors += 1
+            out.write(text + "\n")
+    except BrokenPipeError:
+        # e.g. piped into `head`
+        sys.stderr.close()
+        return 0
+    finally:
+        if args.profile:
+            profiler.stop()
+        if args.metrics:
+            calc_metrics.dump(args.metrics)
+    out.flush()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# ------------------------------
+# Complex numbers (cmath)
+# ------------------------------
+# With env.complex set, every EvalEnv wrapper accepts complex arguments and
+# answers outside the real domain instead of raising:
+#
+#   sqrt(-4)        -> 2j
+#   ln(-1)          -> 3.14159265359j
+#   (3 + 4i) * i    -> -4+3j            ("i" and Python's 1j both work)
+#   asin(2)         -> 90+75.4561292902j   (degrees in Deg mode)
+#
+# Real arguments go through the real function first, so results that were
+# real stay bit-for-bit the same; only a domain error (or a complex
+# argument) switches to cmath. Deg/Rad applies to the real and imaginary
+# parts alike. re, im, conj and arg are added to the namespace.
+import cmath
+import math
+
+_DEG = math.pi / 180.0
+
+
+def _promote(real_fn, complex_fn):
+    def wrapper(*args):
+        if not any(type(a) is complex for a in args):
+            try:
+                return real_fn(*args)
+            except ValueError:
+                pass    # math domain error: the answer is complex
+        return complex_fn(*args)
+    wrapper.__name__ = getattr(real_fn, "__name__", "complex")
+    return wrapper
+
+
+def complex_namespace(env, base):
+    """cmath-aware versions of the functions in ``base`` (the namespace built so far)."""
+    def to_rad(z):
+        return z * _DEG if env.deg_mode else z
+
+    def from_rad(z):
+        return z / _DEG if env.deg_mode else z
+
+    def sin(z):
+        return cmath.sin(to_rad(z))
+    def cos(z):
+        return cmath.cos(to_rad(z))
+    def tan(z):
+        return cmath.tan(to_rad(z))
+    def asin(z):
+        return from_rad(cmath.asin(z))
+    def acos(z):
+        return from_rad(cmath.acos(z))
+    def atan(z):
+        return from_rad(cmath.atan(z))
+    def sqrt(z):
+        return cmath.sqrt(z)
+    def cbrt(z):
+        return complex(z) ** (1.0 / 3.0)
+    def root(z, n):
+        return complex(z) ** (1.0 / n)
+    def ln(z):
+        return cmath.log(z)
+    def log10(z):
+        return cmath.log10(z)
+    def log(z, base=10):
+        return cmath.log(z, base)
+    def exp(z):
+        return cmath.exp(z)
+    def pow(z, w):
+        return complex(z) ** w
+
+    ns = {'i': 1j}
+    for fn in (sin, cos, tan, asin, acos, atan, sqrt, cbrt, root, ln, log10, log, exp, pow):
+        ns[fn.__name__] = _promote(base[fn.__name__], fn)
+    ns.update({
+        're': lambda z: complex(z).real,
+        'im': lambda z: complex(z).imag,
+        'conj': lambda z: complex(z).conjugate(),
+        'arg': lambda z: from_rad(cmath.phase(z)),
+    })
+    return ns
+
+
+def format_complex(z):
+    # "3+4j", "-2.5j", "1e+20-3j": the same text can be typed back in
+    im_text = "{:.12g}j".format(z.imag)
+    if z.real == 0.0:
+        return im_text
+    sign = "" if im_text.startswith("-") else "+"
+    return "{:.12g}{}{}".format(z.real, sign, im_text)
@@ -0,0 +1,639 @@
+# ------------------------------
+# Headless calculator core
+# ------------------------------
+# The evaluation engine used by the GUI, the CLI and the batch tools. This
+# module must never import tkinter (or anything heavy) so that worker
+# processes and display-less servers can use it cheaply; see
+# benchmarks/bench_import.py for the import-time budget.
+import math
+import ast
+import io
+import keyword
+import re
+import threading
+import tokenize
+from collections import OrderedDict, namedtuple
+
+# instrumentation (calc_metrics): None unless enabled; the epoch is part of
+# the namespace cache key so namespaces are rebuilt when it is switched
+_metrics = None
+_ns_epoch = 0
+
+# ------------------------------
+# Exact integer helpers
+# ------------------------------
+# ints keep exact paths where floats would overflow or round: perfect powers
+# have exact roots, pow() of ints is exact, small factorials come from a
+# table, and huge results are formatted without a full decimal conversion.
+_FLOAT_EXACT = 1 << 53
+# n! for n < len(_fact_table), grown on demand up to _FACT_TABLE_MAX
+_FACT_TABLE_MAX = 1024
+_fact_table = [1]
+_fact_lock = threading.Lock()
+# ints with more digits are shown in scientific notation (CPython refuses
+# str() beyond 4300 digits by default, and it is quadratic anyway)
+MAX_INT_DIGITS = 4300
+_MAX_INT_BITS = int(MAX_INT_DIGITS / math.log10(2))
+
+
+def _iroot(a, n):
+    # (floor(a ** (1/n)), exact?) for an int a >= 0 by integer Newton
+    # iteration. The root of the top bits seeds a single Newton step at full
+    # size, so the (quadratic) long division runs once, not once per step.
+    if a < 2 or n == 1:
+        return a, True
+    if n == 2:
+        y = math.isqrt(a)
+        return y, y * y == a
+    bits = a.bit_length()
+    if bits <= n:
+        return 1, a == 1
+    k = (bits // n - n.bit_length()) // 2 - 1
+    if bits <= 40 * n or k < 1:
+        # small root: the float estimate is off by a few units at most
+        y = int(math.exp(math.log(a) / n))
+        while y ** n > a:
+            y -= 1
+        while (y + 1) ** n <= a:
+            y += 1
+        return y, y ** n == a
+    # above the root by < 2**k, i.e. by a relative 2**-(bits/n/2); Newton
+    # from above never undershoots the floor and squares that error, leaving
+    # at most a unit or two to step down
+    y = (_iroot(a >> (n * k), n)[0] + 1) << k
+    y = ((n - 1) * y + a // y ** (n - 1)) // n
+    p = y ** n
+    while p > a:
+        y -= 1
+        p = y ** n
+    return y, p == a
+
+
+def _int_root(x, n):
+    # n-th root of an int: exact when |x| is a perfect power, else the same
+    # float as the float path (approximated through the integer root when
+    # |x| is too large for a float); the sign follows x
+    a = abs(x)
+    if a < _FLOAT_EXACT:
+        f = a ** (1.0 / n)
+        r = round(f)
+        # only a float within rounding of an integer can be a perfect power
+        if abs(f - r) < 1e-9 * f and r ** n == a:
+            return -r if x < 0 else r
+        return -f if x < 0 else f
+    r, exact = _iroot(a, n)
+    if exact:
+        return -r if x < 0 else r
+    try:
+        f = a ** (1.0 / n)
+    except OverflowError:
+        f = float(r) if r.bit_length() > 64 else math.exp(math.log(a) / n)
+    return -f if x < 0 else f
+
+
+def _factorial(n):
+    if n < len(_fact_table):
+        return _fact_table[n]
+    if n > _FACT_TABLE_MAX:
+        return math.factorial(n)
+    with _fact_lock:
+        table = _fact_table
+        while len(table) <= n:
+            table.append(table[-1] * len(table))
+    return _fact_table[n]
+
+
+def _format_big_int(n):
+    # 12 significant digits from the top 64 bits times a power of two,
+    # in decimal at 30 digits: no full base conversion
+    import decimal
+    a = abs(n)
+    shift = max(0, a.bit_length() - 64)
+    with decimal.localcontext() as ctx:
+        ctx.prec = 30
+        ctx.Emax = decimal.MAX_EMAX
+        d = decimal.Decimal(a >> shift) * decimal.Decimal(2) ** shift
+        mantissa, exp = "{:.11e}".format(d).split("e")
+    # same shape as "{:.12g}" of a float: 1.5e+5000, not 1.50000000000e+5000
+    text = mantissa.rstrip("0").rstrip(".") + "e" + exp
+    return "-" + text if n < 0 else text
+
+# ------------------------------
+# Safe eval environment (with degree/radian mode)
+# ------------------------------
+class EvalEnv:
+    def __init__(self):
+        self.deg_mode = True
+        # unit names (km, h, ...) become quantities; see calc_quantity
+        self.units = False
+        # significant digits for decimal evaluation, None for floats; see calc_precision
+        self.precision = None
+        # complex results instead of domain errors (sqrt(-1) -> 1j); see calc_complex
+        self.complex = False
+        # cache repeated calls of the pure functions (sin, fact, ...); see calc_memo
+        self.memoize = False
+        self._memo = None
+        # namespace is built lazily and reused until deg_mode/units/precision/complex/memoize change
+        self._ns = None
+        self._ns_key = None
+
+    def toggle_deg(self):
+        self.deg_mode = not self.deg_mode
+
+    # degree-aware wrappers
+    def sin(self, x):
+        return math.sin(math.radians(x)) if self.deg_mode else math.sin(x)
+    def cos(self, x):
+        return math.cos(math.radians(x)) if self.deg_mode else math.cos(x)
+    def tan(self, x):
+        return math.tan(math.radians(x)) if self.deg_mode else math.tan(x)
+    def asin(self, x):
+        r = math.asin(x)
+        return math.degrees(r) if self.deg_mode else r
+    def acos(self, x):
+        r = math.acos(x)
+        return math.degrees(r) if self.deg_mode else r
+    def atan(self, x):
+        r = math.atan(x)
+        return math.degrees(r) if self.deg_mode else r
+
+    # roots of ints are exact for perfect powers and never overflow
+    def sqrt(self, x):
+        if type(x) is int and x >= 0:
+            r = math.isqrt(x)
+            if r * r == x:
+                return r
+            try:
+                return math.sqrt(x)
+            except OverflowError:
+                return float(r)     # x itself is too large for a float
+        return math.sqrt(x)
+    def cbrt(self, x):
+        if type(x) is int:
+            return _int_root(x, 3)
+        return math.copysign(abs(x) ** (1.0/3.0), x)
+    def root(self, x, n):
+        # n-th root of x -> x ** (1/n)
+        if type(x) is int and (type(n) is int or (type(n) is float and n.is_integer())) and n >= 1:
+            return _int_root(x, int(n))
+        return math.copysign(abs(x) ** (1.0/float(n)), x)
+    def ln(self, x):
+        return math.log(x)
+    def log10(self, x):
+        return math.log10(x)
+    def log(self, x, base=10):
+        return math.log(x, base)
+    def fact(self, n):
+        n_int = int(n)
+        if n_int < 0:
+            raise ValueError("factorial not defined for negative")
+        return _factorial(n_int)
+    def binom(self, n, k):
+        n, k = int(n), int(k)
+        if n < 0 or k < 0:
+            raise ValueError("binomial not defined for negative")
+        if k > n:
+            return 0
+        if n < len(_fact_table):
+            return _fact_table[n] // (_fact_table[k] * _fact_table[n - k])
+        return math.comb(n, k)
+    # magnitudes without the exact value: lfact(10**9) is log10 of 10**9!
+    def lgamma(self, x):
+        return math.lgamma(x)
+    def lfact(self, n):
+        n_int = int(n)
+        if n_int < 0:
+            raise ValueError("factorial not defined for negative")
+        return math.lgamma(n_int + 1) / math.log(10)
+    def exp(self, x):
+        return math.exp(x)
+    def pow(self, x, y):
+        if type(x) is int and type(y) is int and y >= 0:
+            return x ** y
+        return math.pow(x, y)
+    def inv(self, x):
+        if isinstance(x, (int, float)):
+            return 1.0 / x
+        if getattr(x, "ndim", 0) == 2:
+            from calc_linalg import inv
+            return inv(x)
+        return 1.0 / x
+    def e(self):
+        return math.e
+
+    # calculus: compile_expr turns diff(x^2, x, 3) into diff('x ** 2', 'x', 3, ...)
+    # with the other free names of the inner expression passed as keywords
+    def diff(self, src, var, at, /, **bound):
+        from calc_calculus import diff
+        return diff(src, var, at, env=self, bound=bound).value
+    def integrate(self, src, var, a, b, /, **bound):
+        from calc_calculus import integrate
+        return integrate(src, var, a, b, env=self, bound=bound).value
+    def solve(self, src, var, guess=None, hi=None, /, **bound):
+        if not isinstance(src, str):
+            # solve(A, b): the linear system A @ x = b
+            from calc_linalg import solve
+            return solve(src, var)
+        from calc_calculus import solve
+        return solve(src, var, guess, hi, env=self, bound=bound).value
+
+    # matrices: compile_expr turns [[1, 2], [3, 4]] into _mat([...]); see calc_linalg
+    def det(self, a):
+        from calc_linalg import det
+        return det(a)
+    def eig(self, a):
+        from calc_linalg import eig
+        return eig(a)
+    def _mat(self, items):
+        from calc_linalg import matrix
+        return matrix(items)
+
+    def namespace(self):
+        key = (self.deg_mode, self.units, self.precision, self.complex, self.memoize, _ns_epoch)
+        if self._ns is None or self._ns_key != key:
+            self._ns = self._build_namespace()
+            if self.precision:
+                from calc_precision import precise_namespace
+                self._ns.update(precise_namespace(self))
+            if self.units:
+                from calc_quantity import unit_namespace
+                self._ns.update(unit_namespace(self))
+            if self.complex:
+                from calc_complex import complex_namespace
+                self._ns.update(complex_namespace(self, self._ns))
+            if self.memoize:
+                from calc_memo import memo_namespace
+                self._ns.update(memo_namespace(self, self._ns))
+            if _metrics is not None:
+                self._ns = _metrics.wrap_namespace(self._ns)
+            self._ns_key = key
+        return self._ns
+
+    def _build_namespace(self):
+        ns = {
+            'pi': math.pi,
+            'e': math.e,
+            'sin': self.sin,
+            'cos': self.cos,
+            'tan': self.tan,
+            'asin': self.asin,
+            'acos': self.acos,
+            'atan': self.atan,
+            'sqrt': self.sqrt,
+            'cbrt': self.cbrt,
+            'root': self.root,
+            'ln': self.ln,
+            'log10': self.log10,
+            'log': self.log,
+            'fact': self.fact,
+            'binom': self.binom,
+            'lgamma': self.lgamma,
+            'lfact': self.lfact,
+            'exp': self.exp,
+            'pow': self.pow,
+            'inv': self.inv,
+            'diff': self.diff,
+            'integrate': self.integrate,
+            'solve': self.solve,
+            'det': self.det,
+            'eig': self.eig,
+            '_mat': self._mat,
+            # safe wrappers from math
+            'abs': abs,
+            'round': round,
+        }
+        return ns
+
+# ------------------------------
+# Expression compiler + LRU cache
+# ------------------------------
+# only these AST nodes may appear in a calculator expression
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.keyword,
+    ast.Name, ast.Load, ast.Constant, ast.List,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.MatMult,
+    ast.UAdd, ast.USub,
+)
+
+_EVAL_GLOBALS = {"__builtins__": {}}
+
+# code: compiled code object, names: free names the expression reads,
+# optimized: namespace key -> calc_optimize code (None after the first run)
+CompiledExpr = namedtuple("CompiledExpr", ["source", "code", "tree", "names", "optimized"])
+
+# safe_eval runs the calc_optimize form of an expression from its second
+# evaluation in a mode on (folded constants, shared calls); see set_optimizer
+_optimize = True
+
+
+# a number or ")" directly followed by a name: "3 km", "2pi", "(1+2) m"
+# (but not the exponent of a float literal such as 1.5e-05)
+_IMPLICIT_MUL = re.compile(r"[\d.)](?:\s+|(?![eE][+-]?\d))[A-Za-z_]")
+
+
+def _insert_implicit_mul(expr):
+    try:
+        tokens = [t for t in tokenize.generate_tokens(io.StringIO(expr).readline)
+                  if t.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.ENDMARKER)]
+    except (tokenize.TokenError, SyntaxError):
+        return expr     # let ast.parse report it
+    def gap(k):
+        # keep the original spacing so separate tokens never merge
+        return ' ' if k and tokens[k].start != tokens[k - 1].end else ''
+
+    out = []
+    i = 0
+    n = len(tokens)
+    while i < n:
+        tok = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < n else None
+        is_name = (nxt is not None and nxt.type == tokenize.NAME
+                   and not keyword.iskeyword(nxt.string))
+        if tok.type == tokenize.NUMBER and is_name and not (i + 2 < n and tokens[i + 2].string == '('):
+            # "2 s" binds tighter than "/": 1 m / 2 s -> (1*m)/(2*s), and an
+            # exponent stays on the unit: 2 s**2 -> (2*s**2)
+            j = i + 2
+            if j + 1 < n and tokens[j].string == '**':
+                j += 1
+                while j < n and tokens[j].string in ('-', '+'):
+                    j += 1      # unary signs of the exponent
+                if j < n and tokens[j].string == '(':
+                    # s**(1+1): the whole bracket is the exponent
+                    depth = 0
+                    while j < n:
+                        depth += tokens[j].string == '('
+                        depth -= tokens[j].string == ')'
+                        if not depth:
+                            break
+                        j += 1
+                j += 1
+            out.append(gap(i) + '(' + tok.string + '*' + nxt.string)
+            out.extend(gap(k) + tokens[k].string for k in range(i + 2, min(j, n)))
+            out.append(')')
+            i = j
+            continue
+        out.append(gap(i) + tok.string)
+        if is_name and (tok.type == tokenize.NUMBER or tok.string == ')'):
+            out.append('*')
+        i += 1
+    return ''.join(out)
+
+
+def normalize_expr(expr):
+    # replace unicode pi if present
+    expr = expr.replace('π', 'pi')
+    expr = expr.replace('^', '**')
+    # m², m³
+    expr = expr.replace('²', '**2').replace('³', '**3')
+    expr = expr.strip()
+    if _IMPLICIT_MUL.search(expr):
+        expr = _insert_implicit_mul(expr)
+    return expr
+
+
+def _validate(tree):
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError("Invalid expression")
+        if isinstance(node, ast.Name):
+            if node.id.startswith("_"):
+                raise ValueError("Invalid expression")
+            names.add(node.id)
+        elif isinstance(node, ast.Call):
+            # only plain function names may be called
+            if not isinstance(node.func, ast.Name):
+                raise ValueError("Invalid expression")
+        elif isinstance(node, ast.keyword):
+            if node.arg is None or node.arg.startswith("_"):
+                raise ValueError("Invalid expression")
+        elif isinstance(node, ast.Constant):
+            if type(node.value) not in (int, float, complex):
+                raise ValueError("Invalid expression")
+    return frozenset(names)
+
+
+# functions whose first argument is an expression in the variable named by
+# the second: the argument is passed on as source text, not evaluated
+_CALCULUS = frozenset(['diff', 'integrate', 'solve'])
+
+
+def _is_calculus(node):
+    # solve(A, b) with two arguments is the linear solve, not a root search
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _CALCULUS
+            and not (node.func.id == 'solve' and len(node.args) == 2))
+
+
+def _free_names(node):
+    if isinstance(node, ast.Name):
+        return {node.id}
+    if _is_calculus(node) and len(node.args) >= 2 and isinstance(node.args[1], ast.Name):
+        names = _free_names(node.args[0]) - {node.args[1].id}
+        names.add(node.func.id)
+        for arg in node.args[2:]:
+            names |= _free_names(arg)
+        return names
+    names = set()
+    for child in ast.iter_child_nodes(node):
+        names |= _free_names(child)
+    return names
+
+
+class _CalculusBinder(ast.NodeTransformer):
+    # diff(sin(x)*r, x, 30) -> diff('sin(x) * r', 'x', 30, r=r, sin=sin)
+    def visit_Call(self, node):
+        if not _is_calculus(node):
+            return self.generic_visit(node)
+        name = node.func.id
+        if len(node.args) < 3 or not isinstance(node.args[1], ast.Name) or node.keywords:
+            raise ValueError("{}() expects (expression, variable, ...)".format(name))
+        inner, var = node.args[0], node.args[1].id
+        args = [ast.Constant(ast.unparse(inner)), ast.Constant(var)]
+        args.extend(self.visit(a) for a in node.args[2:])
+        keywords = [ast.keyword(arg=n, value=ast.Name(id=n, ctx=ast.Load()))
+                    for n in sorted(_free_names(inner) - {var})]
+        return ast.copy_location(ast.Call(func=node.func, args=args, keywords=keywords), node)
+
+
+def _number(node):
+    # value of a numeric literal, possibly negated, else None
+    sign = 1
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        sign = -1 if isinstance(node.op, ast.USub) else 1
+        node = node.operand
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, complex):
+        return sign * node.value
+    return None
+
+
+class _MatrixLiterals(ast.NodeTransformer):
+    # [a, b] -> _mat([a, b]) at every level, so no plain list ever exists
+    # at run time ([1] * 10**9 multiplies an array, it does not repeat a
+    # list). A row of plain numbers becomes one tuple constant, so a 500x500
+    # literal compiles to 500 constants instead of 250000 loads.
+    def visit_List(self, node):
+        values = [_number(e) for e in node.elts]
+        if node.elts and None not in values:
+            arg = ast.copy_location(ast.Constant(tuple(values)), node)
+        else:
+            node.elts = [self.visit(e) for e in node.elts]
+            arg = node
+        call = ast.Call(func=ast.Name(id='_mat', ctx=ast.Load()), args=[arg], keywords=[])
+        return ast.copy_location(call, node)
+
+
+class ExprCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def peek(self, key):
+        # lookup without touching the counters
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_expr_cache = ExprCache()
+
+
+def compile_expr(expr):
+    # fast path: this exact text was seen before (skips normalization)
+    entry = _expr_cache.get(expr)
+    if entry is not None:
+        return entry
+    src = normalize_expr(expr)
+    # different spellings of the same source share one compiled entry
+    entry = _expr_cache.peek(src) if src != expr else None
+    if entry is None:
+        tree = ast.parse(src, mode="eval")
+        names = _validate(tree)
+        if not names.isdisjoint(_CALCULUS):
+            tree = ast.fix_missing_locations(_CalculusBinder().visit(tree))
+            names = frozenset(_free_names(tree))
+        if '[' in src:
+            # after the calculus rewrite, whose inner sources are compiled on their own
+            tree = ast.fix_missing_locations(_MatrixLiterals().visit(tree))
+        code = compile(tree, "<expr>", "eval")
+        entry = CompiledExpr(src, code, tree, names, {})
+        _expr_cache.put(src, entry)
+    if src != expr:
+        _expr_cache.put(expr, entry)
+    return entry
+
+
+def cache_stats():
+    return _expr_cache.stats()
+
+
+def set_cache_size(maxsize):
+    _expr_cache.resize(maxsize)
+
+
+def clear_cache():
+    _expr_cache.clear()
+
+
+def set_optimizer(enabled):
+    global _optimize
+    _optimize = bool(enabled)
+
+
+def _optimized_code(compiled, env):
+    # namespace() has just set env._ns_key; folded values belong to that mode
+    key = env._ns_key
+    code = compiled.optimized.get(key)
+    if code is None:
+        if key not in compiled.optimized:
+            # one-off expressions are not worth optimizing
+            compiled.optimized[key] = None
+            return compiled.code
+        from calc_optimize import optimize_code
+        try:
+            code = optimize_code(compiled, env)
+        except Exception:
+            code = compiled.code
+        compiled.optimized[key] = code
+    return code
+
+
+def safe_eval(expr, env: EvalEnv):
+    if _metrics is not None:
+        return _metrics.safe_eval(expr, env)
+    compiled = compile_expr(expr)
+    if env.precision:
+        from calc_precision import precise_eval
+        return precise_eval(compiled, env)
+    ns = env.namespace()
+    if _optimize:
+        code = compiled.optimized.get(env._ns_key)
+        if code is None:
+            code = _optimized_code(compiled, env)
+    else:
+        code = compiled.code
+    return eval(code, _EVAL_GLOBALS, ns)
+
+
+def format_result(val):
+    # format
+    if isinstance(val, float):
+        return "{:.12g}".format(val)
+    if type(val).__name__ == "Decimal":
+        from calc_precision import format_decimal
+        return format_decimal(val)
+    if type(val) is int and val.bit_length() > _MAX_INT_BITS:
+        return _format_big_int(val)
+    if isinstance(val, complex):
+        from calc_complex import format_complex
+        return format_complex(val)
+    if type(val).__name__ == "ndarray":
+        from calc_linalg import format_array
+        return format_array(val)
+    return str(val)
@@ -0,0 +1,515 @@
+# ------------------------------
+# Resource-bounded evaluation
+# ------------------------------
+# guarded_eval() runs an expression under Limits:
+#   * a static cost estimate on the parsed expression rejects exponent
+#     towers and oversized factorials before anything is computed
+#   * `**`, `*`, pow(), fact() and binom() are rewritten into checked calls
+#     that refuse to build integers above max_int_bits and enforce the
+#     wall-clock deadline
+#   * IsolatedEvaluator runs the same thing in a worker process that is
+#     killed (and restarted) when it does not answer within the timeout
+# Every breach raises EvalLimitError.
+import ast
+import copy
+import math
+import multiprocessing
+import os
+import time
+
+import calc_core
+from calc_core import EvalEnv, ExprCache, compile_expr, _CALCULUS, _EVAL_GLOBALS
+
+
+class EvalLimitError(Exception):
+    pass
+
+
+class Limits:
+    def __init__(self, max_int_bits=1 << 19, max_fact=20000, timeout=5.0):
+        self.max_int_bits = max_int_bits    # ~158k decimal digits
+        self.max_fact = max_fact
+        self.timeout = timeout              # seconds, None for no deadline
+
+    def __repr__(self):
+        return "Limits(max_int_bits={}, max_fact={}, timeout={})".format(
+            self.max_int_bits, self.max_fact, self.timeout)
+
+
+DEFAULT_LIMITS = Limits()
+
+# ------------------------------
+# Static cost estimate
+# ------------------------------
+# _bound() returns (bits, is_int): an upper bound on log2(|value|) of a
+# node and whether it may be an exact int, or None when the value depends
+# on something unknown (e.g. a variable). Only ints can grow without limit;
+# float overflow raises OverflowError straight away.
+_FLOAT = (1024.0, False)    # anything that comes back as a float
+_CONST_BITS = {'pi': math.log2(math.pi), 'e': math.log2(math.e)}
+_FLOAT_FUNCS = frozenset([
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan',
+    'ln', 'log10', 'log', 'exp', 'inv', 'lgamma', 'lfact',
+])
+# roots of ints stay exact ints (no bigger than the argument)
+_ROOT_DEGREE = {'sqrt': 2, 'cbrt': 3, 'root': 1}
+
+
+def _fact_bits(n):
+    return n * math.log2(n) if n > 1 else 0.0
+
+
+def _check_fact(n, limits):
+    if n > limits.max_fact:
+        raise EvalLimitError("factorial argument too large (limit {})".format(limits.max_fact))
+    if _fact_bits(n) > limits.max_int_bits:
+        raise EvalLimitError("factorial result too large (limit {} bits)".format(limits.max_int_bits))
+
+
+def _sign(node):
+    # 1 if the value is certainly >= 0, -1 if certainly <= 0, else None
+    if isinstance(node, ast.Constant):
+        v = node.value
+        if type(v) in (int, float):
+            return 1 if v >= 0 else -1
+        return None
+    if isinstance(node, ast.Name):
+        return 1 if node.id in _CONST_BITS else None
+    if isinstance(node, ast.UnaryOp):
+        s = _sign(node.operand)
+        if isinstance(node.op, ast.USub):
+            return None if s is None else -s
+        return s if isinstance(node.op, ast.UAdd) else None
+    if isinstance(node, ast.BinOp):
+        a, b = _sign(node.left), _sign(node.right)
+        if isinstance(node.op, ast.Add):
+            return a if a == b else None
+        if isinstance(node.op, ast.Sub):
+            return a if b is not None and a == -b else None
+        if isinstance(node.op, (ast.Mult, ast.Div, ast.FloorDiv)):
+            return a * b if a is not None and b is not None else None
+        if isinstance(node.op, ast.Pow):
+            return 1 if a == 1 else None
+        if isinstance(node.op, ast.Mod):
+            return b
+        return None
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        return 1 if node.func.id in ('abs', 'fact', 'binom') else None
+    return None
+
+
+def _pow_bound(left, right, limits, exponent):
+    (a, a_int), (b, b_int) = left, right
+    if not (a_int and b_int) or a <= 0:
+        return _FLOAT
+    # the bound on the exponent is on its magnitude: only a positive one can grow an int
+    sign = _sign(exponent)
+    if sign is None:
+        return None     # left to the runtime check
+    if sign < 0:
+        return _FLOAT   # int ** negative int is a float
+    bits = a * 2.0 ** b if b < 1024 else math.inf
+    if bits > limits.max_int_bits:
+        raise EvalLimitError("power too large (~{:.3g} bits, limit {})".format(
+            bits, limits.max_int_bits))
+    return bits, True
+
+
+def _bound(node, limits):
+    if isinstance(node, ast.Expression):
+        return _bound(node.body, limits)
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float, complex)):
+            return None     # source text of a diff/integrate/solve argument, matrix row
+        v = abs(node.value)
+        return (math.log2(v) if v else -math.inf), type(node.value) is int
+    if isinstance(node, ast.Name):
+        bits = _CONST_BITS.get(node.id)
+        return None if bits is None else (bits, False)
+    if isinstance(node, ast.UnaryOp):
+        return _bound(node.operand, limits)
+    if isinstance(node, ast.BinOp):
+        left = _bound(node.left, limits)
+        right = _bound(node.right, limits)
+        op = node.op
+        if isinstance(op, ast.Div):
+            return _FLOAT
+        if left is None or right is None:
+            return None
+        (a, a_int), (b, b_int) = left, right
+        is_int = a_int and b_int
+        if isinstance(op, (ast.Add, ast.Sub)):
+            return max(a, b) + 1, is_int
+        if isinstance(op, ast.Mult):
+            return a + b, is_int
+        if isinstance(op, ast.FloorDiv):
+            return max(a, _FLOAT[0]), is_int
+        if isinstance(op, ast.Mod):
+            return b, is_int
+        if isinstance(op, ast.Pow):
+            return _pow_bound(left, right, limits, node.right)
+        return None
+    if isinstance(node, ast.Call):
+        name = node.func.id
+        if name in _CALCULUS and node.args and isinstance(node.args[0], ast.Constant):
+            # the inner expression is compiled separately; apply the static checks to it too
+            _bound(compile_expr(node.args[0].value).tree, limits)
+            return _FLOAT
+        args = [_bound(a, limits) for a in node.args]
+        if name == 'fact' and len(args) == 1:
+            if args[0] is None:
+                return None
+            n = 2.0 ** args[0][0] if args[0][0] < 1024 else math.inf
+            _check_fact(math.floor(n), limits)
+            return _fact_bits(n), True
+        if name == 'binom' and len(args) == 2:
+            # binom(n, k) <= 2**n; anything larger is left to the runtime check
+            if args[0] is None or args[1] is None or args[0][0] >= 64:
+                return None
+            bits = 2.0 ** args[0][0]
+            return (bits, True) if bits <= limits.max_int_bits else None
+        if name == 'pow' and len(args) == 2:
+            if args[0] is None or args[1] is None:
+                return None
+            return _pow_bound(args[0], args[1], limits, node.args[1])
+        if name in _ROOT_DEGREE and args:
+            if args[0] is None:
+                return None
+            if not args[0][1]:
+                return _FLOAT
+            return args[0][0] / _ROOT_DEGREE[name], True
+        if name in _FLOAT_FUNCS:
+            return _FLOAT
+        if name == 'abs' and args:
+            return args[0]
+        if name == 'round' and len(args) == 1 and args[0] is not None:
+            return args[0][0], True
+        return None
+    return None
+
+
+def estimate_cost(expr, limits=None):
+    """Static upper bound on the result size in bits, or None if unknown.
+
+    Raises EvalLimitError if some subexpression is certain to exceed the limits.
+    """
+    limits = limits or DEFAULT_LIMITS
+    bound = _bound(compile_expr(expr).tree, limits)
+    return None if bound is None else bound[0]
+
+# ------------------------------
+# Runtime caps
+# ------------------------------
+class _Guard:
+    def __init__(self, limits, ns=None):
+        # the namespace's own pow/fact/binom, complex, unit and memo overlays included
+        if ns is not None:
+            self._pow = ns['pow']
+            self._fact = ns['fact']
+            self._binom = ns['binom']
+        self.limits = limits
+        self.deadline = (time.monotonic() + limits.timeout) if limits.timeout else None
+
+    def _tick(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise EvalLimitError("evaluation timed out after {}s".format(self.limits.timeout))
+
+    def _check_pow(self, a, b):
+        self._tick()
+        if type(a) is int and type(b) is int and b > 0 and abs(a) > 1:
+            bits = b * math.log2(abs(a))
+            if bits > self.limits.max_int_bits:
+                raise EvalLimitError("power too large (~{:.3g} bits, limit {})".format(
+                    bits, self.limits.max_int_bits))
+
+    def pow(self, a, b):
+        self._check_pow(a, b)
+        return a ** b
+
+    def pow_call(self, a, b):
+        # pow() is exact for ints, like **
+        self._check_pow(a, b)
+        return self._pow(a, b)
+
+    def mul(self, a, b):
+        if type(a) is int and type(b) is int:
+            self._tick()
+            if a.bit_length() + b.bit_length() > self.limits.max_int_bits:
+                raise EvalLimitError("product too large (limit {} bits)".format(
+                    self.limits.max_int_bits))
+        return a * b
+
+    def fact(self, n):
+        self._tick()
+        _check_fact(int(n), self.limits)
+        return self._fact(n)
+
+    def binom(self, n, k):
+        self._tick()
+        n_int, k_int = int(n), int(k)
+        k_int = min(k_int, n_int - k_int)
+        if k_int > 0:
+            # log2 binom(n, k) <= k * log2(e * n / k)
+            bits = k_int * math.log2(math.e * n_int / k_int)
+            if bits > self.limits.max_int_bits:
+                raise EvalLimitError("binomial result too large (limit {} bits)".format(
+                    self.limits.max_int_bits))
+        return self._binom(n, k)
+
+
+# calls that can build big ints -> their checked replacement in the namespace
+_GUARDED_CALLS = {'fact': '_guard_fact', 'binom': '_guard_binom', 'pow': '_guard_pow_call'}
+
+
+class _GuardTransformer(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            fn = '_guard_pow'
+        elif isinstance(node.op, ast.Mult):
+            fn = '_guard_mul'
+        else:
+            return node
+        call = ast.Call(func=ast.Name(id=fn, ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return ast.copy_location(call, node)
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id in _GUARDED_CALLS:
+            guarded = _GUARDED_CALLS[node.func.id]
+            node.func = ast.copy_location(ast.Name(id=guarded, ctx=ast.Load()), node.func)
+        return node
+
+
+# source -> guarded code object (None when the static bound proves it safe)
+_guarded_cache = ExprCache(1024)
+
+
+def _guarded_code(compiled, limits):
+    key = (compiled.source, limits.max_int_bits, limits.max_fact)
+    entry = _guarded_cache.get(key)
+    if entry is None:
+        bound = _bound(compiled.tree, limits)
+        if bound is not None:
+            # every value is known statically and within limits
+            entry = (False, compiled.code)
+        else:
+            tree = _GuardTransformer().visit(copy.deepcopy(compiled.tree))
+            ast.fix_missing_locations(tree)
+            entry = (True, compile(tree, "<expr>", "eval"))
+        _guarded_cache.put(key, entry)
+    return entry
+
+
+def guarded_eval(expr, env: EvalEnv, limits=None):
+    limits = limits or DEFAULT_LIMITS
+    if calc_core._metrics is not None:
+        return calc_core._metrics.guarded_eval(expr, env, limits)
+    return _guarded_run(compile_expr(expr), env, limits)
+
+
+def _guarded_run(compiled, env, limits):
+    if env.precision:
+        # decimal arithmetic is bounded by the context precision: the static
+        # checks (exponent towers, factorials) apply, and the deadline is
+        # checked in the series loops
+        _bound(compiled.tree, limits)
+        from calc_precision import precise_eval
+        tick = _Guard(limits)._tick if limits.timeout else None
+        return precise_eval(compiled, env, tick)
+    needs_guard, code = _guarded_code(compiled, limits)
+    ns = env.namespace()
+    if needs_guard:
+        ns = dict(ns)
+        _install_guard(ns, limits)
+    return eval(code, _EVAL_GLOBALS, ns)
+
+
+def _install_guard(ns, limits):
+    # the checked calls of one evaluation (with its own deadline) into ns
+    guard = _Guard(limits, ns)
+    ns['_guard_pow'] = guard.pow
+    ns['_guard_mul'] = guard.mul
+    ns['_guard_fact'] = guard.fact
+    ns['_guard_binom'] = guard.binom
+    ns['_guard_pow_call'] = guard.pow_call
+    return guard
+
+# ------------------------------
+# Isolated worker process
+# ------------------------------
+def _run_job(env, limits, kind, args):
+    if kind == "eval":
+        expr, deg_mode, units, complex_mode = args
+        env.deg_mode = deg_mode
+        env.units = units
+        env.complex = complex_mode
+        return guarded_eval(expr, env, limits)
+    if kind == "call":
+        # a single EvalEnv function, e.g. ("sin", (30.0,), True)
+        name, fargs, deg_mode = args
+        env.deg_mode = deg_mode
+        fn = env.namespace().get(name)
+        if fn is None:
+            raise ValueError("Unknown function: {}".format(name))
+        return fn(*fargs)
+    if kind == "convert":
+        from calc_units import convert
+        return convert(*args)
+    raise ValueError("Unknown job kind: {}".format(kind))
+
+
+def _isolated_main(conn, limits, profile=None):
+    env = EvalEnv()
+    profiler = None
+    if profile is not None:
+        import calc_metrics
+        mode = "sampling" if profile.endswith(".folded") else "cprofile"
+        profiler = calc_metrics.profile(profile, mode).start()
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                return
+            if msg is None:
+                return
+            job_id, kind, args = msg
+            try:
+                conn.send((job_id, True, _run_job(env, limits, kind, args)))
+            except Exception as e:
+                conn.send((job_id, False, e))
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+
+class IsolatedEvaluator:
+    """Evaluate in a separate process that is killed if it overruns.
+
+    The worker is started on first use and restarted after a kill, so one
+    pathological expression costs at most ``limits.timeout`` seconds.
+    evaluate() blocks; submit()/poll()/cancel() let an event loop drive the
+    worker without ever waiting on it.
+
+    With ``profile`` set to a path (run.prof, or run.folded for sampled
+    stacks) the worker profiles itself and writes run.worker.prof when it is
+    closed; a worker started after a kill writes run.worker2.prof and so on
+    (a killed worker's profile is lost).
+    """
+
+    # extra time the worker gets to report its own deadline before the kill
+    GRACE = 0.5
+
+    def __init__(self, limits=None, profile=None):
+        self.limits = limits or DEFAULT_LIMITS
+        self.profile = profile
+        self._started = 0           # workers started so far (names their profiles)
+        self._proc = None
+        self._conn = None
+        self._next_id = 0
+        self._outstanding = []      # job ids in submission order
+        self._busy_since = None     # start of the job the worker is running
+        self._done = {}             # results read while waiting for another job
+
+    def _ensure_worker(self):
+        if self._proc is not None and self._proc.is_alive():
+            return
+        parent, child = multiprocessing.Pipe()
+        self._started += 1
+        profile = None
+        if self.profile is not None:
+            root, ext = os.path.splitext(self.profile)
+            profile = "{}.worker{}{}".format(root, self._started if self._started > 1 else "", ext)
+        self._proc = multiprocessing.Process(target=_isolated_main, args=(child, self.limits, profile),
+                                             daemon=True)
+        self._proc.start()
+        child.close()
+        self._conn = parent
+
+    def _kill(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.join()
+        if self._conn is not None:
+            self._conn.close()
+        self._proc = self._conn = None
+
+    def _fail_outstanding(self, exc):
+        failed = [(job_id, False, exc) for job_id in self._outstanding]
+        self._outstanding = []
+        self._busy_since = None
+        self._kill()
+        return failed
+
+    @property
+    def busy(self):
+        return bool(self._outstanding)
+
+    def submit(self, kind, *args):
+        """Queue a job ("eval", "call" or "convert") and return its id."""
+        self._ensure_worker()
+        self._next_id += 1
+        job_id = self._next_id
+        self._conn.send((job_id, kind, args))
+        if not self._outstanding:
+            self._busy_since = time.monotonic()
+        self._outstanding.append(job_id)
+        return job_id
+
+    def poll(self, timeout=0):
+        """Return finished jobs as (job_id, ok, result_or_exception) tuples.
+
+        Never blocks longer than ``timeout``. A job that overruns the hard
+        deadline kills the worker and fails every outstanding job.
+        """
+        results = []
+        try:
+            while self._outstanding and self._conn.poll(timeout):
+                msg = self._conn.recv()
+                self._outstanding.remove(msg[0])
+                self._busy_since = time.monotonic() if self._outstanding else None
+                results.append(msg)
+                timeout = 0
+        except (EOFError, OSError):
+            return results + self._fail_outstanding(EvalLimitError("evaluation worker died"))
+        limit = self.limits.timeout
+        if (self._outstanding and limit is not None
+                and time.monotonic() - self._busy_since > limit + self.GRACE):
+            results += self._fail_outstanding(
+                EvalLimitError("evaluation timed out after {}s".format(limit)))
+        return results
+
+    def cancel(self):
+        """Drop every outstanding job by killing the worker."""
+        self._outstanding = []
+        self._busy_since = None
+        self._done.clear()
+        self._kill()
+
+    def evaluate(self, expr, deg_mode=True, units=False, complex_mode=False):
+        job_id = self.submit("eval", expr, deg_mode, units, complex_mode)
+        while job_id not in self._done:
+            step = 0.05 if self.limits.timeout is not None else None
+            for rid, ok, payload in self.poll(step):
+                self._done[rid] = (ok, payload)
+        ok, payload = self._done.pop(job_id)
+        if ok:
+            return payload
+        raise payload
+
+    def close(self):
+        if self._proc is not None and self._proc.is_alive():
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._proc.join(1.0)
+        self._kill()
+        self._outstanding = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,175 @@
+# ------------------------------
+# History storage
+# ------------------------------
+# HistoryStore keeps the most recent records in a bounded ring buffer and,
+# when given a path, appends every record to a local SQLite database in
+# batches. Records are structured (expression, result, mode, category,
+# timestamp), positions are contiguous rowids so paging is an index seek,
+# and text search goes through an FTS5 trigram index when SQLite has it.
+import sqlite3
+import time
+from collections import deque, namedtuple
+from itertools import islice
+
+HistoryRecord = namedtuple("HistoryRecord", ["expression", "result", "mode", "category", "timestamp"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    expression TEXT NOT NULL,
+    result TEXT NOT NULL,
+    mode TEXT,
+    category TEXT NOT NULL
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    expression, result, content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts(rowid, expression, result) VALUES (new.id, new.expression, new.result);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts(history_fts, rowid, expression, result)
+    VALUES ('delete', old.id, old.expression, old.result);
+END;
+"""
+
+# fallback when FTS5 is not compiled in: prefix search through a b-tree index
+_LIKE_SCHEMA = "CREATE INDEX IF NOT EXISTS history_expr ON history(expression);"
+
+_COLUMNS = "expression, result, mode, category, ts"
+
+
+def format_record(rec):
+    if rec.category == "calc":
+        return f"{rec.expression} = {rec.result}"
+    if rec.category == "stats":
+        return f"Stats: {rec.expression} -> {rec.result}"
+    return f"Convert ({rec.category}): {rec.expression} -> {rec.result}"
+
+
+class HistoryStore:
+    def __init__(self, path=None, capacity=1000, batch_size=64):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self._recent = deque(maxlen=capacity)
+        self._pending = []
+        self._db = None
+        self._fts = False
+        self._count = 0     # persisted rows, kept so len() is not a table scan
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path):
+        db = sqlite3.connect(path)
+        db.executescript(_SCHEMA)
+        try:
+            db.executescript(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError:
+            db.executescript(_LIKE_SCHEMA)
+        db.commit()
+        self._db = db
+        self._count = db.execute("SELECT count(*) FROM history").fetchone()[0]
+        # seed the ring buffer with the tail of the persisted log
+        rows = db.execute(
+            f"SELECT {_COLUMNS} FROM history ORDER BY id DESC LIMIT ?", (self.capacity,)).fetchall()
+        self._recent.extend(HistoryRecord(*r) for r in reversed(rows))
+
+    @property
+    def persistent(self):
+        return self._db is not None
+
+    def add(self, expression, result, mode=None, category="calc", timestamp=None):
+        rec = HistoryRecord(expression, result, mode, category,
+                            time.time() if timestamp is None else timestamp)
+        self._recent.append(rec)
+        if self._db is not None:
+            self._pending.append(rec)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+        return rec
+
+    def flush(self):
+        if self._db is None or not self._pending:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO history (expression, result, mode, category, ts) VALUES (?, ?, ?, ?, ?)",
+                self._pending)
+        self._count += len(self._pending)
+        self._pending = []
+
+    def recent(self):
+        return list(self._recent)
+
+    def __len__(self):
+        if self._db is None:
+            return len(self._recent)
+        return self._count + len(self._pending)
+
+    def page(self, offset, limit):
+        """Records at positions [offset, offset+limit), oldest first."""
+        if self._db is None:
+            return list(islice(self._recent, offset, offset + limit))
+        self.flush()
+        # rowids are contiguous (rows are only ever appended or all cleared),
+        # so a position maps straight onto the primary key
+        first = self._db.execute("SELECT min(id) FROM history").fetchone()[0]
+        if first is None:
+            return []
+        rows = self._db.execute(
+            f"SELECT {_COLUMNS} FROM history WHERE id >= ? ORDER BY id LIMIT ?",
+            (first + offset, limit)).fetchall()
+        return [HistoryRecord(*r) for r in rows]
+
+    def _search_sql(self, text):
+        if self._fts and len(text) >= 3:
+            # trigram index: substring match on expression or result
+            quoted = '"' + text.replace('"', '""') + '"'
+            return ("FROM history WHERE id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)",
+                    (quoted,))
+        if self._fts:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            return ("FROM history WHERE expression LIKE ? ESCAPE '\\' OR result LIKE ? ESCAPE '\\'",
+                    (pattern, pattern))
+        # without FTS only prefix searches can use the index
+        return "FROM history WHERE expression >= ? AND expression < ?", (text, text + "\U0010ffff")
+
+    def search_count(self, text):
+        if self._db is None:
+            return sum(1 for _ in self._search_memory(text))
+        self.flush()
+        where, args = self._search_sql(text)
+        return self._db.execute("SELECT count(*) " + where, args).fetchone()[0]
+
+    def search(self, text, offset=0, limit=100):
+        """Matching records, oldest first."""
+        if self._db is None:
+            return list(islice(self._search_memory(text), offset, offset + limit))
+        self.flush()
+        where, args = self._search_sql(text)
+        rows = self._db.execute(
+            f"SELECT {_COLUMNS} " + where + " ORDER BY id LIMIT ? OFFSET ?",
+            args + (limit, offset)).fetchall()
+        return [HistoryRecord(*r) for r in rows]
+
+    def _search_memory(self, text):
+        return (r for r in self._recent if text in r.expression or text in r.result)
+
+    def clear(self):
+        self._recent.clear()
+        self._pending = []
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM history")
+            self._count = 0
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
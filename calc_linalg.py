@@ -0,0 +1,96 @@
+# ------------------------------
+# Vectors and matrices (NumPy / LAPACK)
+# ------------------------------
+# [1, 2, 3] is a vector and [[1, 2], [3, 4]] a matrix: compile_expr turns
+# every list literal into a _mat(...) call, so values are ndarrays, + - * /
+# work elementwise and @ is the matrix product:
+#
+#   solve([[2, 1], [1, 3]], [3, 5])         -> [0.8, 1.4]
+#   det([[1, 2], [3, 4]])                   -> -2
+#   inv([[4, 7], [2, 6]]) @ [1, 1]          -> [-0.1, 0.2]
+#   eig([[2, 0], [0, 3]])                   -> [2, 3]
+#
+# det, inv, solve and eig hand the arrays to numpy.linalg (LAPACK) as they
+# are; values are converted to ndarrays once, when the literal is built,
+# and chained operations pass the arrays along without copying them back
+# to lists. The same functions take ndarrays from Python:
+#
+#   from calc_linalg import solve
+#   x = solve(A, b)         # A: 500x500 ndarray, milliseconds
+#
+# NumPy is only imported when a matrix is used.
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only matrices need it
+    np = None
+
+from calc_core import format_result
+
+# arrays with more elements are shown by shape only
+MAX_SHOWN = 400
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("matrices require numpy (pip install numpy)")
+
+
+def matrix(items):
+    """ndarray from a (nested) list literal."""
+    _require_numpy()
+    try:
+        a = np.array(items)
+    except ValueError:
+        raise ValueError("matrix rows must all have the same length") from None
+    if a.dtype == object:
+        # Decimal literals (precision mode): linear algebra runs in floats
+        kind = np.complex128 if any(isinstance(v, complex) for v in a.flat) else np.float64
+        a = a.astype(kind)
+    return a
+
+
+def _square(a, name):
+    a = np.asarray(a)
+    if a.ndim != 2 or a.shape[0] != a.shape[1]:
+        raise ValueError("{}() needs a square matrix, got shape {}".format(name, a.shape))
+    return a
+
+
+def det(a):
+    _require_numpy()
+    return np.linalg.det(_square(a, "det")).item()
+
+
+def inv(a):
+    _require_numpy()
+    return np.linalg.inv(_square(a, "inv"))
+
+
+def solve(a, b):
+    """x with a @ x == b; b is a vector or a matrix of right-hand sides."""
+    _require_numpy()
+    return np.linalg.solve(_square(a, "solve"), np.asarray(b))
+
+
+def eig(a):
+    """Eigenvalues (real when they all are)."""
+    _require_numpy()
+    values = np.linalg.eigvals(_square(a, "eig"))
+    if np.iscomplexobj(values) and not values.imag.any():
+        values = values.real
+    return values
+
+
+def format_array(a):
+    # list-literal text so a small result can be typed back in
+    if a.ndim == 0:
+        return format_result(a.item())
+    if a.size > MAX_SHOWN:
+        return "<{} array>".format("x".join(str(n) for n in a.shape))
+    return _format_nested(a.tolist())
+
+
+def _format_nested(items):
+    if isinstance(items, list):
+        return "[" + ", ".join(_format_nested(v) for v in items) + "]"
+    return format_result(items)
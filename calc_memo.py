@@ -0,0 +1,267 @@
+# ------------------------------
+# Memoized pure functions
+# ------------------------------
+# With env.memoize set, the pure EvalEnv wrappers (sin, log, root, pow,
+# fact, ...) answer repeated arguments from a bounded LRU cache per
+# function. Each cache keeps one partition per mode (deg_mode, units,
+# complex, precision), so toggle_deg or a new precision never returns a
+# value computed in the other mode:
+#
+#   env = EvalEnv()
+#   env.memoize = True
+#   safe_eval("sin(30) + sin(45)", env)
+#   memo_stats(env)["sin"]
+#   # {'calls': 2, 'hits': 0, 'hit_rate': 0.0, 'entries': 2, 'bytes': 448, ...}
+#
+# Only int and float arguments are cached (1 and 1.0 are different keys;
+# zero is never cached because -0.0 == 0.0). Each cache is bounded in
+# entries and in bytes, and a result bigger than max_item_bytes (a huge
+# factorial) is returned but not kept. After PROBE_CALLS calls a function
+# whose hits save less time than the lookups cost (sin at a few hundred
+# ns, fact below the built-in table) is excluded: the namespace is rebuilt
+# with the plain function and its stats show excluded=True.
+import sys
+import time
+from collections import OrderedDict
+
+MEMO_FUNCS = (
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sqrt', 'cbrt', 'root',
+    'ln', 'log10', 'log', 'exp', 'pow', 'fact', 'binom', 'lgamma', 'lfact',
+)
+# calls seen before a function is kept or excluded (reviewed again every 256 hits)
+PROBE_CALLS = 256
+# dict slot, key tuple and argument floats, roughly
+_ENTRY_OVERHEAD = 200
+_KEY_TYPES = (int, float)
+_MISSING = object()
+
+# ns per memoized call on top of the function itself (float arguments, and
+# several arguments with an int, whose key also holds the types), and ns
+# that timing a call adds to it; measured once
+_lookup_ns = None
+_typed_lookup_ns = None
+_timer_ns = 0.0
+
+
+class FunctionCache:
+    def __init__(self, name, maxsize=1024, max_bytes=4 << 20, max_item_bytes=64 << 10):
+        self.name = name
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        # mode -> LRU of that mode's results; maxsize and max_bytes cover them all
+        self.modes = {}
+        self.entries = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0       # arguments that cannot be keys, results too big to keep
+        self.compute_ns = 0     # total time of the misses
+        self.typed_misses = 0   # misses keyed with argument types (the slower lookup)
+        # warm calls timed now and then on a hit: misses run cold and overstate the cost
+        self.sampled_ns = 0
+        self.samples = 0
+        self.excluded = False
+        self.on_exclude = None
+
+    def partition(self, mode):
+        data = self.modes.get(mode)
+        if data is None:
+            data = self.modes[mode] = OrderedDict()
+        return data
+
+    def store(self, data, key, value, elapsed_ns):
+        self.misses += 1
+        if type(key) is tuple and key and type(key[0]) is tuple:
+            self.typed_misses += 1
+        self.compute_ns += max(elapsed_ns - _timer_ns, 0)
+        size = sys.getsizeof(value) + _ENTRY_OVERHEAD
+        if size > self.max_item_bytes:
+            self.uncached += 1
+        else:
+            data[key] = value
+            self.entries += 1
+            self.bytes += size
+            while self.entries > self.maxsize or self.bytes > self.max_bytes:
+                # oldest entry of this mode (or of any mode once this one is empty)
+                victim = data if data else next(d for d in self.modes.values() if d)
+                _, old = victim.popitem(last=False)
+                self.entries -= 1
+                self.bytes -= sys.getsizeof(old) + _ENTRY_OVERHEAD
+        self.review()
+
+    def sample(self, fn, args):
+        t0 = time.perf_counter_ns()
+        fn(*args)
+        elapsed = time.perf_counter_ns() - t0
+        if elapsed < 5000:
+            # a single fast call is mostly clock: time a few in a row
+            t0 = time.perf_counter_ns()
+            for _ in range(16):
+                fn(*args)
+            elapsed = (time.perf_counter_ns() - t0) / 16
+        self.sampled_ns += max(elapsed - _timer_ns, 0)
+        self.samples += 1
+        self.review()
+
+    def cost_ns(self):
+        # estimated time of one call without the cache
+        if self.samples:
+            return self.sampled_ns / self.samples
+        return self.compute_ns / self.misses if self.misses else 0.0
+
+    def review(self):
+        # keep the cache only while hits save more than every lookup costs
+        calls = self.hits + self.misses
+        if self.excluded or calls < PROBE_CALLS or not self.misses:
+            return
+        saved = self.hits * self.cost_ns()
+        typed = self.typed_misses / self.misses
+        if saved < calls * (_lookup_ns + typed * (_typed_lookup_ns - _lookup_ns)):
+            self.excluded = True
+            self.clear()
+            if self.on_exclude is not None:
+                self.on_exclude(self.name)
+
+    def clear(self):
+        for data in self.modes.values():
+            data.clear()
+        self.entries = 0
+        self.bytes = 0
+
+    def stats(self):
+        calls = self.hits + self.misses
+        return {
+            "calls": calls + self.uncached,
+            "hits": self.hits,
+            "hit_rate": self.hits / calls if calls else 0.0,
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "compute_us": self.cost_ns() / 1e3,
+            "excluded": self.excluded,
+        }
+
+
+def _memoized(cache, fn, mode):
+    data = cache.partition(mode)
+
+    def memoized(*args):
+        if cache.excluded:
+            return fn(*args)    # a namespace copy made before the exclusion
+        key = args
+        for a in args:
+            t = type(a)
+            if t is not float or not a:
+                # zero is not cached at all (-0.0 == 0.0)
+                if t is not int or not a:
+                    cache.uncached += 1
+                    return fn(*args)
+                key = None
+        if key is None:
+            # ints need their types in the key (sqrt(4) is 2, sqrt(4.0) is
+            # 2.0): a lone int is its own key, unlike the tuple (4.0,)
+            key = args[0] if len(args) == 1 else (args, tuple(map(type, args)))
+        value = data.get(key, _MISSING)
+        if value is not _MISSING:
+            data.move_to_end(key)
+            cache.hits += 1
+            if not cache.hits & 255:
+                cache.sample(fn, args)
+            return value
+        t0 = time.perf_counter_ns()
+        value = fn(*args)
+        cache.store(data, key, value, time.perf_counter_ns() - t0)
+        return value
+    memoized.__name__ = getattr(fn, "__name__", cache.name)
+    return memoized
+
+
+def _best_ns(fn, number=2000, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        d = (time.perf_counter_ns() - t0) / number
+        best = d if best is None else min(best, d)
+    return best
+
+
+def _calibrate():
+    # (cost of a hit over calling the function, the same with a typed key,
+    # cost of timing a call)
+    cache = FunctionCache("calibrate")
+    cache.excluded = False  # _memoized would bypass an excluded cache
+    cache.review = lambda: None     # never reviewed (that needs this measurement)
+
+    def fn(*args):
+        return args
+    wrapped = _memoized(cache, fn, None)
+    wrapped(1.5)
+    wrapped(3, 2)
+    hit = _best_ns(lambda: wrapped(1.5)) - _best_ns(lambda: fn(1.5))
+    typed = _best_ns(lambda: wrapped(3, 2)) - _best_ns(lambda: fn(3, 2))
+    clock = time.perf_counter_ns
+    timer = _best_ns(lambda: clock() - clock()) - _best_ns(lambda: None)
+    return max(hit, 1.0), max(typed, hit, 1.0), max(timer, 0.0)
+
+
+class Memo:
+    """The caches of one EvalEnv, shared by the namespaces of all its modes."""
+
+    def __init__(self, env, maxsize=1024, max_bytes=4 << 20, max_item_bytes=64 << 10):
+        global _lookup_ns, _typed_lookup_ns, _timer_ns
+        if _lookup_ns is None:
+            _lookup_ns, _typed_lookup_ns, _timer_ns = _calibrate()
+        self.env = env
+        self.caches = {}
+        for name in MEMO_FUNCS:
+            cache = FunctionCache(name, maxsize, max_bytes, max_item_bytes)
+            cache.on_exclude = self._excluded
+            self.caches[name] = cache
+
+    def _excluded(self, name):
+        # rebuild the namespace on the next evaluation, without this wrapper
+        self.env._ns = None
+
+    def namespace(self, base):
+        env = self.env
+        mode = (env.deg_mode, env.units, env.complex, env.precision)
+        return {name: _memoized(cache, base[name], mode)
+                for name, cache in self.caches.items()
+                if name in base and not cache.excluded}
+
+    def stats(self):
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+    def clear(self):
+        for cache in self.caches.values():
+            cache.clear()
+            cache.hits = cache.misses = cache.uncached = cache.compute_ns = cache.typed_misses = 0
+            cache.sampled_ns = cache.samples = 0
+            cache.excluded = False
+        self.env._ns = None
+
+
+def memo_namespace(env, base):
+    """Memoizing wrappers around the functions in ``base`` (the namespace built so far)."""
+    if env._memo is None:
+        env._memo = Memo(env)
+    return env._memo.namespace(base)
+
+
+def memo_stats(env):
+    """Per-function calls, hits, hit_rate, entries, bytes (approximate), compute_us, excluded."""
+    return env._memo.stats() if env._memo is not None else {}
+
+
+def format_memo_stats(stats):
+    lines = ["{:8} {:>9} {:>8} {:>7} {:>10} {:>11}  {}".format(
+        "function", "calls", "hit rate", "entries", "bytes", "compute", "")]
+    for name, s in sorted(stats.items()):
+        if not s["calls"]:
+            continue
+        lines.append("{:8} {:>9} {:>7.1%} {:>7} {:>10} {:>8.2f} us  {}".format(
+            name, s["calls"], s["hit_rate"], s["entries"], s["bytes"], s["compute_us"],
+            "excluded" if s["excluded"] else ""))
+    return "\n".join(lines)
@@ -0,0 +1,345 @@
+# ------------------------------
+# Opt-in instrumentation and profiling
+# ------------------------------
+# Nothing here runs unless enable() is called. While enabled:
+#   * every function in an EvalEnv namespace is wrapped to count calls,
+#     errors by exception type and a latency histogram
+#   * safe_eval / guarded_eval record compile and execute time per
+#     expression and evaluation errors by exception type
+# Disabled, the engine pays one `is None` check per evaluation: namespaces
+# hold the plain bound methods again (enable/disable bump an epoch that is
+# part of the namespace cache key).
+#
+#   import calc_metrics
+#   calc_metrics.enable()
+#   ...
+#   print(calc_metrics.to_prometheus())     # or to_json()
+#
+#   with calc_metrics.profile("run.prof"):                  # cProfile
+#       ...
+#   with calc_metrics.profile("run.folded", mode="sampling"):
+#       ...                                 # collapsed stacks for flame graphs
+import bisect
+import json
+import sys
+import threading
+import time
+
+import calc_core
+from calc_core import compile_expr, _EVAL_GLOBALS
+
+# histogram bucket upper bounds in seconds (Prometheus "le")
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+           1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+# distinct expressions tracked individually; the rest are summed as "<other>"
+MAX_EXPRESSIONS = 500
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "errors")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)     # last one is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.errors = {}        # exception type name -> count
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def snapshot(self):
+        cumulative = []
+        running = 0
+        for c in self.counts:
+            running += c
+            cumulative.append(running)
+        return {
+            "count": self.count,
+            "sum_s": self.total,
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], cumulative)),
+            "errors": dict(self.errors),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.functions = {}     # name -> Histogram
+        self.expressions = {}   # source -> [count, compile_s, execute_s, errors]
+        self.errors = {}        # exception type name -> count, over evaluations
+        self.evaluations = 0
+        self.compile_s = 0.0
+        self.execute_s = 0.0
+
+    # ------------------------------
+    # Function wrappers
+    # ------------------------------
+    def wrap_namespace(self, ns):
+        return {name: self._wrap(name, fn) if callable(fn) and not name.startswith("_") else fn
+                for name, fn in ns.items()}
+
+    def _wrap(self, name, fn):
+        with self._lock:
+            hist = self.functions.get(name)
+            if hist is None:
+                hist = self.functions[name] = Histogram()
+        lock = self._lock
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                with lock:
+                    kind = type(e).__name__
+                    hist.errors[kind] = hist.errors.get(kind, 0) + 1
+                raise
+            finally:
+                elapsed = clock() - t0
+                with lock:
+                    hist.observe(elapsed)
+        wrapper.__name__ = name
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    # ------------------------------
+    # Evaluation timing
+    # ------------------------------
+    def _record(self, source, compile_s, execute_s, error):
+        with self._lock:
+            self.evaluations += 1
+            self.compile_s += compile_s
+            self.execute_s += execute_s
+            entry = self.expressions.get(source)
+            if entry is None:
+                if len(self.expressions) >= MAX_EXPRESSIONS:
+                    source = "<other>"
+                entry = self.expressions.setdefault(source, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += compile_s
+            entry[2] += execute_s
+            if error is not None:
+                entry[3] += 1
+                kind = type(error).__name__
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def _timed(self, expr, run):
+        # run(compiled) does the execute phase
+        t0 = time.perf_counter()
+        try:
+            compiled = compile_expr(expr)
+        except Exception as e:
+            self._record(expr, time.perf_counter() - t0, 0.0, e)
+            raise
+        t1 = time.perf_counter()
+        try:
+            val = run(compiled)
+        except Exception as e:
+            self._record(compiled.source, t1 - t0, time.perf_counter() - t1, e)
+            raise
+        self._record(compiled.source, t1 - t0, time.perf_counter() - t1, None)
+        return val
+
+    def safe_eval(self, expr, env):
+        def run(compiled):
+            if env.precision:
+                from calc_precision import precise_eval
+                return precise_eval(compiled, env)
+            ns = env.namespace()
+            # the code safe_eval would run, optimized form included
+            code = calc_core._optimized_code(compiled, env) if calc_core._optimize else compiled.code
+            return eval(code, _EVAL_GLOBALS, ns)
+        return self._timed(expr, run)
+
+    def guarded_eval(self, expr, env, limits):
+        from calc_guard import _guarded_run
+        return self._timed(expr, lambda compiled: _guarded_run(compiled, env, limits))
+
+    # ------------------------------
+    # Export
+    # ------------------------------
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "evaluations": self.evaluations,
+                "compile_s": self.compile_s,
+                "execute_s": self.execute_s,
+                "errors": dict(self.errors),
+                "functions": {name: h.snapshot() for name, h in sorted(self.functions.items())},
+                "expressions": {
+                    src: {"count": c, "compile_s": cs, "execute_s": es, "errors": err}
+                    for src, (c, cs, es, err) in self.expressions.items()
+                },
+            }
+
+
+def _label(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def to_prometheus(metrics=None):
+    """Text exposition format snapshot."""
+    snap = (metrics or _require()).snapshot()
+    lines = [
+        "# HELP scicalc_evaluations_total Expressions evaluated.",
+        "# TYPE scicalc_evaluations_total counter",
+        "scicalc_evaluations_total {}".format(snap["evaluations"]),
+        "# HELP scicalc_eval_seconds_total Time spent per evaluation phase.",
+        "# TYPE scicalc_eval_seconds_total counter",
+        'scicalc_eval_seconds_total{{phase="compile"}} {!r}'.format(snap["compile_s"]),
+        'scicalc_eval_seconds_total{{phase="execute"}} {!r}'.format(snap["execute_s"]),
+        "# HELP scicalc_eval_errors_total Failed evaluations by exception type.",
+        "# TYPE scicalc_eval_errors_total counter",
+    ]
+    for kind, n in sorted(snap["errors"].items()):
+        lines.append("scicalc_eval_errors_total{{type={}}} {}".format(_label(kind), n))
+    lines += [
+        "# HELP scicalc_function_seconds Latency of calculator functions.",
+        "# TYPE scicalc_function_seconds histogram",
+    ]
+    for name, h in snap["functions"].items():
+        if not h["count"]:
+            continue
+        fn = _label(name)
+        for le, n in h["buckets"].items():
+            lines.append("scicalc_function_seconds_bucket{{function={},le={}}} {}".format(fn, _label(le), n))
+        lines.append("scicalc_function_seconds_sum{{function={}}} {!r}".format(fn, h["sum_s"]))
+        lines.append("scicalc_function_seconds_count{{function={}}} {}".format(fn, h["count"]))
+    lines += [
+        "# HELP scicalc_function_errors_total Calculator function errors by exception type.",
+        "# TYPE scicalc_function_errors_total counter",
+    ]
+    for name, h in snap["functions"].items():
+        for kind, n in sorted(h["errors"].items()):
+            lines.append("scicalc_function_errors_total{{function={},type={}}} {}".format(
+                _label(name), _label(kind), n))
+    lines += [
+        "# HELP scicalc_expression_seconds_total Time per expression and phase.",
+        "# TYPE scicalc_expression_seconds_total counter",
+    ]
+    for src, e in snap["expressions"].items():
+        expr = _label(src)
+        lines.append('scicalc_expression_seconds_total{{expr={},phase="compile"}} {!r}'.format(expr, e["compile_s"]))
+        lines.append('scicalc_expression_seconds_total{{expr={},phase="execute"}} {!r}'.format(expr, e["execute_s"]))
+    return "\n".join(lines) + "\n"
+
+
+def to_json(metrics=None, indent=None):
+    return json.dumps((metrics or _require()).snapshot(), indent=indent, sort_keys=True)
+
+
+def dump(path, metrics=None):
+    # ".prom" / ".txt" -> Prometheus text, anything else JSON
+    text = to_prometheus(metrics) if path.endswith((".prom", ".txt")) else to_json(metrics, indent=2)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+# ------------------------------
+# Switch
+# ------------------------------
+def enable():
+    """Start recording (keeps the current data if already enabled)."""
+    if calc_core._metrics is None:
+        calc_core._metrics = Metrics()
+        calc_core._ns_epoch += 1
+    return calc_core._metrics
+
+
+def disable():
+    """Stop recording; returns the collected Metrics."""
+    metrics = calc_core._metrics
+    calc_core._metrics = None
+    calc_core._ns_epoch += 1
+    return metrics
+
+
+def current():
+    return calc_core._metrics
+
+
+def _require():
+    if calc_core._metrics is None:
+        raise RuntimeError("instrumentation is not enabled (call calc_metrics.enable())")
+    return calc_core._metrics
+
+# ------------------------------
+# Profiling
+# ------------------------------
+class _Sampler:
+    # samples the profiled thread's stack every `interval` seconds
+    def __init__(self, interval):
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append("{}:{}".format(code.co_filename.rsplit("/", 1)[-1], code.co_name))
+                frame = frame.f_back
+            if parts:
+                key = ";".join(reversed(parts))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, path):
+        self._stop.set()
+        self._thread.join()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1]):
+                f.write("{} {}\n".format(stack, n))
+
+
+class profile:
+    """Profile a session and write the result to ``path`` when it ends.
+
+    mode="cprofile" writes pstats data (python -m pstats path);
+    mode="sampling" writes collapsed stacks ("a;b;c count") for flame graph
+    tools, at a much lower overhead.
+    """
+
+    def __init__(self, path, mode="cprofile", interval=0.005):
+        if mode not in ("cprofile", "sampling"):
+            raise ValueError("mode must be 'cprofile' or 'sampling'")
+        self.path = path
+        self.mode = mode
+        self.interval = interval
+        self._impl = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            import cProfile
+            self._impl = cProfile.Profile()
+            self._impl.enable()
+        else:
+            self._impl = _Sampler(self.interval)
+            self._impl.start()
+        return self
+
+    def stop(self):
+        if self._impl is None:
+            return
+        if self.mode == "cprofile":
+            self._impl.disable()
+            self._impl.dump_stats(self.path)
+        else:
+            self._impl.stop(self.path)
+        self._impl = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
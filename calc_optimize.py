@@ -0,0 +1,262 @@
+# ------------------------------
+# Expression optimizer
+# ------------------------------
+# Rewrites a compiled expression before it is executed again and again:
+#
+#   sin(30)^2 + cos(30)^2          -> 1.0           (Deg; sin/cos run once)
+#   x * (pi/180)                   -> x * 0.017453292519943295
+#   sin(x)^2 + cos(x)^2 + sin(x)*cos(x)
+#       -> (lambda _t0, _t1: _t0**2 + _t1**2 + _t0*_t1)(sin(x), cos(x))
+#   --x, x * 1, x ** 1, x - 0      -> x             (x known to be real)
+#
+# Constant subtrees are folded by calling the namespace's own functions, so
+# the folded value is the one the unoptimized code would compute in that
+# mode (sin(30) folds differently in Deg and Rad; the caller caches one
+# optimized form per namespace). Only pure calculator functions are folded
+# or shared, and only into int/float/complex constants; a fold that raises
+# is left in place so the error still happens at run time. Identities are
+# dropped only where they cannot change a value, sign of zero or type:
+# x + 0 is kept (-0.0 + 0 is 0.0), and so is x * 1 for a possibly complex x.
+#
+#   from calc_optimize import optimize_code
+#   code = optimize_code(compile_expr(src), env, variables={"x"})
+#   eval(code, _EVAL_GLOBALS, ns)       # same namespace as compiled.code
+import ast
+import copy
+import math
+
+# deterministic calculator functions (values depend only on the arguments and the mode)
+PURE = frozenset([
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sqrt', 'cbrt', 'root',
+    'ln', 'log10', 'log', 'exp', 'pow', 'fact', 'binom', 'lgamma', 'lfact',
+    'inv', 'abs', 'round', 're', 'im', 'conj', 'arg', 'diff', 'integrate', 'solve',
+])
+# int/float arguments give an int or a float (never complex) outside complex mode
+_REAL_FUNCS = frozenset([
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sqrt', 'ln', 'log10', 'log',
+    'exp', 'fact', 'binom', 'lgamma', 'lfact', 'abs', 'round',
+])
+# the names EvalEnv binds to fixed numbers; any other name may be rebound
+# by the caller between evaluations (ns['x'] = 3.0) and is never folded
+CONSTANTS = frozenset(['pi', 'e', 'i'])
+# repeated calls to these are worth a temporary even when repeated only once
+_EXPENSIVE = frozenset(['diff', 'integrate', 'solve'])
+_REAL_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod)
+
+# folded ints are kept to this size (the code object holds them)
+MAX_FOLD_BITS = 4096
+_NUMBER = (int, float, complex)
+_BINOPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.Pow: lambda a, b: a ** b,
+}
+
+
+def _const(node):
+    return isinstance(node, ast.Constant) and type(node.value) in _NUMBER
+
+
+def _int_const(node, value):
+    return isinstance(node, ast.Constant) and type(node.value) is int and node.value == value
+
+
+def _fits(value):
+    return type(value) in _NUMBER and (type(value) is not int or value.bit_length() <= MAX_FOLD_BITS)
+
+
+def _too_big(name, args):
+    # results that would be thrown away by _fits: don't compute them twice
+    ints = [a for a in args if type(a) is int]
+    if name in ('fact', 'binom'):
+        return any(abs(a) > 1000 for a in ints)
+    if name == 'pow' and len(ints) == 2:
+        return _pow_too_big(*ints)
+    return False
+
+
+def _pow_too_big(a, b):
+    return b > 0 and abs(a) > 1 and b * math.log2(abs(a)) > MAX_FOLD_BITS
+
+
+class _Folder(ast.NodeTransformer):
+    def __init__(self, ns, variables, real_vars, complex_mode):
+        self.ns = ns
+        self.variables = variables
+        self.real_vars = real_vars
+        self.complex_mode = complex_mode
+
+    def _pure(self, name):
+        return name in PURE and name in self.ns and name not in self.variables
+
+    def is_real(self, node):
+        if isinstance(node, ast.Constant):
+            return type(node.value) in (int, float)
+        if isinstance(node, ast.Name):
+            return self.real_vars and node.id in self.variables
+        if isinstance(node, ast.UnaryOp):
+            return isinstance(node.op, (ast.USub, ast.UAdd)) and self.is_real(node.operand)
+        if isinstance(node, ast.BinOp):
+            return (isinstance(node.op, _REAL_OPS)
+                    and self.is_real(node.left) and self.is_real(node.right))
+        if isinstance(node, ast.Call):
+            return (not self.complex_mode and isinstance(node.func, ast.Name)
+                    and node.func.id in _REAL_FUNCS and self._pure(node.func.id)
+                    and not node.keywords and all(self.is_real(a) for a in node.args))
+        return False
+
+    def _constant(self, value, node):
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_Name(self, node):
+        if (node.id in CONSTANTS and node.id not in self.variables
+                and type(self.ns.get(node.id)) in _NUMBER):
+            return self._constant(self.ns[node.id], node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        operand = node.operand
+        if _const(operand):
+            return self._constant(-operand.value if isinstance(node.op, ast.USub) else +operand.value, node)
+        if isinstance(node.op, ast.USub):
+            if isinstance(operand, ast.UnaryOp) and isinstance(operand.op, ast.USub):
+                return operand.operand      # --x: negation is exact
+        elif self.is_real(operand):
+            return operand                  # +x
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        left, right, op = node.left, node.right, type(node.op)
+        if _const(left) and _const(right) and op in _BINOPS:
+            a, b = left.value, right.value
+            big = type(a) is int and type(b) is int and (
+                _pow_too_big(a, b) if op is ast.Pow
+                else op is ast.Mult and a.bit_length() + b.bit_length() > MAX_FOLD_BITS)
+            if not big:
+                try:
+                    value = _BINOPS[op](a, b)
+                except Exception:
+                    return node
+                if _fits(value):
+                    return self._constant(value, node)
+            return node
+        # int 1 and 0 only: x * 1.0 would turn an int into a float
+        if op is ast.Mult and _int_const(right, 1) and self.is_real(left):
+            return left
+        if op is ast.Mult and _int_const(left, 1) and self.is_real(right):
+            return right
+        if op is ast.Pow and _int_const(right, 1) and self.is_real(left):
+            return left
+        if op is ast.Sub and _int_const(right, 0) and self.is_real(left):
+            return left
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        if not (isinstance(func, ast.Name) and self._pure(func.id)):
+            return node
+        values = node.args + [k.value for k in node.keywords]
+        # calculus calls carry their inner expression as a string constant
+        if not all(isinstance(v, ast.Constant) for v in values):
+            return node
+        args = [a.value for a in node.args]
+        if _too_big(func.id, args):
+            return node
+        try:
+            value = self.ns[func.id](*args, **{k.arg: k.value.value for k in node.keywords})
+        except Exception:
+            return node
+        return self._constant(value, node) if _fits(value) else node
+
+
+# ------------------------------
+# Common subexpressions
+# ------------------------------
+def _pure_call(node, pure):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and pure(node.func.id)
+
+
+def _hoist(body, pure):
+    # repeated pure calls -> parameters of a lambda called with them once:
+    # (lambda _t0, sin, x: <body>)(sin(x), sin, x). The lambda's own names
+    # are parameters too (inside a lambda a name would be looked up in the
+    # globals, not in the namespace eval() was given).
+    total = {}
+    func = {}
+    for node in ast.walk(body):
+        if _pure_call(node, pure):
+            key = ast.dump(node)
+            total[key] = total.get(key, 0) + 1
+            func[key] = node.func.id
+
+    # outermost occurrences only: sin(x) inside a shared cos(sin(x)) goes with it
+    outer = {}
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if _pure_call(node, pure) and total[ast.dump(node)] > 1:
+            key = ast.dump(node)
+            outer[key] = outer.get(key, 0) + 1
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    shared = {k: n for k, n in outer.items() if n > 1}
+    saved = sum(n - 1 for n in shared.values())
+    expensive = any(func[k] in _EXPENSIVE for k in shared)
+    # one call saved about pays for creating and calling the lambda
+    if not shared or (saved < 2 and not expensive):
+        return body
+
+    temps = {}      # key -> (temp name, the call)
+
+    class Replace(ast.NodeTransformer):
+        def visit_Call(self, node):
+            key = ast.dump(node)
+            if key in shared:
+                if key not in temps:
+                    temps[key] = ("_t{}".format(len(temps)), node)
+                return ast.copy_location(ast.Name(id=temps[key][0], ctx=ast.Load()), node)
+            return self.generic_visit(node)
+
+    body = Replace().visit(body)
+    temp_names = {name for name, _ in temps.values()}
+    free = []
+    for node in ast.walk(body):
+        if isinstance(node, ast.Name) and node.id not in temp_names and node.id not in free:
+            free.append(node.id)
+    params = [name for name, _ in temps.values()] + free
+    fn = ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(arg=p) for p in params],
+                           kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=body)
+    args = [call for _, call in temps.values()] + [ast.Name(id=n, ctx=ast.Load()) for n in free]
+    return ast.Call(func=fn, args=args, keywords=[])
+
+
+def optimize_tree(tree, env, variables=frozenset(), real_vars=False):
+    """Optimized copy of an ast.Expression for env's current namespace.
+
+    ``variables`` are names the evaluation namespace binds on top of
+    env.namespace() (they are never folded); ``real_vars`` promises that
+    their values are ints or floats.
+    """
+    ns = env.namespace()
+    variables = frozenset(variables)
+    folder = _Folder(ns, variables, real_vars, env.complex)
+    tree = folder.visit(copy.deepcopy(tree))
+    tree.body = _hoist(tree.body, folder._pure)
+    return ast.fix_missing_locations(tree)
+
+
+def optimize_code(compiled, env, variables=frozenset(), real_vars=False):
+    """Code object computing the same values as compiled.code, in the same namespace."""
+    tree = optimize_tree(compiled.tree, env, variables, real_vars)
+    if ast.dump(tree) == ast.dump(compiled.tree):
+        return compiled.code    # nothing to gain
+    return compile(tree, "<expr>", "eval")
@@ -0,0 +1,480 @@
+# ------------------------------
+# Arbitrary-precision evaluation (decimal backend)
+# ------------------------------
+# Setting EvalEnv.precision to a number of significant digits makes
+# safe_eval run the expression on decimal.Decimal: numeric literals become
+# Decimals, every wrapper (sin, ln, root, cbrt, exp, pow, log, ...) is
+# replaced by a Decimal implementation, and pi/e are computed at the
+# requested precision. Work is done with GUARD_DIGITS extra digits and the
+# result is rounded to `precision` digits at the end.
+#
+# pi, e, the pi/180 factor and the sin/cos/atan series coefficients are
+# cached per working precision, so repeated evaluations at one precision
+# only pay for the series loops.
+import ast
+import contextlib
+import copy
+import decimal
+import functools
+import math
+import threading
+from decimal import Decimal
+
+from calc_core import ExprCache, _EVAL_GLOBALS
+
+GUARD_DIGITS = 10
+# precisions whose constants and coefficients are kept (each holds up to
+# prec/2 Decimals of prec digits)
+_PREC_CACHE = 8
+
+# deadline check of the evaluation running in this thread (see precise_run),
+# called once per iteration of the series loops
+_local = threading.local()
+
+
+def _ticker():
+    return getattr(_local, "tick", None)
+
+# ------------------------------
+# Cached constants and coefficients
+# ------------------------------
+@functools.lru_cache(maxsize=_PREC_CACHE)
+def _pi(prec):
+    # series from the decimal module documentation
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + 2
+        tick = _ticker()
+        three = Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while s != lasts:
+            if tick is not None:
+                tick()
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+        ctx.prec = prec
+        return +s
+
+
+@functools.lru_cache(maxsize=_PREC_CACHE)
+def _e(prec):
+    # sum of 1/k! (Decimal.exp cannot be interrupted by the deadline)
+    tick = _ticker()
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + 2
+        eps = Decimal(10) ** -(prec + 2)
+        s = t = Decimal(1)
+        k = 1
+        while t > eps:
+            if tick is not None:
+                tick()
+            t /= k
+            s += t
+            k += 1
+        ctx.prec = prec
+        return +s
+
+
+@functools.lru_cache(maxsize=_PREC_CACHE)
+def _deg(prec):
+    # pi/180
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec
+        return _pi(prec) / 180
+
+
+def _series_coeffs(prec, first):
+    # 1/k! for k = first, first+2, ... until the term for |x| <= pi is negligible
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec
+        eps = Decimal(10) ** -(prec + 2)
+        pi = _pi(prec)
+        coeffs = []
+        k = first
+        c = Decimal(1) / math.factorial(k)
+        power = pi ** k
+        tick = _ticker()
+        while c * power > eps:
+            if tick is not None:
+                tick()
+            coeffs.append(c)
+            c = c / ((k + 1) * (k + 2))
+            power *= pi * pi
+            k += 2
+        coeffs.append(c)
+        return tuple(coeffs)
+
+
+@functools.lru_cache(maxsize=_PREC_CACHE)
+def _sin_coeffs(prec):
+    return _series_coeffs(prec, 1)
+
+
+@functools.lru_cache(maxsize=_PREC_CACHE)
+def _cos_coeffs(prec):
+    return _series_coeffs(prec, 0)
+
+
+@functools.lru_cache(maxsize=_PREC_CACHE)
+def _atan_coeffs(prec):
+    # 1/(2k+1); after reduction |x| <= 0.1, so each term gains 2 digits
+    tick = _ticker()
+    coeffs = []
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec
+        for k in range(prec // 2 + 2):
+            if tick is not None:
+                tick()
+            coeffs.append(Decimal(1) / (2 * k + 1))
+    return tuple(coeffs)
+
+
+def cache_info():
+    return {f.__name__.lstrip('_'): f.cache_info()._asdict()
+            for f in (_pi, _e, _deg, _sin_coeffs, _cos_coeffs, _atan_coeffs)}
+
+# ------------------------------
+# Decimal math
+# ------------------------------
+def _dec(x):
+    if isinstance(x, Decimal):
+        return x
+    if isinstance(x, float):
+        return Decimal(repr(x))
+    return Decimal(x)
+
+
+def _domain_error():
+    return ValueError("math domain error")
+
+
+def _reduce_angle(x, prec):
+    # into [-pi, pi]; the quotient's digits are added to the working
+    # precision so a large x keeps all of its fractional turn
+    if abs(x) <= _pi(prec):
+        return x
+    extra = max(x.adjusted(), 0) + 2
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + extra
+        pi = _pi(prec + extra)
+        x = x.remainder_near(pi + pi)
+    return +x
+
+
+def _reduce_degrees(x):
+    # exactly into [-180, 180]: x = c * 10**exp with an integer c
+    if abs(x) <= 180 or not x.is_finite():
+        return x
+    sign, digits, exp = x.as_tuple()
+    c = int("".join(map(str, digits)))
+    if exp >= 0:
+        r = Decimal(c * pow(10, exp, 360) % 360)
+    else:
+        r = Decimal(c % (360 * 10 ** -exp)).scaleb(exp)
+    if r > 180:
+        r -= 360
+    return -r if sign else r
+
+
+def _poly(x, x2, coeffs):
+    # sum(c_k * x * x2**k) with alternating signs
+    s = Decimal(0)
+    term = x
+    sign = 1
+    tick = _ticker()
+    for c in coeffs:
+        if tick is not None:
+            tick()
+        t = term * c
+        s = s + t if sign > 0 else s - t
+        if not t:
+            break
+        term *= x2
+        sign = -sign
+    return s
+
+
+def dsin(x):
+    prec = decimal.getcontext().prec
+    x = _reduce_angle(x, prec)
+    return _poly(x, x * x, _sin_coeffs(prec))
+
+
+def dcos(x):
+    prec = decimal.getcontext().prec
+    x = _reduce_angle(x, prec)
+    return _poly(Decimal(1), x * x, _cos_coeffs(prec))
+
+
+def datan(x):
+    prec = decimal.getcontext().prec
+    if x < 0:
+        return -datan(-x)
+    if x > 1:
+        return _pi(prec) / 2 - datan(1 / x)
+    # atan(x) = 2 atan(x / (1 + sqrt(1 + x^2)))
+    tick = _ticker()
+    doublings = 0
+    while x > Decimal("0.1"):
+        if tick is not None:
+            tick()
+        x = x / (1 + (1 + x * x).sqrt())
+        doublings += 1
+    s = Decimal(0)
+    x2 = x * x
+    term = x
+    sign = 1
+    for c in _atan_coeffs(prec):
+        if tick is not None:
+            tick()
+        t = term * c
+        s = s + t if sign > 0 else s - t
+        if not t:
+            break
+        term *= x2
+        sign = -sign
+    return s * (2 ** doublings)
+
+
+def dasin(x):
+    if abs(x) > 1:
+        raise _domain_error()
+    if abs(x) == 1:
+        return _pi(decimal.getcontext().prec) / 2 * x
+    return datan(x / (1 - x * x).sqrt())
+
+
+def dacos(x):
+    return _pi(decimal.getcontext().prec) / 2 - dasin(x)
+
+
+def droot(x, n):
+    # n-th root by Newton iteration, exact for perfect powers
+    if n == 0:
+        raise ZeroDivisionError("zeroth root")
+    neg = x < 0
+    x = abs(x)
+    if x == 0:
+        return x
+    if n != int(n):
+        y = x ** (1 / _dec(n))
+        return -y if neg else y
+    n = int(n)
+    if n < 0:
+        return 1 / droot(-x if neg else x, -n)
+    # float seed from the mantissa: x = m * 10**(q*n + r) with 1 <= m < 10,
+    # so the root is m**(1/n) * 10**(r/n) * 10**q (x itself may be far
+    # outside the float range, where float(x) is inf or 0)
+    e = x.adjusted()
+    q, r = divmod(e, n)
+    m = float(x.scaleb(-e))
+    y = Decimal(repr(m ** (1.0 / n) * 10.0 ** (r / n))).scaleb(q)
+    tick = _ticker()
+    for _ in range(200):
+        if tick is not None:
+            tick()
+        y_new = ((n - 1) * y + x / y ** (n - 1)) / n
+        if y_new == y:
+            break
+        y = y_new
+    return -y if neg else y
+
+
+def precise_namespace(env):
+    # Decimal versions of every EvalEnv wrapper, bound to env's deg_mode
+    prec = env.precision + GUARD_DIGITS
+    pi = _pi(prec)
+    deg = _deg(prec)
+
+    def to_rad(x):
+        x = _dec(x)
+        if not env.deg_mode:
+            return x
+        # whole turns go before the (rounded) conversion to radians
+        return _reduce_degrees(x) * _deg(decimal.getcontext().prec)
+
+    def from_rad(r):
+        return r / _deg(decimal.getcontext().prec) if env.deg_mode else r
+
+    def checked(fn):
+        # decimal signals InvalidOperation where math raises ValueError
+        @functools.wraps(fn)
+        def wrapper(*args):
+            try:
+                return fn(*args)
+            except decimal.InvalidOperation:
+                raise _domain_error()
+        return wrapper
+
+    def sin(x):
+        return dsin(to_rad(x))
+    def cos(x):
+        return dcos(to_rad(x))
+    def tan(x):
+        r = to_rad(x)
+        c = dcos(r)
+        if not c:
+            raise ValueError("math range error")
+        return dsin(r) / c
+    def asin(x):
+        return from_rad(dasin(_dec(x)))
+    def acos(x):
+        return from_rad(dacos(_dec(x)))
+    def atan(x):
+        return from_rad(datan(_dec(x)))
+    def sqrt(x):
+        x = _dec(x)
+        if x < 0:
+            raise _domain_error()
+        return x.sqrt()
+    def cbrt(x):
+        return droot(_dec(x), 3)
+    def root(x, n):
+        return droot(_dec(x), _dec(n))
+    def ln(x):
+        x = _dec(x)
+        if x <= 0:
+            raise _domain_error()
+        return x.ln()
+    def log10(x):
+        x = _dec(x)
+        if x <= 0:
+            raise _domain_error()
+        return x.log10()
+    def log(x, base=10):
+        x = _dec(x)
+        base = _dec(base)
+        if x <= 0 or base <= 0 or base == 1:
+            raise _domain_error()
+        return x.ln() / base.ln()
+    def fact(n):
+        return env.fact(n)
+    # magnitude queries stay at float accuracy
+    def lgamma(x):
+        return _dec(env.lgamma(x))
+    def lfact(n):
+        return _dec(env.lfact(n))
+    def exp(x):
+        return _dec(x).exp()
+    def pow(x, y):
+        return _dec(x) ** _dec(y)
+    def inv(x):
+        return 1 / _dec(x)
+    def round_(x, ndigits=None):
+        # ndigits arrives as a Decimal literal
+        return round(x) if ndigits is None else round(x, int(ndigits))
+
+    ns = {
+        '_D': Decimal,
+        'pi': pi,
+        'e': _e(prec),
+        'sin': checked(sin), 'cos': checked(cos), 'tan': checked(tan),
+        'asin': checked(asin), 'acos': checked(acos), 'atan': checked(atan),
+        'sqrt': checked(sqrt), 'cbrt': checked(cbrt), 'root': checked(root),
+        'ln': checked(ln), 'log10': checked(log10), 'log': checked(log),
+        'fact': fact, 'exp': checked(exp), 'pow': checked(pow), 'inv': checked(inv),
+        'lgamma': lgamma, 'lfact': lfact,
+        'round': round_,
+    }
+    return ns
+
+# ------------------------------
+# Evaluation
+# ------------------------------
+class _DecimalLiterals(ast.NodeTransformer):
+    # 0.1 -> _D('0.1') so literals are exact decimals, ints too so 1/3 divides in decimal
+    def __init__(self, source):
+        self.source = source
+
+    def _text(self, node):
+        # a float literal's own digits: 1e-330 or 1e400 are 0.0 and inf as floats
+        if type(node.value) is float:
+            seg = ast.get_source_segment(self.source, node)
+            if seg is not None:
+                try:
+                    if float(seg) == node.value:
+                        return seg
+                except ValueError:
+                    pass
+        return repr(node.value)
+
+    def visit_Constant(self, node):
+        if type(node.value) in (int, float):
+            call = ast.Call(func=ast.Name(id='_D', ctx=ast.Load()),
+                            args=[ast.Constant(self._text(node))], keywords=[])
+            return ast.copy_location(call, node)
+        return node
+
+
+_precise_cache = ExprCache(1024)
+
+
+def precise_code(compiled):
+    """compiled.code with every number literal a Decimal (for the namespace of precise_namespace)."""
+    code = _precise_cache.get(compiled.source)
+    if code is None:
+        tree = _DecimalLiterals(compiled.source).visit(copy.deepcopy(compiled.tree))
+        ast.fix_missing_locations(tree)
+        code = compile(tree, "<expr>", "eval")
+        _precise_cache.put(compiled.source, code)
+    return code
+
+
+def precise_run(code, env, globals_, locals_=None, rounded=True, tick=None):
+    """eval() a precise_code() at env's working precision.
+
+    The value is rounded to env.precision unless ``rounded`` is false (an
+    intermediate value, such as a worksheet function's, keeps the guard
+    digits). ``tick`` is called in every iteration of the series loops and
+    may raise to abandon the evaluation (calc_guard's deadline).
+    """
+    with _deadline(tick):
+        return _run(code, env, globals_, locals_, rounded)
+
+
+@contextlib.contextmanager
+def _deadline(tick):
+    prev = _ticker()
+    _local.tick = tick if tick is not None else prev
+    try:
+        yield
+    finally:
+        _local.tick = prev
+
+
+def _run(code, env, globals_, locals_, rounded):
+    with decimal.localcontext() as ctx:
+        ctx.prec = env.precision + GUARD_DIGITS
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        try:
+            val = eval(code, globals_, locals_)
+        except decimal.DivisionByZero:
+            raise ZeroDivisionError("division by zero")
+        except decimal.InvalidOperation:
+            raise _domain_error()
+        if not rounded:
+            return val
+        ctx.prec = env.precision
+        return +val if isinstance(val, Decimal) else val
+
+
+def precise_eval(compiled, env, tick=None):
+    with _deadline(tick):
+        # the namespace's pi and e count against the deadline too
+        return _run(precise_code(compiled), env, _EVAL_GLOBALS, env.namespace(), True)
+
+
+def format_decimal(d):
+    if not d.is_finite():
+        return str(d)
+    # normalize() rounds to the current context, so give it room for every digit
+    t = d.normalize(decimal.Context(prec=max(1, len(d.as_tuple().digits)),
+                                    Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN))
+    if t.is_zero():
+        return "0"
+    if -7 < t.adjusted() < 40:
+        return format(t, "f")
+    return format(t, "e")
@@ -0,0 +1,165 @@
+# ------------------------------
+# Live preview
+# ------------------------------
+# LivePreview evaluates the calculator entry while it is being typed, on a
+# background thread, and hands back the text to show under it ("" while
+# the input is incomplete or does not evaluate):
+#
+#   preview = LivePreview()
+#   preview.submit("sin(30) + cos(60)", deg_mode=True)
+#   preview.poll()      # -> ("sin(30) + cos(60)", "1") once it is done
+#   preview.evaluate("sin(30) + cos(")      # -> "" (same work, this thread)
+#
+# The input is split into its top-level terms at the + and - outside any
+# brackets (nothing binds looser), each term goes through compile_expr's
+# cache and its value is kept per mode, and the values are combined left
+# to right exactly as the whole expression would be. Typing at the end of a
+# long expression only compiles and evaluates the last term; editing the
+# middle recomputes only the term being edited. Evaluation runs under
+# small calc_guard limits, so a stray 9^9^9 cannot keep the thread busy,
+# and input that has not been started yet is replaced by newer input.
+import threading
+
+from calc_core import EvalEnv, ExprCache, format_result
+from calc_guard import Limits, guarded_eval
+
+PREVIEW_LIMITS = Limits(max_int_bits=1 << 16, max_fact=2000, timeout=0.25)
+
+_OPEN = "(["
+_CLOSE = ")]"
+# after one of these a + or - is a sign, not a new term
+_OPERATORS = "+-*/%@^,(["
+# input ending like this is still being typed
+_PENDING_END = tuple("+-*/%@^,([")
+
+
+def _is_exponent(src, k):
+    # the sign in "1.5e-3": an e right after the digits of a number literal
+    if k < 2 or src[k - 1] not in "eE":
+        return False
+    j = k - 2
+    while j >= 0 and (src[j].isdigit() or src[j] == "."):
+        j -= 1
+    if j == k - 2:
+        return False
+    # "x2e-1" is the name x2e minus 1
+    return j < 0 or not (src[j].isalnum() or src[j] == "_")
+
+
+def split_terms(src):
+    """[(sign, term), ...] for the top-level terms of src, None if the brackets do not balance."""
+    terms = []
+    depth = 0
+    start = 0
+    sign = "+"
+    prev = ""       # last non-blank character
+    for k, c in enumerate(src):
+        if c in _OPEN:
+            depth += 1
+        elif c in _CLOSE:
+            depth -= 1
+            if depth < 0:
+                return None
+        elif (c in "+-" and depth == 0 and prev and prev not in _OPERATORS
+              and not _is_exponent(src, k)):
+            terms.append((sign, src[start:k]))
+            sign = c
+            start = k + 1
+        if not c.isspace():
+            prev = c
+    if depth:
+        return None
+    terms.append((sign, src[start:]))
+    return terms
+
+
+class LivePreview:
+    def __init__(self, limits=None, cache_size=256):
+        self.env = EvalEnv()
+        self.limits = limits or PREVIEW_LIMITS
+        # (term, deg_mode, units, complex) -> value
+        self._values = ExprCache(cache_size)
+        self._cond = threading.Condition()
+        self._pending = None    # (text, deg_mode, units, complex_mode) not started yet
+        self._running = False
+        self._done = None       # (text, preview) not collected yet
+        self._closed = False
+        self._thread = None
+
+    def evaluate(self, text, deg_mode=True, units=False, complex_mode=False):
+        """Preview text for ``text``, computed in the calling thread."""
+        env = self.env
+        env.deg_mode = deg_mode
+        env.units = units
+        env.complex = complex_mode
+        src = text.strip()
+        if not src or src.endswith(_PENDING_END):
+            return ""
+        terms = split_terms(src) if not env.precision else [("+", src)]
+        if terms is None:
+            return ""
+        try:
+            value = self._term_value(terms[0][1])
+            for sign, term in terms[1:]:
+                if sign == "+":
+                    value = value + self._term_value(term)
+                else:
+                    value = value - self._term_value(term)
+            if callable(value):
+                return ""   # "sin" on its way to "sin(30)"
+            out = format_result(value)
+        except Exception:
+            return ""   # incomplete or invalid: nothing to show yet
+        # a plain number previews as itself
+        return "" if out == src else out
+
+    def _term_value(self, term):
+        env = self.env
+        key = (term.strip(), env.deg_mode, env.units, env.complex)
+        value = self._values.get(key)
+        if value is None:
+            value = guarded_eval(key[0], env, self.limits)
+            self._values.put(key, value)
+        return value
+
+    def submit(self, text, deg_mode=True, units=False, complex_mode=False):
+        with self._cond:
+            self._pending = (text, deg_mode, units, complex_mode)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="preview", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def poll(self):
+        """(text, preview) for the latest finished input, or None."""
+        with self._cond:
+            done, self._done = self._done, None
+        return done
+
+    @property
+    def busy(self):
+        with self._cond:
+            return self._pending is not None or self._running
+
+    def cache_stats(self):
+        return self._values.stats()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job, self._pending = self._pending, None
+                self._running = True
+            result = self.evaluate(*job)
+            with self._cond:
+                self._running = False
+                self._done = (job[0], result)
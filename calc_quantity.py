@@ -0,0 +1,285 @@
+# ------------------------------
+# Quantities with units (dimensional analysis)
+# ------------------------------
+# With EvalEnv.units switched on, unit names become values in the
+# expression namespace, so `3 km/h * 2 h + 500 m` evaluates to 6500 m.
+#
+# A dimension vector (length, mass, time, temperature exponents) is packed
+# into one int, 8 signed bits per base dimension. Packing is linear, so
+# multiplying quantities adds their packed dims, dividing subtracts and
+# raising to an integer power multiplies: every dimension check or update
+# is a single int operation. An exponent outside -128..127 would carry into
+# the next field, so results that could leave that range are unpacked and
+# checked (DimensionError) instead. Values are stored in SI units; the unit
+# registry is built once at import from the converter tables in calc_units
+# and every Unit is interned.
+import math
+
+from calc_units import LINEAR_UNITS
+
+_BASES = ("m", "kg", "s", "K")
+_BITS = 8
+
+
+def pack(exponents):
+    d = 0
+    for i, e in enumerate(exponents):
+        d += e << (_BITS * i)
+    return d
+
+
+def unpack(d):
+    out = []
+    for _ in _BASES:
+        e = ((d + 128) & 0xFF) - 128
+        out.append(e)
+        d = (d - e) >> _BITS
+    return tuple(out)
+
+
+# every field within -64..63: adding two such dims cannot overflow a field
+# (written out inline in the operators below, which are on the hot path)
+_BIAS = pack((64,) * len(_BASES))
+_HIGH = ~pack((127,) * len(_BASES))
+
+
+def _small(d):
+    return not (d + _BIAS) & _HIGH
+
+
+def _checked(exps):
+    exps = tuple(exps)
+    if any(not -128 <= e <= 127 for e in exps):
+        raise DimensionError("dimension exponent out of range (-128..127): {}".format(
+            " ".join("{}^{}".format(b, e) for b, e in zip(_BASES, exps) if e)))
+    return pack(exps)
+
+
+def _add_dims(a, b):
+    if _small(a) and _small(b):
+        return a + b
+    return _checked(x + y for x, y in zip(unpack(a), unpack(b)))
+
+
+def _sub_dims(a, b):
+    if _small(a) and _small(b):
+        return a - b
+    return _checked(x - y for x, y in zip(unpack(a), unpack(b)))
+
+
+def _mul_dims(d, n):
+    if _small(d) and -1 <= n <= 2:
+        return d * n
+    return _checked(e * n for e in unpack(d))
+
+
+LENGTH = pack((1, 0, 0, 0))
+MASS = pack((0, 1, 0, 0))
+TIME = pack((0, 0, 1, 0))
+TEMPERATURE = pack((0, 0, 0, 1))
+
+
+class DimensionError(ValueError):
+    pass
+
+
+class Unit:
+    __slots__ = ("name", "scale", "dims")
+
+    def __init__(self, name, scale, dims):
+        self.name = name
+        self.scale = scale      # size of one unit in SI
+        self.dims = dims
+
+    def __repr__(self):
+        return "Unit({!r}, {!r}, {})".format(self.name, self.scale, unpack(self.dims))
+
+
+def format_dims(dims):
+    named = _SI_NAMES.get(dims)
+    if named:
+        return named
+    num, den = [], []
+    for base, e in zip(_BASES, unpack(dims)):
+        if e:
+            part = base if abs(e) == 1 else "{}^{}".format(base, abs(e))
+            (num if e > 0 else den).append(part)
+    text = "·".join(num) or "1"
+    if den:
+        text += "/" + "·".join(den)
+    return text
+
+
+class Quantity:
+    __slots__ = ("value", "dims", "unit")
+
+    def __init__(self, value, dims, unit=None):
+        self.value = value      # in SI units
+        self.dims = dims
+        self.unit = unit        # preferred display unit (same dims) or None
+
+    def _mismatch(self, other, op):
+        theirs = format_dims(other.dims) if isinstance(other, Quantity) else "a plain number"
+        return DimensionError("cannot {} {} and {}".format(op, format_dims(self.dims), theirs))
+
+    def __add__(self, other):
+        if not isinstance(other, Quantity) or other.dims != self.dims:
+            raise self._mismatch(other, "add")
+        return Quantity(self.value + other.value, self.dims, self.unit or other.unit)
+
+    def __radd__(self, other):
+        raise self._mismatch(other, "add")
+
+    def __sub__(self, other):
+        if not isinstance(other, Quantity) or other.dims != self.dims:
+            raise self._mismatch(other, "subtract")
+        return Quantity(self.value - other.value, self.dims, self.unit or other.unit)
+
+    def __rsub__(self, other):
+        raise self._mismatch(other, "subtract")
+
+    def __mul__(self, other):
+        if isinstance(other, Quantity):
+            a, b = self.dims, other.dims
+            dims = a + b if not ((a + _BIAS) | (b + _BIAS)) & _HIGH else _add_dims(a, b)
+            v = self.value * other.value
+            return Quantity(v, dims) if dims else v
+        return Quantity(self.value * other, self.dims, self.unit)
+
+    def __rmul__(self, other):
+        return Quantity(other * self.value, self.dims, self.unit)
+
+    def __truediv__(self, other):
+        if isinstance(other, Quantity):
+            a, b = self.dims, other.dims
+            dims = a - b if not ((a + _BIAS) | (b + _BIAS)) & _HIGH else _sub_dims(a, b)
+            v = self.value / other.value
+            return Quantity(v, dims) if dims else v
+        return Quantity(self.value / other, self.dims, self.unit)
+
+    def __rtruediv__(self, other):
+        return Quantity(other / self.value, _sub_dims(0, self.dims))
+
+    def __pow__(self, n):
+        if isinstance(n, Quantity):
+            raise DimensionError("exponent must be dimensionless")
+        if isinstance(n, int):
+            d = self.dims
+            dims = d * n if -1 <= n <= 2 and not (d + _BIAS) & _HIGH else _mul_dims(d, n)
+        else:
+            exps = [e * n for e in unpack(self.dims)]
+            if any(e != int(e) for e in exps):
+                raise DimensionError("cannot raise {} to {}".format(format_dims(self.dims), n))
+            dims = _checked(int(e) for e in exps)
+        v = self.value ** n
+        return Quantity(v, dims) if dims else v
+
+    def __rpow__(self, base):
+        raise DimensionError("exponent must be dimensionless, got {}".format(format_dims(self.dims)))
+
+    def __neg__(self):
+        return Quantity(-self.value, self.dims, self.unit)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Quantity(abs(self.value), self.dims, self.unit)
+
+    def __float__(self):
+        raise DimensionError("{} is not dimensionless".format(format_dims(self.dims)))
+
+    def __eq__(self, other):
+        return isinstance(other, Quantity) and other.dims == self.dims and other.value == self.value
+
+    __hash__ = None
+
+    def to(self, unit):
+        if unit.dims != self.dims:
+            raise DimensionError("cannot convert {} to {}".format(format_dims(self.dims), unit.name))
+        return Quantity(self.value, self.dims, unit)
+
+    def magnitude(self):
+        # value in the display unit (SI when there is none)
+        return self.value / self.unit.scale if self.unit else self.value
+
+    def label(self):
+        return self.unit.name if self.unit else format_dims(self.dims)
+
+    def __str__(self):
+        return "{:.12g} {}".format(self.magnitude(), self.label())
+
+    def __repr__(self):
+        return "Quantity({!r}, {!r})".format(self.magnitude(), self.label())
+
+# ------------------------------
+# Unit registry
+# ------------------------------
+# (dims, SI scale of the category's base unit) for every linear converter category
+_CATEGORY_DIMS = {
+    "Length": (LENGTH, 1.0),
+    "Mass": (MASS, 1.0),
+    "Volume": (3 * LENGTH, 1e-3),                   # base unit is the litre
+    "Speed": (LENGTH - TIME, 1.0),
+    "Area": (2 * LENGTH, 1.0),
+    "Power": (MASS + 2 * LENGTH - 3 * TIME, 1.0),
+}
+
+_SI_NAMES = {
+    LENGTH: "m", MASS: "kg", TIME: "s", TEMPERATURE: "K",
+    _CATEGORY_DIMS["Power"][0]: "W",
+}
+
+UNITS = {}
+
+
+def _register(name, scale, dims):
+    UNITS[name] = Unit(name, scale, dims)
+
+
+def _build_registry():
+    for cat, factors in LINEAR_UNITS.items():
+        dims, base_scale = _CATEGORY_DIMS[cat]
+        for name, factor in factors.items():
+            # "m/s", "m²" etc. are spelled as expressions instead
+            if name.isidentifier():
+                _register(name, factor * base_scale, dims)
+    # time is not a converter category but rates need it
+    for name, scale in (("s", 1.0), ("min", 60.0), ("h", 3600.0), ("day", 86400.0)):
+        _register(name, scale, TIME)
+    # only absolute temperature composes with other units
+    _register("K", 1.0, TEMPERATURE)
+
+
+_build_registry()
+
+# one shared Quantity per unit name, reused by every namespace
+_UNIT_VALUES = {name: Quantity(u.scale, u.dims, u) for name, u in UNITS.items()}
+
+
+def _unit_of(q):
+    if isinstance(q, Quantity) and q.unit is not None and q.value == q.unit.scale:
+        return q.unit
+    raise DimensionError("second argument of to() must be a unit name")
+
+
+def unit_namespace(env):
+    # entries added to EvalEnv.namespace() when env.units is on
+    def sqrt(x):
+        return x ** 0.5 if isinstance(x, Quantity) else env.sqrt(x)
+
+    def cbrt(x):
+        if isinstance(x, Quantity):
+            return math.copysign(1.0, x.value) * abs(x) ** (1.0/3.0)
+        return env.cbrt(x)
+
+    def to(q, unit):
+        if not isinstance(q, Quantity):
+            raise DimensionError("cannot convert a plain number to a unit")
+        return q.to(_unit_of(unit))
+
+    ns = dict(_UNIT_VALUES)
+    ns['sqrt'] = sqrt
+    ns['cbrt'] = cbrt
+    ns['to'] = to
+    return ns
@@ -0,0 +1,231 @@
+# ------------------------------
+# Function tabulation and adaptive sampling
+# ------------------------------
+# Headless helpers behind the Plot tab. An expression in x is turned into a
+# batch function (NumPy through evaluate_many when available, otherwise a
+# compiled scalar loop) that maps a list of x values to floats, with nan
+# wherever the expression fails. On top of that:
+#   adaptive_samples  refines only the intervals where the curve bends or
+#                     jumps, yielding each level's new points as one batch
+#   tabulate          uniform grid in fixed-size chunks (CSV export, tables)
+#   ColumnAggregate   per-pixel-column min/max so drawing cost depends on the
+#                     canvas width, not on the number of samples
+import csv
+import math
+
+from calc_core import EvalEnv, compile_expr, _EVAL_GLOBALS
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the scalar path is used instead
+    np = None
+
+_NAN = float("nan")
+
+
+def _to_float(v):
+    try:
+        f = float(v)
+    except (TypeError, ValueError, OverflowError):
+        return _NAN
+    return f
+
+
+def make_batch_function(expr, env=None, var="x", bound=None):
+    # snapshot the modes so a later Deg/Rad toggle cannot change a running batch;
+    # bound: fixed values for other free names (worksheet cells, parameters)
+    bound = dict(bound or {})
+    snap = EvalEnv()
+    if env is not None:
+        snap.deg_mode = env.deg_mode
+        snap.units = env.units
+        snap.precision = env.precision
+    compiled = compile_expr(expr)
+    code = compiled.code
+    plain_bound = all(type(v) in (int, float) for v in bound.values())
+    if snap.units and plain_bound:
+        from calc_quantity import UNITS
+        free = compiled.names - set(bound) - {var}
+        if free.isdisjoint(UNITS) and 'to' not in free:
+            # no unit in the expression: the values are plain numbers either
+            # way, so the NumPy path below applies
+            snap.units = False
+    if not snap.precision:
+        # evaluated at every point: fold constants, share repeated calls
+        from calc_optimize import optimize_code
+        code = optimize_code(compiled, snap, set(bound) | {var}, real_vars=plain_bound)
+
+    def scalar_batch(xs):
+        ns = dict(snap.namespace())
+        ns.update(bound)
+        out = []
+        for x in xs:
+            ns[var] = x
+            try:
+                out.append(_to_float(eval(code, _EVAL_GLOBALS, ns)))
+            except Exception:
+                out.append(_NAN)
+        return out
+
+    if np is None or snap.units or snap.precision or not plain_bound:
+        return scalar_batch
+
+    from calc_vector import evaluate_many
+
+    def vector_batch(xs):
+        try:
+            ys = evaluate_many(expr, snap, **{**bound, var: np.asarray(xs, dtype=np.float64)})
+            return np.asarray(ys, dtype=np.float64).tolist()
+        except Exception:
+            # e.g. fact() of a negative somewhere in the batch: go point by point
+            return scalar_batch(xs)
+    return vector_batch
+
+
+def adaptive_samples(f, a, b, initial=129, tol=1e-3, max_depth=14, max_points=200_000):
+    """Yield (xs, ys) batches: a coarse grid, then one batch per refinement level.
+
+    An interval is split when its midpoint is more than ``tol`` (relative to
+    the y range seen so far) away from the chord, or when only some of its
+    points are finite (poles, domain edges).
+    """
+    if b <= a:
+        raise ValueError("empty range")
+    n = max(2, initial)
+    xs = [a + (b - a) * i / (n - 1) for i in range(n)]
+    ys = f(xs)
+    yield xs, ys
+    total = n
+    finite = [y for y in ys if math.isfinite(y)]
+    lo = min(finite) if finite else 0.0
+    hi = max(finite) if finite else 0.0
+    intervals = list(zip(xs, ys, xs[1:], ys[1:]))
+    for _ in range(max_depth):
+        if not intervals or total >= max_points:
+            break
+        intervals = intervals[:max_points - total]
+        mids = [(x0 + x1) / 2 for x0, _, x1, _ in intervals]
+        ym = f(mids)
+        yield mids, ym
+        total += len(mids)
+        for y in ym:
+            if math.isfinite(y):
+                if y < lo:
+                    lo = y
+                elif y > hi:
+                    hi = y
+        scale = (hi - lo) or 1.0
+        refine = []
+        for (x0, y0, x1, y1), xm, y in zip(intervals, mids, ym):
+            f0, f1, fm = math.isfinite(y0), math.isfinite(y1), math.isfinite(y)
+            if f0 and f1 and fm:
+                if abs(y - (y0 + y1) / 2) <= tol * scale:
+                    continue
+            elif not (f0 or f1 or fm):
+                continue
+            refine.append((x0, y0, xm, y))
+            refine.append((xm, y, x1, y1))
+        intervals = refine
+
+
+def tabulate(f, a, b, n, chunk=65536):
+    """Yield (xs, ys) chunks of the uniform grid x_i = a + i*(b-a)/(n-1)."""
+    step = (b - a) / (n - 1) if n > 1 else 0.0
+    for start in range(0, n, chunk):
+        xs = [a + step * i for i in range(start, min(n, start + chunk))]
+        yield xs, f(xs)
+
+
+def table_rows(f, a, b, n, offset, limit):
+    # rows [offset, offset+limit) of the uniform table, computed on demand
+    step = (b - a) / (n - 1) if n > 1 else 0.0
+    xs = [a + step * i for i in range(offset, min(n, offset + limit))]
+    return list(zip(xs, f(xs))) if xs else []
+
+
+def write_csv(dst, f, a, b, n, header=("x", "f(x)"), chunk=65536, progress=None, cancelled=None):
+    """Stream the uniform table to CSV chunk by chunk; returns rows written."""
+    close = False
+    if not hasattr(dst, "write"):
+        dst = open(dst, "w", newline="", encoding="utf-8")
+        close = True
+    try:
+        writer = csv.writer(dst, lineterminator="\n")
+        writer.writerow(header)
+        done = 0
+        for xs, ys in tabulate(f, a, b, n, chunk):
+            if cancelled is not None and cancelled():
+                break
+            writer.writerows((repr(x), "" if y != y else repr(y)) for x, y in zip(xs, ys))
+            done += len(xs)
+            if progress is not None:
+                progress(done, n)
+        return done
+    finally:
+        if close:
+            dst.close()
+
+
+class ColumnAggregate:
+    """Running min/max of samples per pixel column over [a, b]."""
+
+    def __init__(self, a, b, width):
+        self.a = a
+        self.b = b
+        self.width = width
+        self.lo = [None] * width
+        self.hi = [None] * width
+        self.points = 0
+
+    def add(self, xs, ys):
+        a, w = self.a, self.width
+        k = (w - 1) / (self.b - a)
+        lo, hi = self.lo, self.hi
+        for x, y in zip(xs, ys):
+            if y != y or y in (math.inf, -math.inf):
+                continue
+            c = int((x - a) * k + 0.5)
+            if 0 <= c < w:
+                if lo[c] is None:
+                    lo[c] = hi[c] = y
+                elif y < lo[c]:
+                    lo[c] = y
+                elif y > hi[c]:
+                    hi[c] = y
+        self.points += len(xs)
+
+    def y_range(self, clip=0.02):
+        # robust range: ignore the most extreme column values (poles)
+        vals = sorted((l + h) / 2 for l, h in zip(self.lo, self.hi) if l is not None)
+        if not vals:
+            return -1.0, 1.0
+        k = int(len(vals) * clip)
+        lo, hi = vals[k], vals[-1 - k]
+        if hi == lo:
+            return lo - 1.0, hi + 1.0
+        pad = (hi - lo) * 0.1
+        return lo - pad, hi + pad
+
+    def segments(self, y_to_px, jump):
+        """Polylines of (column, pixel) points, broken at gaps and jumps."""
+        out = []
+        cur = []
+        prev = None
+        for c in range(self.width):
+            l = self.lo[c]
+            if l is None:
+                if len(cur) > 1:
+                    out.append(cur)
+                cur, prev = [], None
+                continue
+            p0, p1 = y_to_px(l), y_to_px(self.hi[c])
+            if prev is not None and min(abs(p0 - prev), abs(p1 - prev)) > jump:
+                # discontinuity (e.g. a pole of tan): do not connect
+                if len(cur) > 1:
+                    out.append(cur)
+                cur = []
+            cur.extend((c, p0, c, p1))
+            prev = p1
+        if len(cur) > 1:
+            out.append(cur)
+        return out
@@ -0,0 +1,503 @@
+# ------------------------------
+# Local JSON-RPC evaluation service
+# ------------------------------
+# A long-running asyncio server so other tools can use the calculator
+# without paying the interpreter start-up per call. Messages are JSON-RPC
+# 2.0, one JSON document per line, over TCP or a Unix socket:
+#
+#   python calc_server.py serve --port 8765
+#   python calc_server.py serve --unix /tmp/calc.sock
+#   echo '{"jsonrpc":"2.0","id":1,"method":"eval","params":["sin(30)+2^3"]}' | nc localhost 8765
+#
+# Methods:
+#   eval     [expr] or {"expr", "deg": true, "units": false, "precision": null,
+#            "complex": false}
+#   convert  [category, value, from, to] or {"category", "value", "from", "to"}
+#   stats    per-method counts, errors, throughput and latency percentiles
+#   metrics  calc_metrics snapshot ({"format": "prometheus"} for text), when
+#            started with --metrics
+#   ping
+# A JSON array is a batch. Expressions whose static cost bound is small
+# are evaluated right away on warm EvalEnvs and the shared compile cache;
+# the rest (big integers, factorials, calculus, complex mode, more than
+# INLINE_PRECISION digits) go to a process pool as one task per batch,
+# under calc_guard limits.
+#
+#   python calc_server.py load --spawn -c 32 -n 20000
+# runs the bundled client against a server and reports p50/p99 latency.
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from calc_core import EvalEnv, compile_expr, format_result, _CALCULUS
+from calc_guard import EvalLimitError, Limits, estimate_cost, guarded_eval
+from calc_stats import RunningStats
+from calc_units import convert
+
+# expressions statically bounded below this many bits run on the event loop
+INLINE_BITS = 4096
+# ... and at most this many digits in precision mode (the bound only counts
+# bits, while a series at 10000 digits runs for seconds)
+INLINE_PRECISION = 50
+MAX_LINE = 1 << 24          # bytes per request line (batches included)
+POOL_CHUNK = 256            # expressions per pool task
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+EVAL_ERROR = -32000
+LIMIT_ERROR = -32001
+
+
+class RPCError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+# ------------------------------
+# Evaluation (shared by the event loop and the pool workers)
+# ------------------------------
+_envs = {}
+_limits = None
+
+
+def _env(deg, units, precision, complex_mode):
+    key = (deg, units, precision, complex_mode)
+    env = _envs.get(key)
+    if env is None:
+        env = _envs[key] = EvalEnv()
+        env.deg_mode, env.units, env.precision, env.complex = key
+    return env
+
+
+def _init_worker(limits):
+    global _limits
+    _limits = limits
+
+
+def _to_json(val):
+    text = format_result(val)
+    if type(val).__name__ == "Decimal":
+        value = float(val) if val.is_finite() else None
+    elif isinstance(val, bool) or not isinstance(val, (int, float)):
+        value = None
+    elif isinstance(val, float):
+        value = val if math.isfinite(val) else None
+    else:
+        value = val if -2**63 <= val < 2**63 else None
+    return {"value": value, "text": text}
+
+
+def _eval_one(expr, deg, units, precision, complex_mode, limits):
+    # (ok, result) with result either the JSON result or (error code, message, type)
+    try:
+        env = _env(deg, units, precision, complex_mode)
+        return True, _to_json(guarded_eval(expr, env, limits))
+    except EvalLimitError as e:
+        return False, (LIMIT_ERROR, str(e), type(e).__name__)
+    except Exception as e:
+        return False, (EVAL_ERROR, str(e), type(e).__name__)
+
+
+def _eval_jobs(jobs):
+    return [_eval_one(*job, _limits) for job in jobs]
+
+# ------------------------------
+# Counters
+# ------------------------------
+class MethodCounters:
+    def __init__(self):
+        self.started = time.monotonic()
+        self._methods = {}      # method -> [RunningStats of latency in ms, errors]
+
+    def record(self, method, seconds, ok):
+        entry = self._methods.get(method)
+        if entry is None:
+            entry = self._methods[method] = [RunningStats(), 0]
+        entry[0].add(seconds * 1000.0)
+        if not ok:
+            entry[1] += 1
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        out = {"uptime_s": uptime, "methods": {}}
+        for method, (lat, errors) in self._methods.items():
+            out["methods"][method] = {
+                "count": lat.count,
+                "errors": errors,
+                "per_s": lat.count / uptime if uptime else 0.0,
+                "mean_ms": lat.mean,
+                "p50_ms": lat.quantile(0.5),
+                "p99_ms": lat.quantile(0.99),
+                "max_ms": lat.max,
+            }
+        return out
+
+# ------------------------------
+# Server
+# ------------------------------
+def _error(req_id, code, message, data=None):
+    err = {"code": code, "message": message}
+    if data is not None:
+        err["data"] = data
+    return {"jsonrpc": "2.0", "id": req_id, "error": err}
+
+
+def _eval_params(params):
+    if isinstance(params, list) and params:
+        expr, deg = params[0], params[1] if len(params) > 1 else True
+        units, precision, complex_mode = False, None, False
+    elif isinstance(params, dict) and "expr" in params:
+        expr = params["expr"]
+        deg = params.get("deg", True)
+        units = params.get("units", False)
+        precision = params.get("precision")
+        complex_mode = params.get("complex", False)
+    else:
+        raise RPCError(INVALID_PARAMS, "eval expects [expr] or {\"expr\": ...}")
+    if not isinstance(expr, str) or not all(isinstance(f, bool) for f in (deg, units, complex_mode)):
+        raise RPCError(INVALID_PARAMS, "expr must be a string, deg/units/complex booleans")
+    if precision is not None and not (isinstance(precision, int) and 1 <= precision <= 10000):
+        raise RPCError(INVALID_PARAMS, "precision must be an integer from 1 to 10000")
+    return expr, deg, units, precision, complex_mode
+
+
+class CalcServer:
+    def __init__(self, jobs=None, limits=None, inline_bits=INLINE_BITS):
+        self.limits = limits or Limits()
+        self.inline_bits = inline_bits
+        self.counters = MethodCounters()
+        self._jobs = jobs or os.cpu_count() or 1
+        self._pool = None
+        self._servers = []
+        self._clients = set()   # connection handler tasks
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._jobs, initializer=_init_worker,
+                                             initargs=(self.limits,))
+        return self._pool
+
+    def _is_cheap(self, job):
+        expr, _, _, precision, complex_mode = job
+        if complex_mode or (precision is not None and precision > INLINE_PRECISION):
+            return False
+        try:
+            compiled = compile_expr(expr)
+            if not compiled.names.isdisjoint(_CALCULUS):
+                return False
+            cost = estimate_cost(expr, self.limits)
+        except Exception:
+            return True     # fails fast with a proper error inline
+        return cost is not None and cost <= self.inline_bits
+
+    # ------------------------------
+    # Requests
+    # ------------------------------
+    async def handle(self, msg):
+        """Response for a decoded request or batch (None when nothing is owed)."""
+        if isinstance(msg, list):
+            if not msg:
+                return _error(None, INVALID_REQUEST, "empty batch")
+            responses = await self._batch(msg)
+            responses = [r for r in responses if r is not None]
+            return responses or None
+        return (await self._batch([msg]))[0]
+
+    async def _batch(self, requests):
+        loop = asyncio.get_running_loop()
+        out = [None] * len(requests)
+        heavy = []      # (index, request id, notify, started, job)
+        for i, req in enumerate(requests):
+            t0 = time.perf_counter()
+            if not (isinstance(req, dict) and req.get("jsonrpc") == "2.0"
+                    and isinstance(req.get("method"), str)):
+                out[i] = _error(None, INVALID_REQUEST, "invalid request")
+                continue
+            method = req["method"]
+            req_id = req.get("id")
+            notify = "id" not in req
+            try:
+                if method == "eval":
+                    job = _eval_params(req.get("params"))
+                    if not self._is_cheap(job):
+                        heavy.append((i, req_id, notify, t0, job))
+                        continue
+                    ok, res = _eval_one(*job, self.limits)
+                elif method == "convert":
+                    ok, res = True, self._convert(req.get("params"))
+                elif method == "stats":
+                    ok, res = True, self.counters.snapshot()
+                elif method == "metrics":
+                    ok, res = True, self._metrics(req.get("params"))
+                elif method == "ping":
+                    ok, res = True, "pong"
+                else:
+                    raise RPCError(METHOD_NOT_FOUND, "method not found: {}".format(method))
+            except RPCError as e:
+                ok, res = False, (e.code, str(e), None)
+            except Exception as e:
+                ok, res = False, (EVAL_ERROR, str(e), type(e).__name__)
+            self.counters.record(method, time.perf_counter() - t0, ok)
+            if not notify:
+                out[i] = self._response(req_id, ok, res)
+
+        if heavy:
+            pool = self._executor()
+            parts = [heavy[k:k + POOL_CHUNK] for k in range(0, len(heavy), POOL_CHUNK)]
+            done = await asyncio.gather(*(loop.run_in_executor(pool, _eval_jobs, [h[4] for h in part])
+                                          for part in parts))
+            for part, results in zip(parts, done):
+                for (i, req_id, notify, t0, _), (ok, res) in zip(part, results):
+                    self.counters.record("eval", time.perf_counter() - t0, ok)
+                    if not notify:
+                        out[i] = self._response(req_id, ok, res)
+        return out
+
+    @staticmethod
+    def _response(req_id, ok, res):
+        if ok:
+            return {"jsonrpc": "2.0", "id": req_id, "result": res}
+        code, message, kind = res
+        return _error(req_id, code, message, {"type": kind} if kind else None)
+
+    @staticmethod
+    def _metrics(params):
+        import calc_metrics
+        metrics = calc_metrics.current()
+        if metrics is None:
+            raise RPCError(EVAL_ERROR, "instrumentation is off (start the server with --metrics)")
+        if isinstance(params, dict) and params.get("format") == "prometheus":
+            return calc_metrics.to_prometheus(metrics)
+        return metrics.snapshot()
+
+    @staticmethod
+    def _convert(params):
+        if isinstance(params, dict):
+            try:
+                params = [params["category"], params["value"], params["from"], params["to"]]
+            except KeyError as e:
+                raise RPCError(INVALID_PARAMS, "convert is missing {}".format(e))
+        if not (isinstance(params, list) and len(params) == 4):
+            raise RPCError(INVALID_PARAMS, "convert expects [category, value, from, to]")
+        category, value, from_u, to_u = params
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise RPCError(INVALID_PARAMS, "value must be a number")
+        try:
+            return _to_json(convert(value, category, from_u, to_u))
+        except KeyError as e:
+            raise RPCError(INVALID_PARAMS, "unknown category or unit: {}".format(e))
+
+    # ------------------------------
+    # Transport
+    # ------------------------------
+    async def _serve_client(self, reader, writer):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(self._encode(_error(None, INVALID_REQUEST, "request too large")))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    resp = _error(None, PARSE_ERROR, "parse error")
+                else:
+                    resp = await self.handle(msg)
+                if resp is not None:
+                    writer.write(self._encode(resp))
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # cancelled by close(); end quietly instead of propagating out of the handler
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    @staticmethod
+    def _encode(resp):
+        return json.dumps(resp, separators=(",", ":"), allow_nan=False).encode() + b"\n"
+
+    async def start(self, host="127.0.0.1", port=8765, unix=None):
+        if unix is not None:
+            server = await asyncio.start_unix_server(self._serve_client, path=unix, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self._serve_client, host, port, limit=MAX_LINE)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        clients = list(self._clients)
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+# ------------------------------
+# Client + load test
+# ------------------------------
+class AsyncClient:
+    """Minimal client: one connection, one request in flight."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, unix=None):
+        if unix is not None:
+            reader, writer = await asyncio.open_unix_connection(unix, limit=MAX_LINE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+        return cls(reader, writer)
+
+    async def send(self, payload):
+        self._writer.write(json.dumps(payload).encode() + b"\n")
+        await self._writer.drain()
+        return json.loads(await self._reader.readline())
+
+    async def call(self, method, params=None):
+        self._next_id += 1
+        resp = await self.send({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+        if "error" in resp:
+            raise RPCError(resp["error"]["code"], resp["error"]["message"], resp["error"].get("data"))
+        return resp["result"]
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return math.nan
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+async def load_test(requests=10000, concurrency=16, batch=1, method="eval", params=None,
+                    host="127.0.0.1", port=8765, unix=None):
+    """Send ``requests`` calls over ``concurrency`` connections; returns a report dict."""
+    params = params if params is not None else ["sin(30) + 2^3"]
+    per_call = {"jsonrpc": "2.0", "method": method, "params": params}
+    calls = -(-requests // batch)
+    remaining = [calls]
+    latencies = []
+    errors = [0]
+
+    async def worker():
+        client = await AsyncClient.connect(host, port, unix)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                payload = [dict(per_call, id=k) for k in range(batch)] if batch > 1 else dict(per_call, id=0)
+                t0 = time.perf_counter()
+                resp = await client.send(payload)
+                latencies.append(time.perf_counter() - t0)
+                for r in resp if isinstance(resp, list) else [resp]:
+                    if "error" in r:
+                        errors[0] += 1
+        finally:
+            await client.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": calls * batch,
+        "calls": calls,
+        "errors": errors[0],
+        "seconds": elapsed,
+        "per_s": calls * batch / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1000.0,
+        "p99_ms": _percentile(latencies, 0.99) * 1000.0,
+        "max_ms": latencies[-1] * 1000.0 if latencies else math.nan,
+    }
+
+
+async def _serve_forever(args):
+    if args.metrics:
+        # covers what runs on the event loop; pool workers are not instrumented
+        import calc_metrics
+        calc_metrics.enable()
+    server = CalcServer(jobs=args.jobs, limits=Limits(timeout=args.timeout))
+    srv = await server.start(args.host, args.port, args.unix)
+    where = args.unix or "{}:{}".format(args.host, args.port)
+    print("calc_server listening on {}".format(where), file=sys.stderr)
+    try:
+        await srv.serve_forever()
+    finally:
+        await server.close()
+
+
+async def _run_load(args):
+    server = None
+    if args.spawn:
+        server = CalcServer(jobs=args.jobs)
+        await server.start(args.host, args.port, args.unix)
+    try:
+        params = json.loads(args.params) if args.params else [args.expr]
+        report = await load_test(args.requests, args.concurrency, args.batch, args.method, params,
+                                 args.host, args.port, args.unix)
+    finally:
+        if server is not None:
+            await server.close()
+    print("{requests} requests ({calls} calls) in {seconds:.2f}s: {per_s:.0f}/s, "
+          "p50 {p50_ms:.3f} ms, p99 {p99_ms:.3f} ms, max {max_ms:.3f} ms, {errors} errors".format(**report))
+    return 1 if report["errors"] else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Calculator JSON-RPC server and load-test client.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    for name in ("serve", "load"):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=8765)
+        p.add_argument("--unix", default=None, metavar="PATH", help="use a Unix socket instead of TCP")
+        p.add_argument("-j", "--jobs", type=int, default=None, help="worker processes for heavy expressions")
+    serve = sub.choices["serve"]
+    serve.add_argument("--timeout", type=float, default=5.0, help="wall-clock limit per expression in seconds")
+    serve.add_argument("--metrics", action="store_true", help="enable calc_metrics and the 'metrics' method")
+    load = sub.choices["load"]
+    load.add_argument("-n", "--requests", type=int, default=10000)
+    load.add_argument("-c", "--concurrency", type=int, default=16, help="parallel connections")
+    load.add_argument("--batch", type=int, default=1, help="requests per JSON-RPC batch")
+    load.add_argument("--method", default="eval")
+    load.add_argument("--expr", default="sin(30) + 2^3")
+    load.add_argument("--params", default=None, help="JSON params (overrides --expr)")
+    load.add_argument("--spawn", action="store_true", help="start a server in this process first")
+    args = ap.parse_args(argv)
+    try:
+        if args.command == "serve":
+            asyncio.run(_serve_forever(args))
+            return 0
+        return asyncio.run(_run_load(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+# ------------------------------
+# Streaming statistics
+# ------------------------------
+# One pass, constant memory. RunningStats keeps
+#   count, mean and variance   Welford's update (Chan et al. to merge)
+#   sum                        Neumaier-compensated
+#   min / max
+#   quantiles                  QuantileSketch: log-spaced buckets with a
+#                              fixed relative error (DDSketch), mergeable
+# Partial results merge exactly (quantiles within the sketch error), so a
+# big file is split into byte ranges that worker processes reduce on their
+# own:
+#
+#   python calc_stats.py data.csv --column 2 --jobs 4
+#   python calc_stats.py samples.f64 --dtype <f8
+#
+# Text files are read line by line (comma or whitespace separated, fields
+# that are not numbers such as a header are skipped); binary files are
+# memory-mapped and read in chunks. NumPy is only needed for binary input
+# and is used for block updates when available.
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; values are then added one by one
+    np = None
+
+BLOCK = 65536   # values per block update / binary read
+
+# raw binary arrays recognised by extension
+BINARY_DTYPES = {".f64": "<f8", ".f32": "<f4", ".bin": "<f8"}
+
+
+class QuantileSketch:
+    """Quantiles within ``relative_accuracy`` of the true value."""
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}      # bucket index -> count, value ~ gamma**index
+        self.negative = {}      # same for -value
+        self.zero = 0
+        self.count = 0
+
+    def _key(self, x):
+        return math.ceil(math.log(x) / self._log_gamma)
+
+    def _value(self, key):
+        return 2.0 * self.gamma ** key / (self.gamma + 1.0)
+
+    def add(self, x):
+        if x > 0.0:
+            k = self._key(x)
+            self.positive[k] = self.positive.get(k, 0) + 1
+        elif x < 0.0:
+            k = self._key(-x)
+            self.negative[k] = self.negative.get(k, 0) + 1
+        else:
+            self.zero += 1
+        self.count += 1
+        if len(self.positive) + len(self.negative) > self.max_buckets:
+            self._collapse()
+
+    def add_array(self, a):
+        # a: finite float64 numpy array
+        with np.errstate(divide="ignore"):
+            for store, part in ((self.positive, a[a > 0.0]), (self.negative, -a[a < 0.0])):
+                if part.size:
+                    keys, counts = np.unique(np.ceil(np.log(part) / self._log_gamma), return_counts=True)
+                    for k, c in zip(keys.astype(np.int64).tolist(), counts.tolist()):
+                        store[k] = store.get(k, 0) + c
+        self.zero += int(np.count_nonzero(a == 0.0))
+        self.count += a.size
+        if len(self.positive) + len(self.negative) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        # fold the smallest magnitudes together; the upper quantiles keep their accuracy
+        for store in (self.positive, self.negative):
+            limit = self.max_buckets // 2
+            if len(store) > limit:
+                keys = sorted(store)
+                spill = keys[:len(keys) - limit + 1]
+                total = sum(store.pop(k) for k in spill)
+                store[spill[-1]] = total
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for k, c in theirs.items():
+                mine[k] = mine.get(k, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+        if len(self.positive) + len(self.negative) > self.max_buckets:
+            self._collapse()
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        if not 0.0 <= q <= 1.0:
+            raise ValueError("quantile must be between 0 and 1")
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return -self._value(k)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return self._value(k)
+        return self._value(max(self.positive))
+
+
+class RunningStats:
+    def __init__(self, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0          # sum of squared deviations from the mean
+        self._sum = 0.0
+        self._comp = 0.0        # Neumaier compensation term
+        self.min = math.inf
+        self.max = -math.inf
+        self.skipped = 0        # nan / inf values left out
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def _add_to_sum(self, x):
+        s = self._sum
+        t = s + x
+        if abs(s) >= abs(x):
+            self._comp += (s - t) + x
+        else:
+            self._comp += (x - t) + s
+        self._sum = t
+
+    def add(self, x):
+        x = float(x)
+        if not math.isfinite(x):
+            self.skipped += 1
+            return
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self._add_to_sum(x)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.sketch.add(x)
+
+    def _combine(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def _add_block(self, a):
+        finite = np.isfinite(a)
+        if not finite.all():
+            self.skipped += int(a.size - np.count_nonzero(finite))
+            a = a[finite]
+        if not a.size:
+            return
+        mean = float(a.mean())
+        self._combine(a.size, mean, float(np.square(a - mean).sum()))
+        # exact block sum (fsum), compensated across blocks
+        self._add_to_sum(math.fsum(a.tolist()))
+        self.min = min(self.min, float(a.min()))
+        self.max = max(self.max, float(a.max()))
+        self.sketch.add_array(a)
+
+    def extend(self, values):
+        """Add an iterable (or a NumPy array) of numbers."""
+        if np is not None and isinstance(values, np.ndarray):
+            flat = values.reshape(-1)
+            for start in range(0, flat.size, BLOCK):
+                self._add_block(np.asarray(flat[start:start + BLOCK], dtype=np.float64))
+            return self
+        if np is None:
+            for x in values:
+                self.add(x)
+            return self
+        block = []
+        for x in values:
+            block.append(x)
+            if len(block) >= BLOCK:
+                self._add_block(np.array(block, dtype=np.float64))
+                block = []
+        if block:
+            self._add_block(np.array(block, dtype=np.float64))
+        return self
+
+    def merge(self, other):
+        """Fold another partial result into this one (as if its values were added here)."""
+        if other.count:
+            self._combine(other.count, other.mean, other._m2)
+            self._add_to_sum(other._sum)
+            self._add_to_sum(other._comp)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.skipped += other.skipped
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def sum(self):
+        return self._sum + self._comp
+
+    @property
+    def variance(self):
+        # sample variance (n - 1)
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance) if self.count > 1 else math.nan
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        empty = not self.count
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": math.nan if empty else self.mean,
+            "stddev": self.stddev,
+            "variance": self.variance,
+            "min": math.nan if empty else self.min,
+            "max": math.nan if empty else self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+def format_summary(stats):
+    s = stats.summary()
+    if not s["count"]:
+        return "no numeric values"
+    return "n={count} mean={mean:.12g} sd={stddev:.6g} min={min:.12g} max={max:.12g} median≈{p50:.6g}".format(**s)
+
+# ------------------------------
+# Sources
+# ------------------------------
+def stats_of(values):
+    return RunningStats().extend(values)
+
+
+def guess_dtype(path):
+    return BINARY_DTYPES.get(os.path.splitext(path)[1].lower())
+
+
+def _fields(line, delimiter):
+    if delimiter is not None:
+        return line.split(delimiter)
+    return line.split(b",") if b"," in line else line.split()
+
+
+def read_numbers(path, column=0, delimiter=None, start=0, end=None):
+    """Yield the numbers in ``column`` of the lines starting in [start, end)."""
+    if isinstance(delimiter, str):
+        delimiter = delimiter.encode()
+    with open(path, "rb") as f:
+        pos = start
+        if start > 0:
+            # finish the line that straddles `start`; it belongs to the previous range
+            f.seek(start - 1)
+            pos += len(f.readline()) - 1
+        for line in f:
+            if end is not None and pos >= end:
+                break
+            pos += len(line)
+            fields = _fields(line, delimiter)
+            if column < len(fields):
+                try:
+                    yield float(fields[column])
+                except ValueError:
+                    pass    # header or a non-numeric cell
+
+
+def reduce_text(path, column=0, delimiter=None, start=0, end=None):
+    return stats_of(read_numbers(path, column, delimiter, start, end))
+
+
+def reduce_binary(path, dtype="<f8", start=0, end=None):
+    # start/end are element indices into the memory-mapped array
+    if np is None:
+        raise ImportError("binary input requires numpy (pip install numpy)")
+    data = np.memmap(path, dtype=np.dtype(dtype), mode="r")
+    return RunningStats().extend(data[start:end])
+
+
+def _ranges(size, parts):
+    step = -(-size // parts)
+    return [(lo, min(size, lo + step)) for lo in range(0, size, step)] or [(0, 0)]
+
+
+def stats_file(path, column=0, delimiter=None, dtype=None, jobs=1):
+    """Statistics of one column of a text file, or of a binary array when ``dtype`` is given.
+
+    With jobs > 1 the file is split into ranges that worker processes reduce
+    in parallel; their partial results are merged in order.
+    """
+    if dtype is not None:
+        size = os.path.getsize(path) // np.dtype(dtype).itemsize if np is not None else 0
+        tasks = [(reduce_binary, (path, dtype, lo, hi)) for lo, hi in _ranges(size, max(1, jobs))]
+    else:
+        size = os.path.getsize(path)
+        tasks = [(reduce_text, (path, column, delimiter, lo, hi)) for lo, hi in _ranges(size, max(1, jobs))]
+    if jobs <= 1 or len(tasks) == 1:
+        result = RunningStats()
+        for fn, args in tasks:
+            result.merge(fn(*args))
+        return result
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(fn, *args) for fn, args in tasks]
+        result = RunningStats()
+        for fut in futures:
+            result.merge(fut.result())
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="One-pass statistics of a numeric column or binary array.")
+    ap.add_argument("file")
+    ap.add_argument("-c", "--column", type=int, default=0, help="0-based column of a text file")
+    ap.add_argument("-d", "--delimiter", default=None, help="field separator (default: comma or whitespace)")
+    ap.add_argument("--dtype", default=None,
+                    help="read a raw binary array of this NumPy dtype, e.g. <f8 (default for .f64/.f32/.bin)")
+    ap.add_argument("-j", "--jobs", type=int, default=1, help="worker processes")
+    args = ap.parse_args(argv)
+    dtype = args.dtype or guess_dtype(args.file)
+    stats = stats_file(args.file, args.column, args.delimiter, dtype, max(1, args.jobs))
+    for name, value in stats.summary().items():
+        print("{:<9} {}".format(name, value if name == "count" else "{:.12g}".format(value)))
+    if stats.skipped:
+        print("{:<9} {}".format("skipped", stats.skipped))
+    return 0 if stats.count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# ------------------------------
+# Unit converter tables (headless)
+# ------------------------------
+# Factors convert a value in the given unit to the category's base unit
+# (m, kg, L, m/s, m², W). Temperature is affine and handled separately
+# with degrees Celsius as its base.
+CATEGORIES = ["Length","Mass","Volume","Speed","Temperature","Area","Power"]
+
+LINEAR_UNITS = {
+    "Length": {
+        "km":1000.0, "m":1.0, "cm":0.01, "mm":0.001,
+        "inch":0.0254, "foot":0.3048, "yard":0.9144, "mile":1609.344
+    },
+    # t: tonne, q: quintal, ct: carat
+    "Mass": {"t":1000.0, "q":100.0, "kg":1.0, "g":0.001, "mg":0.000001, "ct":0.0002, "lb":0.45359237, "oz":0.028349523125},
+    "Volume": {"mL":0.001,"L":1.0,"cup":0.24,"pint":0.473176,"quart":0.946353,"gallon":3.78541,"m³":1000.0},
+    "Speed": {"m/s":1.0,"km/h":1/3.6,"mph":0.44704},
+    "Area": {"m²":1.0,"cm²":0.0001,"km²":1e6,"ft²":0.092903,"acre":4046.8564224,"hectare":10000.0},
+    "Power": {"W":1.0,"kW":1000.0,"hp":745.699872},
+}
+
+TEMPERATURE_UNITS = ["C","F","K"]
+
+# (scale, offset) pairs for unit -> Celsius and Celsius -> unit; the same
+# formulas as the original converter, expressed as affine coefficients
+_TEMP_TO_C = {"C": (1.0, 0.0), "F": (5.0/9.0, -32*5.0/9.0), "K": (1.0, -273.15)}
+_TEMP_FROM_C = {"C": (1.0, 0.0), "F": (9.0/5.0, 32.0), "K": (1.0, 273.15)}
+
+BASE_UNITS = {"Length": "m", "Mass": "kg", "Volume": "L", "Speed": "m/s",
+              "Temperature": "C", "Area": "m²", "Power": "W"}
+
+# ------------------------------
+# Precomputed conversion tables
+# ------------------------------
+# Every linear category gets a dense from->to factor matrix and Temperature
+# gets an affine (scale, offset) matrix, so a conversion is one table
+# lookup and one multiply(-add) for a scalar or a whole array.
+def _linear_matrix(factors):
+    units = list(factors)
+    return units, [[factors[f] / factors[t] for t in units] for f in units]
+
+
+def _affine_matrix():
+    units = TEMPERATURE_UNITS
+    table = []
+    for f in units:
+        row = []
+        fa, fb = _TEMP_TO_C[f]
+        for t in units:
+            ta, tb = _TEMP_FROM_C[t]
+            row.append((ta * fa, ta * fb + tb))
+        table.append(row)
+    return units, table
+
+
+_INDEX = {}     # category -> {unit: row/column}
+_MATRIX = {}    # category -> factor matrix (linear) or (scale, offset) matrix
+for _cat, _factors in LINEAR_UNITS.items():
+    _units, _MATRIX[_cat] = _linear_matrix(_factors)
+    _INDEX[_cat] = {u: i for i, u in enumerate(_units)}
+_units, _MATRIX["Temperature"] = _affine_matrix()
+_INDEX["Temperature"] = {u: i for i, u in enumerate(_units)}
+del _cat, _factors, _units
+
+
+def units_for(category):
+    return list(_INDEX.get(category, ()))
+
+
+def coefficients(category, from_u, to_u):
+    """(scale, offset) such that converted = scale * value + offset."""
+    index = _INDEX[category]
+    entry = _MATRIX[category][index[from_u]][index[to_u]]
+    if category == "Temperature":
+        return entry
+    return entry, 0.0
+
+
+def convert(v, category, from_u, to_u):
+    scale, offset = coefficients(category, from_u, to_u)
+    return v * scale + offset if offset else v * scale
+
+
+def to_base(v, category, unit):
+    return convert(v, category, unit, BASE_UNITS[category])
+
+
+def from_base(v, category, unit):
+    return convert(v, category, BASE_UNITS[category], unit)
+
+# ------------------------------
+# Bulk conversion (NumPy)
+# ------------------------------
+# numpy is imported on first use so that importing this module stays cheap
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("bulk conversion requires numpy (pip install numpy)")
+    return numpy
+
+
+def factor_matrix(category):
+    """Dense from->to factor matrix for a linear category as an ndarray."""
+    np = _numpy()
+    if category == "Temperature":
+        raise ValueError("Temperature is affine; use coefficients()")
+    return np.array(_MATRIX[category])
+
+
+def convert_array(values, category, from_u, to_u, out=None):
+    """Convert a whole array in one vectorized pass (``out`` may alias ``values``)."""
+    np = _numpy()
+    scale, offset = coefficients(category, from_u, to_u)
+    values = np.asarray(values, dtype=np.float64)
+    out = np.multiply(values, scale, out=out)
+    if offset:
+        out += offset
+    return out
+
+
+def _open(f, mode):
+    if hasattr(f, "read") or hasattr(f, "write"):
+        return f, False
+    return open(f, mode, newline="", encoding="utf-8"), True
+
+
+def convert_csv(src, dst, category, from_u, to_u, column, header=True,
+                delimiter=",", chunk_rows=65536):
+    """Convert one column of a CSV file, streaming ``chunk_rows`` rows at a time.
+
+    ``column`` is a header name or a 0-based index. Cells that are not
+    numbers are written back empty. Returns the number of data rows.
+    """
+    import csv
+    np = _numpy()
+    scale, offset = coefficients(category, from_u, to_u)
+    fin, close_in = _open(src, "r")
+    fout, close_out = _open(dst, "w")
+    try:
+        reader = csv.reader(fin, delimiter=delimiter)
+        writer = csv.writer(fout, delimiter=delimiter, lineterminator="\n")
+        col = column
+        if header:
+            head = next(reader, None)
+            if head is None:
+                return 0
+            if not isinstance(column, int):
+                col = head.index(column)
+            writer.writerow(head)
+        elif not isinstance(column, int):
+            raise ValueError("column must be an index when the file has no header")
+        total = 0
+        while True:
+            rows = [r for _, r in zip(range(chunk_rows), reader)]
+            if not rows:
+                break
+            cells = [r[col] if col < len(r) else "" for r in rows]
+            try:
+                vals = np.array(cells, dtype=np.float64)
+            except ValueError:
+                vals = np.array([_parse_float(c) for c in cells], dtype=np.float64)
+            vals *= scale
+            if offset:
+                vals += offset
+            for r, v in zip(rows, vals.tolist()):
+                if col < len(r):
+                    r[col] = "" if v != v else repr(v)
+            writer.writerows(rows)
+            total += len(rows)
+        return total
+    finally:
+        if close_in:
+            fin.close()
+        if close_out:
+            fout.close()
+
+
+def _parse_float(cell):
+    try:
+        return float(cell)
+    except ValueError:
+        return float("nan")
+
+
+def convert_binary(src, dst, category, from_u, to_u, dtype="<f8", chunk_items=1 << 22):
+    """Convert a raw binary array of floats through memory maps.
+
+    ``dst`` may equal ``src`` to convert in place. Work is done chunk by
+    chunk so files larger than RAM only ever touch ``chunk_items`` values
+    at a time. Returns the number of values converted.
+    """
+    import os
+    np = _numpy()
+    scale, offset = coefficients(category, from_u, to_u)
+    dtype = np.dtype(dtype)
+    n = os.path.getsize(src) // dtype.itemsize
+    if n == 0:
+        open(dst, "wb").close()
+        return 0
+    same = os.path.exists(dst) and os.path.samefile(src, dst)
+    inp = np.memmap(src, dtype=dtype, mode="r+" if same else "r", shape=(n,))
+    out = inp if same else np.memmap(dst, dtype=dtype, mode="w+", shape=(n,))
+    for start in range(0, n, chunk_items):
+        stop = min(start + chunk_items, n)
+        np.multiply(inp[start:stop], scale, out=out[start:stop])
+        if offset:
+            out[start:stop] += offset
+    out.flush()
+    del inp, out
+    return n
@@ -0,0 +1,157 @@
+# ------------------------------
+# Vectorized batch evaluation (NumPy)
+# ------------------------------
+# evaluate_many() compiles an expression once (through the same cache and
+# AST whitelist as safe_eval) and runs it over whole arrays. Every EvalEnv
+# wrapper has a ufunc-based twin in VectorEnv that keeps the scalar
+# semantics (deg/rad, cbrt/root sign handling, fact truncation). Anything
+# without a vectorized twin is applied element by element.
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only the batch API needs it
+    np = None
+
+from calc_core import EvalEnv, compile_expr, _EVAL_GLOBALS
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("evaluate_many requires numpy (pip install numpy)")
+
+
+def _per_element(fn):
+    # scalar fallback: call fn on every element, keep exact ints if they
+    # do not fit in a float
+    def wrapper(*args, **kwargs):
+        call = (lambda *a: fn(*a, **kwargs)) if kwargs else fn
+        out = np.frompyfunc(call, len(args), 1)(*args)
+        if not isinstance(out, np.ndarray):
+            return out
+        try:
+            return out.astype(np.float64)
+        except (OverflowError, TypeError):
+            return out
+    wrapper.__name__ = getattr(fn, "__name__", "per_element")
+    return wrapper
+
+
+# largest n whose factorial is a finite double
+_FACT_MAX = 170
+_fact_table = None
+
+
+def _get_fact_table():
+    global _fact_table
+    if _fact_table is None:
+        _fact_table = np.array([float(math.factorial(k)) for k in range(_FACT_MAX + 1)])
+    return _fact_table
+
+
+class VectorEnv(EvalEnv):
+    # names whose wrappers below accept arrays
+    VECTORIZED = frozenset([
+        'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sqrt', 'cbrt', 'root',
+        'ln', 'log10', 'log', 'fact', 'exp', 'pow', 'inv', 'abs', 'round',
+    ])
+
+    def __init__(self, deg_mode=True):
+        _require_numpy()
+        super().__init__()
+        self.deg_mode = deg_mode
+
+    def sin(self, x):
+        return np.sin(np.radians(x)) if self.deg_mode else np.sin(x)
+    def cos(self, x):
+        return np.cos(np.radians(x)) if self.deg_mode else np.cos(x)
+    def tan(self, x):
+        return np.tan(np.radians(x)) if self.deg_mode else np.tan(x)
+    def asin(self, x):
+        r = np.arcsin(x)
+        return np.degrees(r) if self.deg_mode else r
+    def acos(self, x):
+        r = np.arccos(x)
+        return np.degrees(r) if self.deg_mode else r
+    def atan(self, x):
+        r = np.arctan(x)
+        return np.degrees(r) if self.deg_mode else r
+
+    def sqrt(self, x):
+        return np.sqrt(x)
+    def cbrt(self, x):
+        # same formula as the scalar path (not np.cbrt) so results match bit for bit
+        return np.copysign(np.abs(x) ** (1.0/3.0), x)
+    def root(self, x, n):
+        return np.copysign(np.abs(x) ** (1.0 / np.asarray(n, dtype=np.float64)), x)
+    def ln(self, x):
+        return np.log(x)
+    def log10(self, x):
+        return np.log10(x)
+    def log(self, x, base=10):
+        return np.log(x) / np.log(base)
+    def fact(self, n):
+        n = np.asarray(n)
+        if n.size == 0:
+            return n.astype(np.float64)
+        if not np.isfinite(n).all():
+            return _per_element(EvalEnv.fact.__get__(self))(n)
+        n_int = np.trunc(n)
+        if (n_int < 0).any():
+            raise ValueError("factorial not defined for negative")
+        if n_int.max() <= _FACT_MAX:
+            return _get_fact_table()[n_int.astype(np.intp)]
+        return _per_element(EvalEnv.fact.__get__(self))(n)
+    def exp(self, x):
+        return np.exp(x)
+    def pow(self, x, y):
+        return np.power(np.asarray(x, dtype=np.float64), y)
+    def inv(self, x):
+        return 1.0 / np.asarray(x, dtype=np.float64)
+
+    def _build_namespace(self):
+        ns = super()._build_namespace()
+        ns['abs'] = np.abs
+        ns['round'] = np.round
+        for name, val in ns.items():
+            if callable(val) and name not in self.VECTORIZED and not name.startswith('_'):
+                ns[name] = _per_element(val)
+        return ns
+
+
+_vector_envs = {}
+
+
+def _vector_env(deg_mode):
+    venv = _vector_envs.get(deg_mode)
+    if venv is None:
+        venv = _vector_envs[deg_mode] = VectorEnv(deg_mode)
+    return venv
+
+
+def _as_input(value):
+    a = np.asarray(value)
+    # python ints/bools would silently wrap or reject negative powers in numpy
+    if a.dtype.kind in "biu":
+        a = a.astype(np.float64)
+    return a
+
+
+def evaluate_many(expr, env=None, **arrays):
+    """Evaluate ``expr`` over the arrays given as keyword arguments.
+
+    Inputs are broadcast against each other; the result always has the
+    broadcast shape. Domain errors give nan/inf instead of raising.
+    """
+    _require_numpy()
+    compiled = compile_expr(expr)
+    deg_mode = env.deg_mode if env is not None else True
+    ns = dict(_vector_env(deg_mode).namespace())
+    inputs = {name: _as_input(v) for name, v in arrays.items()}
+    ns.update(inputs)
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        out = np.asarray(eval(compiled.code, _EVAL_GLOBALS, ns))
+    shape = np.broadcast_shapes(*(a.shape for a in inputs.values())) if inputs else ()
+    if out.shape != shape:
+        out = np.broadcast_to(out, shape).copy()
+    return out
@@ -0,0 +1,341 @@
+# ------------------------------
+# Worksheet: variables, user functions, incremental recomputation
+# ------------------------------
+# A worksheet is a set of named definitions evaluated with the EvalEnv
+# functions:
+#
+#   r = 2.5
+#   area = pi*r^2
+#   f(x) = sin(x)/x
+#   f(area)
+#
+# Each definition is compiled once through compile_expr; the names it reads
+# give the dependency graph. Changing a cell recomputes only the cells
+# downstream of it, in topological order. User functions memoize their
+# results (they are pure) until they or anything they read change. A
+# definition that would close a cycle is rejected with CycleError. Cells
+# and user functions run under calc_guard's limits, like guarded_eval, so
+# x = 9^9^9 is an error rather than a hang. `ans` is the last evaluate()
+# result; cells cannot read it, since it changes behind their backs.
+#
+#   python calc_worksheet.py sheet.txt
+import functools
+import re
+import sys
+
+from calc_core import EvalEnv, compile_expr, format_result
+from calc_guard import DEFAULT_LIMITS, _Guard, _bound, _guarded_code, _install_guard
+
+
+class WorksheetError(ValueError):
+    pass
+
+
+class CycleError(WorksheetError):
+    pass
+
+
+# "name = expr" or "f(x, y) = expr"; "==" is not an assignment
+_DEFINITION = re.compile(r"^\s*([A-Za-z]\w*)\s*(\(([^()]*)\))?\s*=(?!=)(.*)$")
+
+
+class Cell:
+    __slots__ = ("name", "source", "params", "compiled", "deps", "value", "error", "memo")
+
+    def __init__(self, name, source, params, compiled, deps):
+        self.name = name
+        self.source = source
+        self.params = params        # None for a value cell, tuple for a function
+        self.compiled = compiled
+        self.deps = deps            # names of other cells this one reads
+        self.value = None
+        self.error = None
+        self.memo = None            # lru-cached callable for function cells
+
+    @property
+    def is_function(self):
+        return self.params is not None
+
+
+class Worksheet:
+    MEMO_SIZE = 1024    # cached results per user function
+
+    def __init__(self, env=None, limits=None):
+        self.env = env or EvalEnv()
+        self.limits = limits or DEFAULT_LIMITS
+        self._depth = 0         # evaluations in progress (user functions run inside cells)
+        self.cells = {}         # name -> Cell, in definition order
+        self._dependents = {}   # name -> set of cells that read it
+        self._base = None       # env namespace the worksheet namespace was built on
+        self._ns = None
+        self._anon = 0
+        self.evaluations = 0    # cell (re)computations, for checking incrementality
+
+    # ------------------------------
+    # Definitions
+    # ------------------------------
+    def _builtin_names(self):
+        return self.env.namespace().keys()
+
+    def define(self, name, expr, params=None, recompute=True):
+        """Define or redefine a cell; returns the names that were recomputed."""
+        # "_lineN" names are reserved for anonymous cells created by _parse
+        if not name.isidentifier() or (name.startswith("_") and not name.startswith("_line")):
+            raise WorksheetError("Invalid name: {}".format(name))
+        if name in self._builtin_names():
+            raise WorksheetError("{} is a built-in name".format(name))
+        if name == "ans":
+            raise WorksheetError("ans is the last evaluate() result, not a cell")
+        if params is not None:
+            params = tuple(params)
+            for p in params:
+                if not p.isidentifier() or p.startswith("_"):
+                    raise WorksheetError("Invalid parameter: {}".format(p))
+        compiled = compile_expr(expr)
+        builtins = self._builtin_names()
+        deps = frozenset(n for n in compiled.names
+                         if n not in builtins and n not in (params or ()))
+        if "ans" in deps:
+            raise WorksheetError("cells cannot read ans (it changes with every evaluate())")
+        self._check_cycle(name, deps)
+
+        old = self.cells.get(name)
+        if old is not None:
+            for d in old.deps:
+                self._dependents.get(d, set()).discard(name)
+        cell = Cell(name, expr, params, compiled, deps)
+        self.cells[name] = cell
+        for d in deps:
+            self._dependents.setdefault(d, set()).add(name)
+        if not recompute:
+            return []
+        return self._recompute_from([name])
+
+    def _check_cycle(self, name, deps):
+        # would any dependency (transitively) read `name`?
+        stack = list(deps)
+        seen = set()
+        while stack:
+            n = stack.pop()
+            if n == name:
+                raise CycleError("circular definition: {} depends on itself".format(name))
+            if n in seen:
+                continue
+            seen.add(n)
+            cell = self.cells.get(n)
+            if cell is not None:
+                stack.extend(cell.deps)
+
+    def remove(self, name):
+        cell = self.cells.pop(name)
+        for d in cell.deps:
+            self._dependents.get(d, set()).discard(name)
+        if self._ns is not None:
+            self._ns.pop(name, None)
+        return self._recompute_from(list(self._dependents.get(name, ())))
+
+    def set(self, line):
+        """Apply one worksheet line; returns (cell name, recomputed names)."""
+        name, expr, params = self._parse(line)
+        return name, self.define(name, expr, params)
+
+    def _parse(self, line):
+        m = _DEFINITION.match(line)
+        if m is None:
+            # a bare expression becomes an anonymous cell
+            self._anon += 1
+            return "_line{}".format(self._anon), line.strip(), None
+        name, _, plist, expr = m.groups()
+        params = None
+        if plist is not None:
+            params = [p.strip() for p in plist.split(",")] if plist.strip() else []
+        return name, expr.strip(), params
+
+    def load(self, text):
+        """Define every line of a worksheet text, then compute them all once."""
+        names = []
+        for line in text.splitlines():
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            name, expr, params = self._parse(line)
+            self.define(name, expr, params, recompute=False)
+            names.append(name)
+        self.recompute_all()
+        return names
+
+    # ------------------------------
+    # Evaluation
+    # ------------------------------
+    def _namespace(self):
+        base = self.env.namespace()
+        if base is not self._base:
+            # deg/rad (or units/precision) changed: every value may be stale
+            self._base = base
+            self._ns = dict(base)
+            self._ns["__builtins__"] = {}
+            return self._ns, True
+        return self._ns, False
+
+    def _affected(self, roots):
+        out = set()
+        stack = list(roots)
+        while stack:
+            n = stack.pop()
+            if n in out:
+                continue
+            out.add(n)
+            stack.extend(self._dependents.get(n, ()))
+        return out
+
+    def _topo_order(self, names):
+        # Kahn's algorithm restricted to `names`
+        indegree = {n: 0 for n in names if n in self.cells}
+        for n in indegree:
+            for d in self.cells[n].deps:
+                if d in indegree:
+                    indegree[n] += 1
+        ready = [n for n in self.cells if indegree.get(n) == 0]
+        order = []
+        while ready:
+            n = ready.pop()
+            order.append(n)
+            for m in self._dependents.get(n, ()):
+                if m in indegree:
+                    indegree[m] -= 1
+                    if indegree[m] == 0:
+                        ready.append(m)
+        return order
+
+    def _recompute_from(self, roots):
+        ns, stale = self._namespace()
+        if stale:
+            return self.recompute_all()
+        order = self._topo_order(self._affected(roots))
+        for name in order:
+            self._compute(self.cells[name], ns)
+        return order
+
+    def recompute_all(self):
+        ns, _ = self._namespace()
+        order = self._topo_order(set(self.cells))
+        for name in order:
+            self._compute(self.cells[name], ns)
+        return order
+
+    def _compute(self, cell, ns):
+        self.evaluations += 1
+        cell.error = None
+        for d in cell.deps:
+            dep = self.cells.get(d)
+            if dep is None:
+                cell.error = WorksheetError("{} is not defined".format(d))
+            elif dep.error is not None:
+                cell.error = WorksheetError("{} depends on {}, which failed".format(cell.name, d))
+            if cell.error is not None:
+                cell.value = None
+                ns.pop(cell.name, None)
+                return
+        if cell.is_function:
+            cell.value = self._make_function(cell, ns)
+        else:
+            try:
+                cell.value = self._run(cell.compiled, ns)
+            except Exception as e:
+                cell.value = None
+                cell.error = e
+                ns.pop(cell.name, None)
+                return
+        ns[cell.name] = cell.value
+
+    def _run(self, compiled, ns, local=None, rounded=True):
+        # as guarded_eval does; the outermost evaluation (a cell, evaluate()
+        # or a direct call of a user function) starts the deadline
+        outer = not self._depth
+        self._depth += 1
+        try:
+            if self.env.precision:
+                # literals as Decimals, as safe_eval runs them at this precision
+                from calc_precision import precise_code, precise_run
+                _bound(compiled.tree, self.limits)
+                tick = _Guard(self.limits)._tick if outer and self.limits.timeout else None
+                return precise_run(precise_code(compiled), self.env, ns, local, rounded, tick)
+            _, code = _guarded_code(compiled, self.limits)
+            if outer:
+                _install_guard(ns, self.limits)
+            return eval(code, ns, local)
+        finally:
+            self._depth -= 1
+
+    def _make_function(self, cell, ns):
+        compiled = cell.compiled
+        params = cell.params
+
+        def call(*args):
+            if len(args) != len(params):
+                raise TypeError("{}() takes {} argument(s), got {}".format(cell.name, len(params), len(args)))
+            # parameters are the locals, worksheet cells and functions the globals
+            return self._run(compiled, ns, dict(zip(params, args)), rounded=False)
+
+        memo = functools.lru_cache(maxsize=self.MEMO_SIZE)(call)
+
+        def fn(*args):
+            try:
+                return memo(*args)
+            except TypeError as e:
+                if "unhashable" not in str(e):
+                    raise
+                return call(*args)
+        fn.__name__ = cell.name
+        fn.cache_info = memo.cache_info
+        cell.memo = memo
+        return fn
+
+    def evaluate(self, expr):
+        """Evaluate an expression against the worksheet and store it as ``ans``."""
+        ns, stale = self._namespace()
+        if stale:
+            self.recompute_all()
+        val = self._run(compile_expr(expr), ns)
+        ns["ans"] = val
+        return val
+
+    def value(self, name):
+        cell = self.cells[name]
+        if cell.error is not None:
+            raise cell.error
+        return cell.value
+
+    __getitem__ = value
+
+    def error(self, name):
+        return self.cells[name].error
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python calc_worksheet.py [--rad] sheet.txt", file=sys.stderr)
+        return 2
+    env = EvalEnv()
+    if "--rad" in argv:
+        argv = [a for a in argv if a != "--rad"]
+        env.deg_mode = False
+    with open(argv[0], encoding="utf-8") as f:
+        text = f.read()
+    ws = Worksheet(env)
+    failed = False
+    for name in ws.load(text):
+        cell = ws.cells[name]
+        label = cell.source if name.startswith("_line") else name
+        if cell.error is not None:
+            failed = True
+            print("{} = Error: {}".format(label, cell.error))
+        elif cell.is_function:
+            print("{}({}) = {}".format(name, ", ".join(cell.params), cell.source))
+        else:
+            print("{} = {}".format(label, format_result(cell.value)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,22 @@
 import tkinter as tk
-from tkinter import ttk, simpledialog, messagebox
+from tkinter import ttk, simpledialog, messagebox, filedialog
+from tkinter import font as tkfont
 import math
 import functools
+import os
+import queue
+import threading
+
+from calc_core import (
+    EvalEnv, safe_eval, compile_expr, format_result,
+    cache_stats, set_cache_size, clear_cache,
+)
+from calc_units import CATEGORIES, units_for
+from calc_guard import IsolatedEvaluator, EvalLimitError
+from calc_preview import LivePreview
+from calc_history import HistoryStore, format_record
+from calc_sampling import make_batch_function, adaptive_samples, table_rows, write_csv, ColumnAggregate
+from calc_stats import stats_of, stats_file, guess_dtype, format_summary
 
 # ------------------------------
 # Colors / Theme
@@ -13,104 +28,45 @@ HOVER_COLOR = "#B3E5FC"     # light blue hover
 BTN_PRESS = "#80DEEA"       # pressed shade
 ACCENT = "#01579B"          # accent (for labels/toggles)
 
-# ------------------------------
-# Safe eval environment (with degree/radian mode)
-# ------------------------------
-class EvalEnv:
-    def __init__(self):
-        self.deg_mode = True
-
-    def toggle_deg(self):
-        self.deg_mode = not self.deg_mode
-
-    # degree-aware wrappers
-    def sin(self, x):
-        return math.sin(math.radians(x)) if self.deg_mode else math.sin(x)
-    def cos(self, x):
-        return math.cos(math.radians(x)) if self.deg_mode else math.cos(x)
-    def tan(self, x):
-        return math.tan(math.radians(x)) if self.deg_mode else math.tan(x)
-    def asin(self, x):
-        r = math.asin(x)
-        return math.degrees(r) if self.deg_mode else r
-    def acos(self, x):
-        r = math.acos(x)
-        return math.degrees(r) if self.deg_mode else r
-    def atan(self, x):
-        r = math.atan(x)
-        return math.degrees(r) if self.deg_mode else r
-
-    def sqrt(self, x):
-        return math.sqrt(x)
-    def cbrt(self, x):
-        return math.copysign(abs(x) ** (1.0/3.0), x)
-    def root(self, x, n):
-        # n-th root of x -> x ** (1/n)
-        return math.copysign(abs(x) ** (1.0/float(n)), x)
-    def ln(self, x):
-        return math.log(x)
-    def log10(self, x):
-        return math.log10(x)
-    def log(self, x, base=10):
-        return math.log(x, base)
-    def fact(self, n):
-        n_int = int(n)
-        if n_int < 0:
-            raise ValueError("factorial not defined for negative")
-        return math.factorial(n_int)
-    def exp(self, x):
-        return math.exp(x)
-    def pow(self, x, y):
-        return math.pow(x, y)
-    def inv(self, x):
-        return 1.0 / x
-    def e(self):
-        return math.e
-
-    def namespace(self):
-        ns = {
-            'pi': math.pi,
-            'e': math.e,
-            'sin': self.sin,
-            'cos': self.cos,
-            'tan': self.tan,
-            'asin': self.asin,
-            'acos': self.acos,
-            'atan': self.atan,
-            'sqrt': self.sqrt,
-            'cbrt': self.cbrt,
-            'root': self.root,
-            'ln': self.ln,
-            'log10': self.log10,
-            'log': self.log,
-            'fact': self.fact,
-            'exp': self.exp,
-            'pow': self.pow,
-            'inv': self.inv,
-            # safe wrappers from math
-            'abs': abs,
-            'round': round,
-        }
-        # add a few math helpers
-        for fn in ['sin','cos','tan','asin','acos','atan','sqrt','exp','log','log10','pow']:
-            pass
-        return ns
-
-def safe_eval(expr, env: EvalEnv):
-    # replace unicode pi if present
-    expr = expr.replace('π', 'pi')
-    expr = expr.replace('^', '**')
-    if "__" in expr:
-        raise ValueError("Invalid expression")
-    ns = env.namespace()
-    try:
-        return eval(expr, {"__builtins__": None}, ns)
-    except Exception as e:
-        raise
+# history persistence (set SCICALC_HISTORY to an empty string to keep it in memory only)
+HISTORY_PATH = os.environ.get("SCICALC_HISTORY", os.path.join(os.path.expanduser("~"), ".scientific_calc_history.db"))
+HISTORY_CAPACITY = 1000     # records kept in memory
+HISTORY_FLUSH_MS = 2000     # batched writes are flushed at least this often
+
+# plot canvas size in pixels
+PLOT_W = 470
+PLOT_H = 240
 
 # ------------------------------
 # Rounded Button using Canvas
 # ------------------------------
+@functools.lru_cache(maxsize=None)
+def _rounded_rect_geometry(w, h, r):
+    # rounded rectangle (four arcs + two rects), shared by same-sized buttons
+    arcs = (
+        ((0, 0, r*2, r*2), 90),
+        ((w-2*r, 0, w, r*2), 0),
+        ((0, h-2*r, r*2, h), 180),
+        ((w-2*r, h-2*r, w, h), 270),
+    )
+    rects = ((r, 0, w-r, h), (0, r, w, h-r))
+    return arcs, rects
+
+
+# one named Tk font per (root, font spec) instead of a parsed font per text item
+_shared_fonts = {}
+
+
+def _shared_font(widget, spec):
+    key = (widget.tk, spec)
+    f = _shared_fonts.get(key)
+    if f is None:
+        family, size, *style = spec
+        f = _shared_fonts[key] = tkfont.Font(root=widget, family=family, size=size,
+                                             weight="bold" if "bold" in style else "normal")
+    return f
+
+
 class RoundedButton(tk.Canvas):
     def __init__(self, master, text, command=None, width=80, height=48,
                  radius=16, bg=ENTRY_BG, fg=ENTRY_TEXT, hover=HOVER_COLOR, pressed=BTN_PRESS,
@@ -127,26 +83,30 @@ class RoundedButton(tk.Canvas):
         self._width = width
         self._height = height
         self._is_pressed = False
-        self._draw(bg)
+        self._color = None
+        self._create_items(bg)
         self.bind("<Enter>", self._on_enter)
         self.bind("<Leave>", self._on_leave)
         self.bind("<ButtonPress-1>", self._on_press)
         self.bind("<ButtonRelease-1>", self._on_release)
 
+    def _create_items(self, color):
+        # shapes are created once and share the "shape" tag; _draw only recolors
+        arcs, rects = _rounded_rect_geometry(self._width, self._height, self.radius)
+        for box, start in arcs:
+            self.create_arc(box, start=start, extent=90, fill=color, outline=color, tags="shape")
+        for box in rects:
+            self.create_rectangle(box, fill=color, outline=color, tags="shape")
+        font = _shared_font(self, self.font) if isinstance(self.font, tuple) else self.font
+        self.create_text(self._width/2, self._height/2, text=self._text, fill=self.fg, font=font, tags="btn_text")
+        self._color = color
+
     def _draw(self, color):
-        self.delete("all")
-        w = self._width
-        h = self._height
-        r = self.radius
-        # rounded rectangle (two arcs + rects)
-        self.create_arc((0, 0, r*2, r*2), start=90, extent=90, fill=color, outline=color)
-        self.create_arc((w-2*r, 0, w, r*2), start=0, extent=90, fill=color, outline=color)
-        self.create_arc((0, h-2*r, r*2, h), start=180, extent=90, fill=color, outline=color)
-        self.create_arc((w-2*r, h-2*r, w, h), start=270, extent=90, fill=color, outline=color)
-        self.create_rectangle((r, 0, w-r, h), fill=color, outline=color)
-        self.create_rectangle((0, r, w, h-r), fill=color, outline=color)
-        # text
-        self.create_text(w/2, h/2, text=self._text, fill=self.fg, font=self.font, tags="btn_text")
+        if color == self._color:
+            return
+        # one Tcl call recolors all six shapes
+        self.itemconfigure("shape", fill=color, outline=color)
+        self._color = color
 
     def _on_enter(self, event):
         if not self._is_pressed:
@@ -170,8 +130,90 @@ class RoundedButton(tk.Canvas):
 # allow changing text
     def set_text(self, t):
         self._text = t
+        self.itemconfigure("btn_text", text=t)
         self._draw(self.bg)
 
+# ------------------------------
+# Virtualized list (renders only the visible rows)
+# ------------------------------
+class VirtualList(tk.Frame):
+    # source needs __len__-like count() and page(offset, limit); only the
+    # rows in view are ever inserted into the Listbox
+    def __init__(self, master, count, page, render=str, font=("Segoe UI", 11)):
+        tk.Frame.__init__(self, master, bg=master['bg'])
+        self._count = count
+        self._page = page
+        self._render = render
+        self.offset = 0
+        self.rows = []
+        self.listbox = tk.Listbox(self, font=font, activestyle="none")
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self._line = tkfont.Font(root=self, font=font).metrics("linespace") + 2
+        self.visible = 1
+        self.listbox.bind("<Configure>", self._on_resize)
+        self.listbox.bind("<MouseWheel>", self._on_wheel)
+        self.listbox.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.listbox.bind("<Button-5>", lambda e: self._scroll_by(3))
+        # keep the Listbox from scrolling its own (tiny) contents
+        for seq in ("<Up>", "<Down>", "<Prior>", "<Next>"):
+            self.listbox.bind(seq, lambda e: "break")
+
+    def set_source(self, count, page):
+        self._count = count
+        self._page = page
+        self.offset = 0
+        self.refresh()
+
+    def _on_resize(self, event):
+        self.visible = max(1, event.height // self._line)
+        self.refresh()
+
+    def _on_wheel(self, event):
+        self._scroll_by(-1 if event.delta > 0 else 1)
+        return "break"
+
+    def _scroll_by(self, rows):
+        self.offset += rows
+        self.refresh()
+        return "break"
+
+    def _on_scroll(self, action, value, unit=None):
+        total = self._count()
+        if action == "moveto":
+            self.offset = int(float(value) * total)
+        elif unit == "pages":
+            self.offset += int(value) * self.visible
+        else:
+            self.offset += int(value)
+        self.refresh()
+
+    def at_end(self):
+        return self.offset + self.visible >= self._count()
+
+    def scroll_to_end(self):
+        self.offset = self._count()
+        self.refresh()
+
+    def refresh(self):
+        total = self._count()
+        self.offset = max(0, min(self.offset, total - self.visible))
+        self.rows = self._page(self.offset, self.visible)
+        self.listbox.delete(0, tk.END)
+        for row in self.rows:
+            self.listbox.insert(tk.END, self._render(row))
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def selected(self):
+        sel = self.listbox.curselection()
+        if not sel or sel[0] >= len(self.rows):
+            return None
+        return self.rows[sel[0]]
+
 # ------------------------------
 # Main Application
 # ------------------------------
@@ -184,7 +226,31 @@ class ScientificAppbySundram(tk.Tk):
         self.resizable(False, False)
 
         self.env = EvalEnv()
-        self.history = []  # list of strings
+        self.env.units = True   # "3 km/h * 2 h" works in the calculator tab
+        self.history = self._open_history()
+
+        # background evaluation: jobs run in a worker process and results
+        # are picked up by _poll_worker via after(), so the window never blocks;
+        # with SCICALC_PROFILE set the worker profiles the engine on its own
+        self.worker = IsolatedEvaluator(profile=os.environ.get("SCICALC_PROFILE") or None)
+        self._jobs = {}  # job id -> (slot, snapshot fn, snapshot, on_done, on_error)
+        self._polling = False
+        # as-you-type result under the entry, computed on a background thread
+        self.preview = LivePreview()
+        self._preview_job = None
+        self._preview_polling = False
+        self._preview_shown = None  # entry text whose result is on display
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        # SCICALC_PROFILE=path[.folded] profiles the window's process (cProfile,
+        # or sampled collapsed stacks for .folded) and writes it on close; the
+        # evaluation worker writes path.worker[.folded] next to it
+        self._profiler = None
+        if os.environ.get("SCICALC_PROFILE"):
+            import calc_metrics
+            path = os.environ["SCICALC_PROFILE"]
+            mode = "sampling" if path.endswith(".folded") else "cprofile"
+            self._profiler = calc_metrics.profile(path, mode).start()
 
         # Notebook
         style = ttk.Style(self)
@@ -198,14 +264,20 @@ class ScientificAppbySundram(tk.Tk):
         # Tabs
         self.tab_calc = tk.Frame(self.notebook, bg=WINDOW_BG)
         self.tab_conv = tk.Frame(self.notebook, bg=WINDOW_BG)
+        self.tab_plot = tk.Frame(self.notebook, bg=WINDOW_BG)
+        self.tab_stats = tk.Frame(self.notebook, bg=WINDOW_BG)
         self.tab_history = tk.Frame(self.notebook, bg=WINDOW_BG)
 
         self.notebook.add(self.tab_calc, text="Calculator")
         self.notebook.add(self.tab_conv, text="Converter")
+        self.notebook.add(self.tab_plot, text="Plot")
+        self.notebook.add(self.tab_stats, text="Stats")
         self.notebook.add(self.tab_history, text="History")
 
         self._build_calculator_tab()
         self._build_converter_tab()
+        self._build_plot_tab()
+        self._build_stats_tab()
         self._build_history_tab()
 
     # ------------------------------
@@ -222,21 +294,34 @@ class ScientificAppbySundram(tk.Tk):
         self.mode_label = tk.Label(left_ctrl, text="Mode: DEG", fg=ACCENT, bg=WINDOW_BG, font=("Segoe UI", 10, "bold"))
         self.mode_label.pack(anchor="w", pady=2)
 
+        def show_mode():
+            mode = "DEG" if self.env.deg_mode else "RAD"
+            self.mode_label.config(text="Mode: " + mode + (" ℂ" if self.env.complex else ""))
         def toggle_deg():
             self.env.toggle_deg()
-            self.mode_label.config(text="Mode: " + ("DEG" if self.env.deg_mode else "RAD"))
+            show_mode()
+            self._refresh_preview()
+        def toggle_complex():
+            # sqrt(-1) -> 1j instead of an error
+            self.env.complex = not self.env.complex
+            show_mode()
+            self._refresh_preview()
         RoundedButton(left_ctrl, text="Toggle\nDeg/Rad", command=toggle_deg, width=96, height=44).pack(padx=4, pady=4)
+        RoundedButton(left_ctrl, text="Real/ℂ", command=toggle_complex, width=96, height=44).pack(padx=4, pady=4)
 
         # entry area
         entry_frame = tk.Frame(self.tab_calc, bg=WINDOW_BG)
         entry_frame.pack(fill="x", padx=14, pady=4)
 
-        # calculator entry (disable direct keyboard typing)
-        self.calc_entry = tk.Entry(entry_frame, font=("Segoe UI", 22), bd=0, relief="flat",
-                                   justify="right", bg="#F9F9F9", fg="#111")
+        # calculator entry: typed or built with the keypad, previewed on every edit
+        self.entry_var = tk.StringVar()
+        self.calc_entry = tk.Entry(entry_frame, textvariable=self.entry_var, font=("Segoe UI", 22),
+                                   bd=0, relief="flat", justify="right", bg="#F9F9F9", fg="#111")
         self.calc_entry.pack(fill="x", padx=6, pady=6, ipady=8)
-        # block keyboard typing in calculator entry (buttons-only)
-        self.calc_entry.bind("<Key>", lambda e: "break")
+        self.calc_entry.bind("<Return>", lambda e: self._evaluate_and_store())
+        self.calc_entry.bind("<KP_Enter>", lambda e: self._evaluate_and_store())
+        self.calc_entry.bind("<Escape>", lambda e: self._clear())
+        self.entry_var.trace_add("write", self._on_entry_changed)
 
         # small label for expression/result
         self.result_var = tk.StringVar()
@@ -285,7 +370,7 @@ class ScientificAppbySundram(tk.Tk):
                     x = float(self.calc_entry.get())
                     res = self.env.log(x, base)
                     self._set_result(str(res))
-                    self._add_history(f"log({x},{base}) = {res}")
+                    self._add_history(f"log({x},{base})", str(res))
                 except Exception as e:
                     self._set_result("Error")
             else:
@@ -317,15 +402,93 @@ class ScientificAppbySundram(tk.Tk):
         RoundedButton(row3, text="y√x", command=lambda: self._insert("root("), width=84, height=52).pack(side="left", padx=6)
         RoundedButton(row3, text="eˣ", command=lambda: self._insert("exp("), width=84, height=52).pack(side="left", padx=6)
 
+        # fifth row: calculus, e.g. d/dx -> diff(x^2, x, 3), ∫ -> integrate(sin(x), x, 0, 90)
+        row4 = tk.Frame(keypad, bg=WINDOW_BG)
+        row4.pack(fill="x", pady=6)
+        RoundedButton(row4, text="d/dx", command=lambda: self._insert("diff("), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row4, text="∫", command=lambda: self._insert("integrate("), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row4, text="solve", command=lambda: self._insert("solve("), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row4, text="x", command=lambda: self._insert("x"), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row4, text=",", command=lambda: self._insert(", "), width=84, height=52).pack(side="left", padx=6)
+
+        # sixth row: complex unit and matrices, e.g. det([[1, 2], [3, 4]]), A @ B
+        row5 = tk.Frame(keypad, bg=WINDOW_BG)
+        row5.pack(fill="x", pady=6)
+        RoundedButton(row5, text="i", command=lambda: self._insert("i"), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row5, text="[", command=lambda: self._insert("["), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row5, text="]", command=lambda: self._insert("]"), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row5, text="@", command=lambda: self._insert(" @ "), width=84, height=52).pack(side="left", padx=6)
+        RoundedButton(row5, text="det", command=lambda: self._insert("det("), width=84, height=52).pack(side="left", padx=6)
+
         # equals & history quick-add
         bottom_row = tk.Frame(self.tab_calc, bg=WINDOW_BG)
         bottom_row.pack(fill="x", pady=8)
         RoundedButton(bottom_row, text="=", command=self._evaluate_and_store, width=420, height=56).pack(side="left", padx=8)
+        # only shown while a background evaluation is running
+        self.cancel_btn = RoundedButton(bottom_row, text="Cancel", command=self._cancel_jobs, width=96, height=56)
 
     # insert text into calc entry
     def _insert(self, s):
         self.calc_entry.insert(tk.END, s)
 
+    # ------------------------------
+    # Background evaluation
+    # ------------------------------
+    def _run_async(self, slot, kind, args, snapshot, on_done, on_error):
+        # a newer job in the same slot makes older ones stale
+        for job_id in [j for j, job in self._jobs.items() if job[0] == slot]:
+            del self._jobs[job_id]
+        job_id = self.worker.submit(kind, *args)
+        self._jobs[job_id] = (slot, snapshot, snapshot(), on_done, on_error)
+        self._set_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.after(16, self._poll_worker)
+
+    def _poll_worker(self):
+        for job_id, ok, payload in self.worker.poll():
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                continue
+            slot, snapshot, taken, on_done, on_error = job
+            # the user edited the input while this was running
+            if snapshot() != taken:
+                continue
+            if ok:
+                on_done(payload)
+            else:
+                on_error(payload)
+        if self.worker.busy:
+            self.after(16, self._poll_worker)
+        else:
+            self._polling = False
+            self._jobs.clear()
+            self._set_busy(False)
+
+    def _set_busy(self, busy):
+        if busy:
+            self._set_result("Computing…")
+            if not self.cancel_btn.winfo_ismapped():
+                self.cancel_btn.pack(side="left", padx=4)
+        elif self.cancel_btn.winfo_ismapped():
+            self.cancel_btn.pack_forget()
+            if self.result_var.get() == "Computing…":
+                self._set_result("")
+
+    def _cancel_jobs(self):
+        self.worker.cancel()
+        self._jobs.clear()
+        self._set_busy(False)
+        self._set_result("Cancelled")
+
+    def _on_close(self):
+        if self._profiler is not None:
+            self._profiler.stop()
+        self.preview.close()
+        self.worker.close()
+        self.history.close()
+        self.destroy()
+
     def _backspace(self):
         cur = self.calc_entry.get()
         if cur:
@@ -341,35 +504,39 @@ class ScientificAppbySundram(tk.Tk):
             res = 1.0 / val
             self.calc_entry.delete(0, tk.END)
             self.calc_entry.insert(0, str(res))
-            self._add_history(f"1/({val}) = {res}")
+            self._add_history(f"1/({val})", str(res))
         except:
             self._set_result("Error")
 
+    def _replace_entry(self, text):
+        self.calc_entry.delete(0, tk.END)
+        self.calc_entry.insert(0, text)
+
+    def _apply_fn(self, fn_name, args):
+        def done(res):
+            self._replace_entry(str(res))
+            self._set_result("")
+            self._add_history(f"{fn_name}({', '.join(str(a) for a in args)})", str(res))
+        self._run_async("calc", "call", (fn_name, args, self.env.deg_mode),
+                        self.calc_entry.get, done, lambda e: self._set_result("Error"))
+
     def _apply_trig(self, fn_name):
         try:
             val = float(self.calc_entry.get())
-            fn = getattr(self.env, fn_name)
-            res = fn(val)
-            self.calc_entry.delete(0, tk.END)
-            self.calc_entry.insert(0, str(res))
-            self._add_history(f"{fn_name}({val}) = {res}")
-        except Exception as e:
+        except ValueError:
             self._set_result("Error")
+            return
+        self._apply_fn(fn_name, (val,))
 
     def _apply_log(self, fn_name):
         try:
             val = float(self.calc_entry.get())
-            if fn_name == "log10":
-                res = self.env.log10(val)
-            elif fn_name == "ln":
-                res = self.env.ln(val)
-            else:
-                res = self.env.log(val)
-            self.calc_entry.delete(0, tk.END)
-            self.calc_entry.insert(0, str(res))
-            self._add_history(f"{fn_name}({val}) = {res}")
-        except:
+        except ValueError:
             self._set_result("Error")
+            return
+        if fn_name not in ("log10", "ln"):
+            fn_name = "log"
+        self._apply_fn(fn_name, (val,))
 
     def _set_result(self, text):
         self.result_var.set(text)
@@ -378,26 +545,80 @@ class ScientificAppbySundram(tk.Tk):
         expr = self.calc_entry.get().strip()
         if not expr:
             return
-        try:
-            val = safe_eval(expr, self.env)
-            # format
-            if isinstance(val, float):
-                out = "{:.12g}".format(val)
-            else:
-                out = str(val)
-            self.calc_entry.delete(0, tk.END)
-            self.calc_entry.insert(0, out)
+
+        def done(val):
+            out = format_result(val)
+            self._preview_shown = out   # the entry now holds the result itself
+            self._replace_entry(out)
             self._set_result(out)
-            self._add_history(f"{expr} = {out}")
-        except Exception as e:
-            self._set_result("Error")
-            messagebox.showerror("Error", f"Could not evaluate expression:\n{e}")
+            self._add_history(expr, out)
 
-    def _add_history(self, text):
-        self.history.append(text)
-        # update history tab listbox if exists
-        if hasattr(self, 'history_listbox'):
-            self.history_listbox.insert(tk.END, text)
+        def failed(e):
+            if isinstance(e, EvalLimitError):
+                self._set_result("Too expensive")
+                messagebox.showerror("Error", f"Expression is too expensive to evaluate:\n{e}")
+            else:
+                self._set_result("Error")
+                messagebox.showerror("Error", f"Could not evaluate expression:\n{e}")
+
+        self._run_async("calc", "eval", (expr, self.env.deg_mode, self.env.units, self.env.complex),
+                        self.calc_entry.get, done, failed)
+
+    # ------------------------------
+    # Live preview
+    # ------------------------------
+    def _on_entry_changed(self, *args):
+        # at most one preview per frame: edits within 16 ms share one evaluation
+        if self._preview_job is None:
+            self._preview_job = self.after(16, self._start_preview)
+
+    def _refresh_preview(self):
+        # the mode changed: the same text may have a different result
+        self._preview_shown = None
+        self._on_entry_changed()
+
+    def _start_preview(self):
+        self._preview_job = None
+        text = self.calc_entry.get()
+        if text == self._preview_shown:
+            return
+        self.preview.submit(text, self.env.deg_mode, self.env.units, self.env.complex)
+        if not self._preview_polling:
+            self._preview_polling = True
+            self.after(16, self._poll_preview)
+
+    def _poll_preview(self):
+        busy = self.preview.busy    # read first, so a result finished after poll() is not lost
+        done = self.preview.poll()
+        if done is not None:
+            text, result = done
+            # skip stale previews and leave "=" jobs their Computing… label
+            if text == self.calc_entry.get() and not self._jobs:
+                self._preview_shown = text
+                self._set_result(result)
+        if busy:
+            self.after(16, self._poll_preview)
+        else:
+            self._preview_polling = False
+
+    def _open_history(self):
+        if HISTORY_PATH:
+            try:
+                return HistoryStore(HISTORY_PATH, capacity=HISTORY_CAPACITY)
+            except Exception:
+                pass    # unwritable home etc.: fall back to memory only
+        return HistoryStore(capacity=HISTORY_CAPACITY)
+
+    def _add_history(self, expression, result, category="calc"):
+        mode = ("DEG" if self.env.deg_mode else "RAD") if category == "calc" else None
+        self.history.add(expression, result, mode=mode, category=category)
+        # update history tab view if it shows the tail
+        if hasattr(self, 'history_view') and not self._history_query and self.history_view.at_end():
+            self.history_view.scroll_to_end()
+
+    def _flush_history(self):
+        self.history.flush()
+        self.after(HISTORY_FLUSH_MS, self._flush_history)
 
     # ------------------------------
     # Converter Tab
@@ -408,7 +629,7 @@ class ScientificAppbySundram(tk.Tk):
 
         # category selection
         tk.Label(frame, text="Category:", bg=WINDOW_BG, fg=ACCENT, font=("Segoe UI", 11, "bold")).grid(row=0, column=0, sticky="w")
-        categories = ["Length","Mass","Volume","Speed","Temperature","Area","Power"]
+        categories = CATEGORIES
         self.cat_var = tk.StringVar(value="Length")
         cat_menu = ttk.OptionMenu(frame, self.cat_var, categories[0], *categories, command=self._on_cat_change)
         cat_menu.grid(row=0, column=1, sticky="w", padx=8, pady=6)
@@ -443,56 +664,7 @@ class ScientificAppbySundram(tk.Tk):
         menu_from.delete(0, "end")
         menu_to.delete(0, "end")
 
-        if cat == "Length":
-            units = ["km","m","cm","mm","inch","foot","yard","mile"]
-            conv_to_m = {
-                "km":1000.0, "m":1.0, "cm":0.01, "mm":0.001,
-                "inch":0.0254, "foot":0.3048, "yard":0.9144, "mile":1609.344
-            }
-            self._conv_to_base = lambda v,u: v * conv_to_m[u]
-            self._conv_from_base = lambda v,u: v / conv_to_m[u]
-        elif cat == "Mass":
-            units = ["t","q","kg","g","mg","ct","lb","oz"]  # t: tonne, q: quintal, ct: carat
-            conv_to_kg = {"t":1000.0, "q":100.0, "kg":1.0, "g":0.001, "mg":0.000001, "ct":0.0002, "lb":0.45359237, "oz":0.028349523125}
-            self._conv_to_base = lambda v,u: v * conv_to_kg[u]
-            self._conv_from_base = lambda v,u: v / conv_to_kg[u]
-        elif cat == "Volume":
-            units = ["mL","L","cup","pint","quart","gallon","m³"]
-            conv_to_L = {"mL":0.001,"L":1.0,"cup":0.24,"pint":0.473176,"quart":0.946353,"gallon":3.78541,"m³":1000.0}
-            self._conv_to_base = lambda v,u: v * conv_to_L[u]
-            self._conv_from_base = lambda v,u: v / conv_to_L[u]
-        elif cat == "Speed":
-            units = ["m/s","km/h","mph"]
-            conv_to_ms = {"m/s":1.0,"km/h":1/3.6,"mph":0.44704}
-            self._conv_to_base = lambda v,u: v * conv_to_ms[u]
-            self._conv_from_base = lambda v,u: v / conv_to_ms[u]
-        elif cat == "Temperature":
-            units = ["C","F","K"]
-            def to_c(v,u):
-                if u=="C": return v
-                if u=="F": return (v-32)*5.0/9.0
-                if u=="K": return v-273.15
-            def from_c(v,u):
-                if u=="C": return v
-                if u=="F": return v*9.0/5.0+32
-                if u=="K": return v+273.15
-            self._conv_to_base = to_c
-            self._conv_from_base = from_c
-            units = ["C","F","K"]
-        elif cat == "Area":
-            units = ["m²","cm²","km²","ft²","acre","hectare"]
-            conv_to_m2 = {"m²":1.0,"cm²":0.0001,"km²":1e6,"ft²":0.092903,"acre":4046.8564224,"hectare":10000.0}
-            self._conv_to_base = lambda v,u: v * conv_to_m2[u]
-            self._conv_from_base = lambda v,u: v / conv_to_m2[u]
-        elif cat == "Power":
-            units = ["W","kW","hp"]
-            conv_to_w = {"W":1.0,"kW":1000.0,"hp":745.699872}
-            self._conv_to_base = lambda v,u: v * conv_to_w[u]
-            self._conv_from_base = lambda v,u: v / conv_to_w[u]
-        else:
-            units = []
-            self._conv_to_base = lambda v,u: v
-            self._conv_from_base = lambda v,u: v
+        units = units_for(cat)
 
         # populate menus
         if units:
@@ -515,18 +687,282 @@ class ScientificAppbySundram(tk.Tk):
         except:
             messagebox.showerror("Input error", "Please enter a numeric value")
             return
-        try:
-            base = self._conv_to_base(v, from_u)
-            res = self._conv_from_base(base, to_u)
+
+        def done(res):
             # format nicely
-            if isinstance(res, float):
-                out = "{:.12g}".format(res)
-            else:
-                out = str(res)
+            out = format_result(res)
             self.conv_result_var.set(out)
-            self._add_history(f"Convert ({cat}): {v} {from_u} -> {out} {to_u}")
+            self._add_history(f"{v} {from_u}", f"{out} {to_u}", category=cat)
+
+        snapshot = lambda: (self.conv_entry.get(), self.cat_var.get(), self.from_var.get(), self.to_var.get())
+        self._run_async("conv", "convert", (v, cat, from_u, to_u), snapshot, done,
+                        lambda e: messagebox.showerror("Conversion error", str(e)))
+
+    # ------------------------------
+    # Plot Tab
+    # ------------------------------
+    def _build_plot_tab(self):
+        frame = tk.Frame(self.tab_plot, bg=WINDOW_BG)
+        frame.pack(fill="both", expand=True, padx=12, pady=8)
+
+        form = tk.Frame(frame, bg=WINDOW_BG)
+        form.pack(fill="x")
+        tk.Label(form, text="f(x) =", bg=WINDOW_BG, fg=ACCENT, font=("Segoe UI", 11, "bold")).grid(row=0, column=0, sticky="w")
+        self.plot_expr = tk.Entry(form, bg="#FFFFFF", fg="#111", font=("Segoe UI", 12), bd=1, relief="solid")
+        self.plot_expr.grid(row=0, column=1, columnspan=5, sticky="we", padx=6, pady=4)
+        self.plot_expr.insert(0, "sin(x)*exp(-x/100)")
+        fields = []
+        for col, (label, default) in enumerate((("From:", "0"), ("To:", "720"), ("Rows:", "1000"))):
+            tk.Label(form, text=label, bg=WINDOW_BG).grid(row=1, column=col*2, sticky="w")
+            e = tk.Entry(form, width=9, bg="#FFFFFF", fg="#111", bd=1, relief="solid")
+            e.grid(row=1, column=col*2+1, sticky="w", padx=6, pady=4)
+            e.insert(0, default)
+            fields.append(e)
+        self.plot_from, self.plot_to, self.plot_rows = fields
+        form.grid_columnconfigure(1, weight=1)
+
+        btns = tk.Frame(frame, bg=WINDOW_BG)
+        btns.pack(fill="x", pady=4)
+        RoundedButton(btns, text="Plot", command=self._start_plot, width=110, height=40).pack(side="left", padx=4)
+        RoundedButton(btns, text="Export CSV", command=self._export_plot_csv, width=130, height=40).pack(side="left", padx=4)
+        self.plot_status = tk.StringVar()
+        tk.Label(btns, textvariable=self.plot_status, bg=WINDOW_BG, fg=ACCENT, font=("Segoe UI", 9)).pack(side="left", padx=6)
+
+        self.plot_canvas = tk.Canvas(frame, width=PLOT_W, height=PLOT_H, bg="#FFFFFF",
+                                     highlightthickness=1, highlightbackground="#CCCCCC")
+        self.plot_canvas.pack(pady=4)
+
+        # table rows are computed only for the rows in view
+        self.plot_table = VirtualList(frame, lambda: 0, lambda offset, limit: [],
+                                      render=lambda row: "x = {:<16.10g} f(x) = {}".format(
+                                          row[0], "—" if row[1] != row[1] else "{:.12g}".format(row[1])),
+                                      font=("Consolas", 10))
+        self.plot_table.pack(fill="both", expand=True, pady=4)
+
+        self._plot_gen = 0          # bumped per plot; older sampling threads stop
+        self._plot_queue = queue.Queue()
+        self._plot_agg = None
+        self._plot_polling = False
+        self._plot_dirty = False
+
+    def _plot_inputs(self):
+        expr = self.plot_expr.get().strip()
+        a = float(self.plot_from.get())
+        b = float(self.plot_to.get())
+        n = int(self.plot_rows.get())
+        if not expr or b <= a or n < 2:
+            raise ValueError("need an expression, From < To and at least 2 rows")
+        return expr, a, b, n, make_batch_function(expr, self.env)
+
+    def _start_plot(self):
+        try:
+            expr, a, b, n, f = self._plot_inputs()
         except Exception as e:
-            messagebox.showerror("Conversion error", str(e))
+            messagebox.showerror("Plot", str(e))
+            return
+        self._plot_gen += 1
+        gen = self._plot_gen
+        agg = self._plot_agg = ColumnAggregate(a, b, PLOT_W)
+        self.plot_table.set_source(lambda: n, lambda offset, limit: table_rows(f, a, b, n, offset, limit))
+        self.plot_status.set("Sampling…")
+        threading.Thread(target=self._sample_thread, args=(gen, f, a, b, agg), daemon=True).start()
+        if not self._plot_polling:
+            self._plot_polling = True
+            self.after(16, self._poll_plot)
+
+    def _sample_thread(self, gen, f, a, b, agg):
+        # runs off the UI thread; only touches the aggregate and the queue
+        try:
+            for xs, ys in adaptive_samples(f, a, b):
+                if gen != self._plot_gen:
+                    return
+                agg.add(xs, ys)
+                self._plot_queue.put((gen, "points", agg.points))
+            self._plot_queue.put((gen, "done", agg.points))
+        except Exception as e:
+            self._plot_queue.put((gen, "error", e))
+
+    def _poll_plot(self):
+        finished = False
+        while True:
+            try:
+                gen, kind, payload = self._plot_queue.get_nowait()
+            except queue.Empty:
+                break
+            if gen != self._plot_gen:
+                continue
+            if kind == "points":
+                self._plot_dirty = True
+                self.plot_status.set(f"Sampling… {payload} points")
+            elif kind == "done":
+                self._plot_dirty = True
+                finished = True
+                self.plot_status.set(f"{payload} adaptive samples")
+            else:
+                finished = True
+                self.plot_status.set(f"Error: {payload}")
+        # redraw at most once per frame, however many batches arrived
+        if self._plot_dirty:
+            self._plot_dirty = False
+            self._draw_plot()
+        if finished:
+            self._plot_polling = False
+        else:
+            self.after(16, self._poll_plot)
+
+    def _draw_plot(self):
+        c = self.plot_canvas
+        c.delete("all")
+        agg = self._plot_agg
+        y0, y1 = agg.y_range()
+        h = PLOT_H - 1
+
+        def to_px(y):
+            # clamp so poles do not produce huge canvas coordinates
+            return min(2*h, max(-h, (y1 - y) / (y1 - y0) * h))
+
+        if y0 < 0 < y1:
+            c.create_line(0, to_px(0), PLOT_W, to_px(0), fill="#BBBBBB")
+        if agg.a < 0 < agg.b:
+            x0 = (0 - agg.a) / (agg.b - agg.a) * (PLOT_W - 1)
+            c.create_line(x0, 0, x0, PLOT_H, fill="#BBBBBB")
+        for seg in agg.segments(to_px, h / 2):
+            c.create_line(*seg, fill=ACCENT, width=1.5)
+        font = ("Segoe UI", 8)
+        c.create_text(4, 2, text="{:.4g}".format(y1), anchor="nw", fill="#666", font=font)
+        c.create_text(4, h - 2, text="{:.4g}".format(y0), anchor="sw", fill="#666", font=font)
+        c.create_text(PLOT_W - 4, h - 2, text="x: {:.4g} … {:.4g}".format(agg.a, agg.b), anchor="se", fill="#666", font=font)
+
+    def _export_plot_csv(self):
+        try:
+            expr, a, b, n, f = self._plot_inputs()
+        except Exception as e:
+            messagebox.showerror("Export", str(e))
+            return
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv")])
+        if not path:
+            return
+        progress = {"done": 0, "n": n, "error": None, "finished": False}
+
+        def run():
+            try:
+                write_csv(path, f, a, b, n, header=("x", expr),
+                          progress=lambda done, total: progress.__setitem__("done", done))
+            except Exception as e:
+                progress["error"] = e
+            progress["finished"] = True
+
+        def poll():
+            if progress["error"] is not None:
+                self.plot_status.set(f"Export failed: {progress['error']}")
+            elif progress["finished"]:
+                self.plot_status.set(f"Exported {progress['done']} rows")
+            else:
+                self.plot_status.set(f"Exporting… {progress['done']}/{n}")
+                self.after(100, poll)
+
+        # rows are streamed to disk in chunks; nothing is held in memory
+        threading.Thread(target=run, daemon=True).start()
+        self.after(100, poll)
+
+    # ------------------------------
+    # Stats Tab
+    # ------------------------------
+    def _build_stats_tab(self):
+        frame = tk.Frame(self.tab_stats, bg=WINDOW_BG)
+        frame.pack(fill="both", expand=True, padx=12, pady=12)
+
+        tk.Label(frame, text="Numbers, or a CSV / text / .f64 file:", bg=WINDOW_BG, fg=ACCENT,
+                 font=("Segoe UI", 11, "bold")).pack(anchor="w")
+        self.stats_source = tk.Entry(frame, bg="#FFFFFF", fg="#111", font=("Segoe UI", 12), bd=1, relief="solid")
+        self.stats_source.pack(fill="x", pady=6)
+        self.stats_source.insert(0, "2, 4, 4, 4, 5, 5, 7, 9")
+
+        opts = tk.Frame(frame, bg=WINDOW_BG)
+        opts.pack(fill="x")
+        tk.Label(opts, text="Column (from 0):", bg=WINDOW_BG).pack(side="left")
+        self.stats_column = tk.Entry(opts, width=5, bg="#FFFFFF", fg="#111", bd=1, relief="solid")
+        self.stats_column.pack(side="left", padx=6)
+        self.stats_column.insert(0, "0")
+
+        btns = tk.Frame(frame, bg=WINDOW_BG)
+        btns.pack(fill="x", pady=8)
+        RoundedButton(btns, text="Browse…", command=self._browse_stats_file, width=110, height=40).pack(side="left", padx=4)
+        RoundedButton(btns, text="Compute", command=self._compute_stats, width=110, height=40).pack(side="left", padx=4)
+        self.stats_status = tk.StringVar()
+        tk.Label(btns, textvariable=self.stats_status, bg=WINDOW_BG, fg=ACCENT, font=("Segoe UI", 9)).pack(side="left", padx=6)
+
+        self.stats_result = tk.StringVar()
+        tk.Label(frame, textvariable=self.stats_result, bg=WINDOW_BG, fg="#111", justify="left", anchor="nw",
+                 font=("Consolas", 11)).pack(fill="both", expand=True, pady=6)
+        self._stats_gen = 0
+
+    def _browse_stats_file(self):
+        path = filedialog.askopenfilename(parent=self, filetypes=[
+            ("Data", "*.csv *.txt *.dat *.f64 *.f32 *.bin"), ("All files", "*.*")])
+        if path:
+            self.stats_source.delete(0, tk.END)
+            self.stats_source.insert(0, path)
+
+    def _show_stats(self, stats):
+        lines = []
+        for name, value in stats.summary().items():
+            lines.append("{:<9} {}".format(name, value if name == "count" else "{:.12g}".format(value)))
+        if stats.skipped:
+            lines.append("{:<9} {}".format("skipped", stats.skipped))
+        self.stats_result.set("\n".join(lines))
+
+    def _compute_stats(self):
+        source = self.stats_source.get().strip()
+        if not source:
+            return
+        try:
+            column = int(self.stats_column.get() or 0)
+        except ValueError:
+            messagebox.showerror("Stats", "Column must be a whole number")
+            return
+        if not os.path.isfile(source):
+            # an inline list: small enough to do right here
+            try:
+                stats = stats_of(float(t) for t in source.replace(";", " ").replace(",", " ").split())
+            except ValueError as e:
+                messagebox.showerror("Stats", str(e))
+                return
+            self._show_stats(stats)
+            self.stats_status.set("")
+            self._add_history(source, format_summary(stats), category="stats")
+            return
+
+        # files are reduced in one streaming pass on a background thread
+        self._stats_gen += 1
+        gen = self._stats_gen
+        dtype = guess_dtype(source)
+        label = source if dtype else f"{source} [column {column}]"
+        state = {"stats": None, "error": None}
+
+        def run():
+            try:
+                state["stats"] = stats_file(source, column, dtype=dtype)
+            except Exception as e:
+                state["error"] = e
+
+        def poll():
+            if gen != self._stats_gen:
+                return
+            if state["error"] is not None:
+                self.stats_status.set(f"Error: {state['error']}")
+            elif state["stats"] is not None:
+                self.stats_status.set("")
+                self._show_stats(state["stats"])
+                self._add_history(label, format_summary(state["stats"]), category="stats")
+            else:
+                self.after(100, poll)
+
+        self.stats_status.set("Reading…")
+        self.stats_result.set("")
+        threading.Thread(target=run, daemon=True).start()
+        self.after(100, poll)
 
     # ------------------------------
     # History Tab
@@ -537,49 +973,85 @@ class ScientificAppbySundram(tk.Tk):
 
         tk.Label(frame, text="History (click to re-use)", bg=WINDOW_BG, fg=ACCENT, font=("Segoe UI", 11, "bold")).pack(anchor="w")
 
-        listbox_frame = tk.Frame(frame, bg=WINDOW_BG)
-        listbox_frame.pack(fill="both", expand=True, pady=8)
+        # search box (indexed search in the history store)
+        self._history_query = ""
+        self._search_job = None
+        self.history_search = tk.Entry(frame, bg="#FFFFFF", fg="#111", font=("Segoe UI", 11), bd=1, relief="solid")
+        self.history_search.pack(fill="x", pady=(6, 0))
+        self.history_search.bind("<KeyRelease>", self._on_history_search)
 
-        self.history_listbox = tk.Listbox(listbox_frame, font=("Segoe UI", 11))
-        self.history_listbox.pack(side="left", fill="both", expand=True)
-        self.history_listbox.bind("<Double-Button-1>", self._on_history_double)
-
-        scrollbar = tk.Scrollbar(listbox_frame, orient="vertical", command=self.history_listbox.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.history_listbox.config(yscrollcommand=scrollbar.set)
+        self.history_view = VirtualList(frame, self.history.__len__, self.history.page, render=format_record)
+        self.history_view.pack(fill="both", expand=True, pady=8)
+        self.history_view.listbox.bind("<Double-Button-1>", self._on_history_double)
 
         btns = tk.Frame(frame, bg=WINDOW_BG)
         btns.pack(fill="x")
         RoundedButton(btns, text="Clear History", command=self._clear_history, width=160, height=44).pack(side="left", padx=6)
         RoundedButton(btns, text="Copy Selected", command=self._copy_selected_history, width=160, height=44).pack(side="left", padx=6)
 
+        self.after(HISTORY_FLUSH_MS, self._flush_history)
+        self.after_idle(self.history_view.scroll_to_end)
+
+    def _on_history_search(self, event):
+        # debounce typing before hitting the index
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(200, self._run_history_search)
+
+    def _run_history_search(self):
+        self._search_job = None
+        query = self.history_search.get().strip()
+        if query == self._history_query:
+            return
+        self._history_query = query
+        if not query:
+            self.history_view.set_source(self.history.__len__, self.history.page)
+            self.history_view.scroll_to_end()
+            return
+        count = self.history.search_count(query)
+        self.history_view.set_source(lambda: count,
+                                     lambda offset, limit: self.history.search(query, offset, limit))
+
     def _on_history_double(self, event):
-        sel = self.history_listbox.curselection()
-        if not sel:
+        rec = self.history_view.selected()
+        if rec is None:
             return
-        text = self.history_listbox.get(sel[0])
-        # if it is an "expr = result" style, extract left side
-        if "=" in text:
-            expr = text.split("=",1)[0].strip()
+        if rec.category == "calc":
             self.notebook.select(self.tab_calc)
             self.calc_entry.delete(0, tk.END)
-            self.calc_entry.insert(0, expr)
-        else:
-            self.calc_entry.delete(0, tk.END)
-            self.calc_entry.insert(0, text)
+            self.calc_entry.insert(0, rec.expression)
+        elif rec.category == "stats":
+            source, _, column = rec.expression.partition(" [column ")
+            self.notebook.select(self.tab_stats)
+            self.stats_source.delete(0, tk.END)
+            self.stats_source.insert(0, source)
+            self.stats_column.delete(0, tk.END)
+            self.stats_column.insert(0, column.rstrip("]") or "0")
+        elif rec.category in CATEGORIES:
+            # "<value> <unit>" -> "<result> <unit>"
+            value, from_u = rec.expression.split(" ", 1)
+            to_u = rec.result.split(" ", 1)[1]
+            self.notebook.select(self.tab_conv)
+            self.cat_var.set(rec.category)
+            self._on_cat_change(rec.category)
+            self.from_var.set(from_u)
+            self.to_var.set(to_u)
+            self.conv_entry.delete(0, tk.END)
+            self.conv_entry.insert(0, value)
 
     def _clear_history(self):
         if messagebox.askyesno("Clear", "Clear all history?"):
-            self.history_listbox.delete(0, tk.END)
             self.history.clear()
+            self.history_search.delete(0, tk.END)
+            self._history_query = ""
+            self.history_view.set_source(self.history.__len__, self.history.page)
 
     def _copy_selected_history(self):
-        sel = self.history_listbox.curselection()
-        if not sel:
+        rec = self.history_view.selected()
+        if rec is None:
             return
-        text = self.history_listbox.get(sel[0])
         self.clipboard_clear()
-        self.clipboard_append(text)
+        self.clipboard_append(format_record(rec))
         messagebox.showinfo("Copied", "History item copied to clipboard")
 
 # ------------------------------